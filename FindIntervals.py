@@ -13,6 +13,7 @@ from datetime import datetime,timedelta
 
 
 ##also, write another fucntion that checks if the edf within one folder has changed the name, and if so, check the interval and the lenght of edf and see if they match
+##(renamed or duplicated EDFs are now found by content: see edf_fingerprint.find_duplicate_edfs)
 def do_ranges_overlap( end1, start2):
     return  start2 <= end1
 
@@ -1,18 +1,210 @@
-import mne
+"""
+EDF Channel Reorder/Pick Tool
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
 
-# Load the EDF file
-edf_file_path = 'Z:/uci_vmostaghimi/ach_dsamanta/20-0001 (2017)/diagnosis/20-0001_DX_01_0001.edf'
-raw = mne.io.read_raw_edf(edf_file_path, preload=True)
+Description:
+Writes a copy of an EDF file that holds only the requested channels, in the
+requested order (by default the 19 channels of the 10-20 system). The copy is
+made with pyedflib.EdfWriter, streaming the data records a chunk at a time from a
+memory-mapped view of the source file (see edf_data_records), so peak memory does
+not depend on the length of the recording. (This replaces the previous
+mne.io.read_raw_edf(..., preload=True) version, which loaded the whole recording
+into memory.)
 
-# Define the desired channel order
-desired_order = ['Fp1', 'Fp2', 'F3', 'F4', 'C3', 'C4', 'P3', 'P4', 'O1', 'O2', 'F7', 'F8', 'T3', 'T4', 'T5', 'T6', 'Fz', 'Cz', 'Pz']
+Samples are copied as digital values, so the signals are bit-for-bit the same
+as in the source. The headers are kept: patient and recording fields, start
+date/time, data record duration and, for every kept channel, its label, physical
+dimension, physical/digital range, transducer and prefilter. EDF+ annotations
+are copied too.
 
-# Reorder the channels
-raw.pick_channels(desired_order)
-# Save the reordered data to a new EDF file
-reordered_edf_file_path = 'Z:/uci_vmostaghimi/20-0001_DX_01_0001.edf'
-raw.save(reordered_edf_file_path, overwrite=True)
-#TODO:
-#use pyedflib.EdfWriter(file_name, n_channels, file_type=1)[source] to write edf
+Channels are matched by their normalized name (channel_name_normalizer), so
+"EEG Fp1-Ref", "FP1" and "Fp1" all match "Fp1", and with site aliases "T7"
+matches "T3". The labels of the source are kept unless rename_channels=True.
 
+Usage:
+    reorder_edf_channels("path/to/input.edf", "path/to/output.edf")
 
+    # other channels / target labels
+    reorder_edf_channels("in.edf", "out.edf", channel_order=["Fp1", "Fp2", "Cz"],
+                         rename_channels=True)
+
+Note:
+    Only 16-bit EDF/EDF+ files are supported (not BDF). Discontinuous EDF+D
+    files are written as continuous recordings.
+"""
+
+import math
+import os
+import warnings
+
+import numpy as np
+import pyedflib
+
+from channel_name_normalizer import normalize_channel_name
+from edf_data_records import DEFAULT_RECORDS_PER_CHUNK, EdfDataRecords
+
+
+# Default target order: the 19 channels of the 10-20 system
+STANDARD_10_20_CHANNELS = ['Fp1', 'Fp2', 'F3', 'F4', 'C3', 'C4', 'P3', 'P4', 'O1', 'O2',
+                           'F7', 'F8', 'T3', 'T4', 'T5', 'T6', 'Fz', 'Cz', 'Pz']
+
+# Most annotation signals edflib writes (it stores one annotation per annotation signal and data record)
+MAX_ANNOTATION_SIGNALS = 64
+
+
+def find_channel_positions(signal_labels, channel_order=STANDARD_10_20_CHANNELS, use_aliases=True):
+    """
+    Find the signal of each requested channel.
+
+    Args:
+        signal_labels (list): Labels of the ordinary signals of the EDF
+        channel_order (list): Requested channels, in output order (default: STANDARD_10_20_CHANNELS)
+        use_aliases (bool): Also match site-specific variants such as T7 -> T3 (default: True)
+
+    Returns:
+        list: Signal number of each requested channel (first matching signal)
+
+    Raises:
+        ValueError: If any requested channel is not in the file
+    """
+    position_by_name = {}
+    for position, label in enumerate(signal_labels):
+        position_by_name.setdefault(normalize_channel_name(label, use_aliases), position)
+
+    target_names = [normalize_channel_name(channel_name, use_aliases) for channel_name in channel_order]
+    missing_channels = [channel_name for channel_name, target_name in zip(channel_order, target_names)
+                        if target_name not in position_by_name]
+    if missing_channels:
+        raise ValueError(f"Channels not found: {', '.join(missing_channels)}")
+    return [position_by_name[target_name] for target_name in target_names]
+
+
+def _copy_file_header(edf_reader, edf_writer, data_records):
+    """Copy the patient/recording fields, start time and record duration to the writer."""
+    file_header = edf_reader.getHeader()
+    file_header['startdate'] = data_records.header.start_datetime
+    try:
+        edf_writer.setHeader(file_header)
+    except ValueError:
+        # Birthdate in a format EdfWriter cannot parse: keep the other fields
+        file_header['birthdate'] = ''
+        edf_writer.setHeader(file_header)
+
+    with warnings.catch_warnings():
+        # Keep the source record duration so data records can be copied one to one
+        warnings.simplefilter('ignore', UserWarning)
+        edf_writer.setDatarecordDuration(data_records.header.record_duration)
+
+
+def reorder_edf_channels(input_path, output_path, channel_order=STANDARD_10_20_CHANNELS,
+                         rename_channels=False, use_aliases=True,
+                         records_per_chunk=DEFAULT_RECORDS_PER_CHUNK, channel_labels=None):
+    """
+    Write a copy of an EDF file with only the requested channels, in the requested order.
+
+    The copy is written to output_path + '.part' and renamed when complete, so an
+    interrupted run never leaves a truncated output_path behind; the .part file is
+    deleted if the copy fails. EDF+ files can hold at most MAX_ANNOTATION_SIGNALS
+    annotations per data record, any annotations beyond that are not written and
+    reported.
+
+    Args:
+        input_path (str): Path of the source EDF file
+        output_path (str): Path of the EDF file to write (replaced if it exists)
+        channel_order (list): Channels to keep, in output order (default: STANDARD_10_20_CHANNELS)
+        rename_channels (bool): Label the output channels with the names of channel_order
+            instead of keeping the source labels (default: False)
+        use_aliases (bool): Also match site-specific variants such as T7 -> T3 (default: True)
+        records_per_chunk (int): Data records copied per chunk (default: DEFAULT_RECORDS_PER_CHUNK)
+        channel_labels (list): Labels of the output channels, one per entry of channel_order
+            (default: None; overrides rename_channels when given)
+
+    Returns:
+        list: Labels of the written channels
+
+    Raises:
+        ValueError: If a requested channel is missing, the file is a BDF file, or
+                    output_path is the input file
+    """
+    if os.path.abspath(output_path) == os.path.abspath(input_path):
+        raise ValueError(f"Output file must differ from the input file: {input_path}")
+    if channel_labels is None and rename_channels:
+        channel_labels = channel_order
+    if channel_labels is not None and len(channel_labels) != len(channel_order):
+        raise ValueError(f"Got {len(channel_labels)} channel labels for {len(channel_order)} channels")
+
+    with EdfDataRecords(input_path) as data_records, pyedflib.EdfReader(input_path) as edf_reader:
+        signal_positions = find_channel_positions(data_records.header.signal_labels, channel_order, use_aliases)
+        source_signal_headers = edf_reader.getSignalHeaders()
+        record_duration = data_records.header.record_duration
+
+        signal_headers = []
+        for channel_index, position in enumerate(signal_positions):
+            signal_header = dict(source_signal_headers[position])
+            signal_header['sample_frequency'] = data_records.samples_per_record(position) / record_duration
+            if channel_labels is not None:
+                signal_header['label'] = channel_labels[channel_index]
+            signal_headers.append(signal_header)
+
+        # Columns of the kept signals in a source data record, in output order
+        record_columns = np.concatenate([np.arange(data_records.signal_columns(position).start,
+                                                   data_records.signal_columns(position).stop)
+                                         for position in signal_positions])
+
+        annotation_onsets, annotation_durations, annotation_texts = edf_reader.readAnnotations()
+        file_type = (pyedflib.FILETYPE_EDFPLUS if edf_reader.filetype == pyedflib.FILETYPE_EDFPLUS
+                     else pyedflib.FILETYPE_EDF)
+
+        annotation_capacity = MAX_ANNOTATION_SIGNALS * max(data_records.n_records, 1)
+        if file_type == pyedflib.FILETYPE_EDFPLUS and len(annotation_onsets) > annotation_capacity:
+            print(f"Warning: {len(annotation_onsets) - annotation_capacity} of {len(annotation_onsets)} "
+                  f"annotations of {input_path} not written (at most {MAX_ANNOTATION_SIGNALS} per data record)")
+            annotation_onsets = annotation_onsets[:annotation_capacity]
+            annotation_durations = annotation_durations[:annotation_capacity]
+            annotation_texts = annotation_texts[:annotation_capacity]
+
+        partial_path = output_path + '.part'
+        edf_writer = pyedflib.EdfWriter(partial_path, len(signal_headers), file_type=file_type)
+        try:
+            try:
+                _copy_file_header(edf_reader, edf_writer, data_records)
+                if file_type == pyedflib.FILETYPE_EDFPLUS and len(annotation_onsets):
+                    edf_writer.set_number_of_annotation_signals(
+                        min(math.ceil(len(annotation_onsets) / max(data_records.n_records, 1)) + 1,
+                            MAX_ANNOTATION_SIGNALS))
+                edf_writer.setSignalHeaders(signal_headers)
+
+                for record_chunk in data_records.iter_record_chunks(records_per_chunk):
+                    # One contiguous int16 copy of the chunk's kept columns
+                    output_chunk = np.ascontiguousarray(record_chunk[:, record_columns])
+                    for output_record in output_chunk:
+                        if edf_writer.blockWriteDigitalShortSamples(output_record) < 0:
+                            raise OSError(f"Error writing data record to {partial_path}")
+
+                if file_type == pyedflib.FILETYPE_EDFPLUS:
+                    for onset, duration, text in zip(annotation_onsets, annotation_durations, annotation_texts):
+                        edf_writer.writeAnnotation(onset, duration, text)
+            finally:
+                edf_writer.close()
+        except Exception:
+            # Never leave an incomplete copy behind
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+    os.replace(partial_path, output_path)
+    return [signal_header['label'] for signal_header in signal_headers]
+
+
+if __name__ == '__main__':
+    # CONFIGURATION
+    EDF_FILE_PATH = 'Z:/uci_vmostaghimi/ach_dsamanta/20-0001 (2017)/diagnosis/20-0001_DX_01_0001.edf'
+    REORDERED_EDF_FILE_PATH = 'Z:/uci_vmostaghimi/20-0001_DX_01_0001.edf'
+
+    # Desired channel order (10-20 system)
+    DESIRED_ORDER = STANDARD_10_20_CHANNELS
+
+    written_channels = reorder_edf_channels(EDF_FILE_PATH, REORDERED_EDF_FILE_PATH, channel_order=DESIRED_ORDER)
+    print(f"Saved {len(written_channels)} channels to {REORDERED_EDF_FILE_PATH}")
@@ -0,0 +1,254 @@
+"""
+Batch EDF Channel Reorder
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Harmonizes the channel order of every EDF of a center using the center's
+channel_mapping.csv (the original/renamed/reordered triplets read by
+get_channel_harmonization_report). For each EDF listed in the mapping:
+    1. Each channel's new name is its 'renamed' entry, or its 'original' name
+       when the renamed cell is empty
+    2. The output holds the channels of the 'reordered' row, in that order,
+       labeled with their new names
+    3. The data is copied with Reorder_channels.reorder_edf_channels, which
+       streams the data records and keeps the headers
+
+Files are spread across worker processes. A file is skipped when its output
+already has the target channel order, so a run that was interrupted can simply
+be started again: finished files are skipped, and a file that was cut off is
+redone (outputs are written to a .part file and only renamed when complete).
+
+Directory Structure:
+    to mat edfs/
+    └── center1/
+        ├── channel_mapping.csv
+        ├── ... *.edf (found anywhere below the center folder, by path relative to
+        │       it or by file name when that name is unique in the center)
+        └── reordered/          <- output (same relative paths), unless in_place=True
+
+Output:
+    reordered/*.edf: EDFs with the harmonized channel order
+    channel_reorder_log.xlsx (center folder): One row per EDF with its status
+
+Usage:
+    reorder_center_edfs(center_dir="Z:/uci_vmostaghimi/to mat edfs/11.bch_ngupta", workers=4)
+
+Note:
+    With in_place=True the source EDFs are replaced by their reordered copy.
+    Keep a backup, as the channels that are not in the 'reordered' row are dropped.
+"""
+
+import os
+from functools import partial
+
+import pandas as pd
+
+from Reorder_channels import reorder_edf_channels
+from channel_name_normalizer import normalize_channel_name
+from edf_data_records import DEFAULT_RECORDS_PER_CHUNK
+from edf_header_reader import read_edf_header
+from get_channel_harmonization_report import iter_channel_mapping_triplets
+from parallel_map import map_in_order
+from workbook_sink import write_sheet
+
+
+def mapped_channel_order(categories):
+    """
+    Source channels and output labels of one channel mapping triplet.
+
+    Args:
+        categories (dict): {'original': [...], 'renamed': [...], 'reordered': [...]}
+
+    Returns:
+        tuple: (source channel names, output labels), both in output order
+
+    Raises:
+        ValueError: If a reordered channel is not the new name of any channel
+    """
+    source_by_new_name = {}
+    for original_name, renamed_name in zip(categories["original"], categories["renamed"]):
+        new_name = renamed_name if renamed_name != "" else original_name
+        if original_name != "" and new_name != "":
+            source_by_new_name.setdefault(new_name, original_name)
+
+    target_labels = [channel_name for channel_name in categories["reordered"] if channel_name != ""]
+    missing_channels = [channel_name for channel_name in target_labels if channel_name not in source_by_new_name]
+    if missing_channels:
+        raise ValueError(f"Reordered channels without a source channel: {', '.join(missing_channels)}")
+    return [source_by_new_name[channel_name] for channel_name in target_labels], target_labels
+
+
+def has_channel_order(full_path, target_labels):
+    """
+    True if the EDF exists and its channels already are target_labels, in order.
+
+    Labels are compared after normalization, so "EEG Fp1-Ref" counts as "Fp1".
+    """
+    if not os.path.exists(full_path):
+        return False
+    try:
+        signal_labels = read_edf_header(full_path).signal_labels
+    except Exception:
+        # Unreadable output (e.g. cut off while writing): redo it
+        return False
+    return ([normalize_channel_name(label, use_aliases=False) for label in signal_labels] ==
+            [normalize_channel_name(label, use_aliases=False) for label in target_labels])
+
+
+def find_center_edfs(center_dir, excluded_folder=None):
+    """
+    Index the EDF files below a center folder.
+
+    Args:
+        center_dir (str): Path to the center directory
+        excluded_folder (str): Folder whose files are left out, e.g. the output folder (default: None)
+
+    Returns:
+        tuple: (edf_paths, ambiguous_names)
+            - edf_paths: Path relative to center_dir ('/' separated), and the file name
+              of files whose name is unique in the center -> full path
+            - ambiguous_names: File names found in more than one folder
+    """
+    excluded_folder = os.path.abspath(excluded_folder) if excluded_folder else None
+    edf_paths = {}
+    paths_by_name = {}
+    for folder_path, folder_names, file_names in os.walk(center_dir):
+        if excluded_folder is not None:
+            folder_names[:] = [folder_name for folder_name in folder_names
+                               if os.path.abspath(os.path.join(folder_path, folder_name)) != excluded_folder]
+        folder_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith('.edf'):
+                full_path = os.path.join(folder_path, file_name)
+                relative_path = os.path.relpath(full_path, center_dir).replace(os.sep, '/')
+                edf_paths[relative_path] = full_path
+                paths_by_name.setdefault(file_name, []).append(full_path)
+
+    ambiguous_names = set()
+    for file_name, full_paths in paths_by_name.items():
+        if len(full_paths) > 1:
+            ambiguous_names.add(file_name)
+        else:
+            edf_paths.setdefault(file_name, full_paths[0])
+    return edf_paths, ambiguous_names
+
+
+def reorder_mapped_edf(mapping_entry, center_dir, output_folder=None, records_per_chunk=DEFAULT_RECORDS_PER_CHUNK):
+    """
+    Reorder the channels of one EDF of the mapping.
+
+    Args:
+        mapping_entry (tuple): (edf_filename from the mapping, full path, triplet categories,
+            status when the full path is None: 'not found' or 'ambiguous')
+        center_dir (str): Path to the center directory
+        output_folder (str): Folder the reordered EDFs go to, keeping their path relative to
+            center_dir (default: None, replace the source files)
+        records_per_chunk (int): Data records copied per chunk (default: DEFAULT_RECORDS_PER_CHUNK)
+
+    Returns:
+        dict: Row of the reorder log ('EDF', 'Status', 'Channels', 'Output')
+    """
+    edf_filename, full_path, categories, lookup_status = mapping_entry
+    log_row = {'EDF': edf_filename, 'Status': '', 'Channels': None, 'Output': ''}
+    if full_path is None:
+        log_row['Status'] = lookup_status
+        return log_row
+
+    if output_folder is None:
+        output_path = full_path
+    else:
+        output_path = os.path.join(output_folder, os.path.relpath(full_path, center_dir))
+    log_row['Output'] = output_path
+
+    try:
+        source_channels, target_labels = mapped_channel_order(categories)
+        log_row['Channels'] = len(target_labels)
+        if has_channel_order(output_path, target_labels):
+            log_row['Status'] = 'already ordered'
+            return log_row
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if output_path == full_path:
+            # Write next to the source, then replace it once the copy is complete
+            reordered_path = full_path + '.reordered'
+            reorder_edf_channels(full_path, reordered_path, channel_order=source_channels,
+                                 use_aliases=False, records_per_chunk=records_per_chunk,
+                                 channel_labels=target_labels)
+            os.replace(reordered_path, full_path)
+        else:
+            reorder_edf_channels(full_path, output_path, channel_order=source_channels,
+                                 use_aliases=False, records_per_chunk=records_per_chunk,
+                                 channel_labels=target_labels)
+        log_row['Status'] = 'reordered'
+    except Exception as e:
+        print(f"Error reordering {edf_filename}: {str(e)}")
+        log_row['Status'] = f'error: {str(e)}'
+    return log_row
+
+
+def reorder_center_edfs(center_dir, mapping_filename="channel_mapping.csv", output_folder_name="reordered",
+                        in_place=False, workers=1, records_per_chunk=DEFAULT_RECORDS_PER_CHUNK,
+                        log_filename="channel_reorder_log.xlsx"):
+    """
+    Reorder the channels of every EDF listed in a center's channel mapping.
+
+    Args:
+        center_dir (str): Path to the center directory
+        mapping_filename (str): Channel mapping file in center_dir (default: "channel_mapping.csv")
+        output_folder_name (str): Output folder in center_dir (default: "reordered")
+        in_place (bool): Replace the source EDFs instead of writing to the output folder (default: False)
+        workers (int): Number of processes files are spread across (default: 1)
+        records_per_chunk (int): Data records copied per chunk (default: DEFAULT_RECORDS_PER_CHUNK)
+        log_filename (str): Log written to center_dir (default: "channel_reorder_log.xlsx";
+            None to skip it)
+
+    Returns:
+        pd.DataFrame: Reorder log, one row per EDF of the mapping
+    """
+    if not os.path.exists(center_dir):
+        raise FileNotFoundError(f"Center directory not found: {center_dir}")
+
+    center_name = os.path.basename(os.path.normpath(center_dir))
+    print(f"\nReordering Center: {center_name}")
+
+    output_folder = None if in_place else os.path.join(center_dir, output_folder_name)
+    edf_paths, ambiguous_names = find_center_edfs(center_dir, excluded_folder=output_folder)
+
+    mapping_entries = []
+    for edf_filename, categories in iter_channel_mapping_triplets(os.path.join(center_dir, mapping_filename)):
+        lookup_name = edf_filename.replace('\\', '/')
+        full_path = edf_paths.get(lookup_name)
+        lookup_status = 'not found'
+        if full_path is None and os.path.basename(lookup_name) in ambiguous_names:
+            # Several patients have a file of that name: never guess which one to rewrite
+            print(f"  Warning: {edf_filename} matches more than one file, give its path relative to the center")
+            lookup_status = 'ambiguous'
+        elif full_path is None:
+            full_path = edf_paths.get(os.path.basename(lookup_name))
+        mapping_entries.append((edf_filename, full_path, categories, lookup_status))
+    print(f"  Found {len(mapping_entries)} EDFs in the channel mapping")
+
+    log_rows = map_in_order(partial(reorder_mapped_edf,
+                                    center_dir=center_dir,
+                                    output_folder=output_folder,
+                                    records_per_chunk=records_per_chunk),
+                            mapping_entries, workers)
+    reorder_log = pd.DataFrame(log_rows, columns=['EDF', 'Status', 'Channels', 'Output'])
+
+    status_counts = reorder_log['Status'].str.split(':').str[0].value_counts()
+    print("  " + ", ".join(f"{count} {status}" for status, count in status_counts.items()))
+
+    if log_filename is not None and not reorder_log.empty:
+        write_sheet(reorder_log, os.path.join(center_dir, log_filename), center_name, mode='w')
+    return reorder_log
+
+
+if __name__ == '__main__':
+    # CONFIGURATION
+    CENTER_DIR = "Z:/uci_vmostaghimi/to mat edfs/11.bch_ngupta"
+    WORKERS = 4
+    IN_PLACE = False  # True replaces the source EDFs
+
+    reorder_center_edfs(center_dir=CENTER_DIR, workers=WORKERS, in_place=IN_PLACE)
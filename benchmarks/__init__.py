@@ -0,0 +1,16 @@
+"""
+Scanner Benchmarks
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Benchmarks for the center scanner scripts that do not need the Z: share.
+synthetic_tree writes a center/patient/diagnosis|follow up/*.edf tree of
+synthetic recordings with pyedflib, and run_benchmarks times each single-center
+entry point on it (seconds, files/sec and peak memory) and compares the numbers
+with the baselines stored in baselines.json.
+
+Usage (from the repository root, so the scanner scripts can be imported):
+    python -m benchmarks.run_benchmarks
+"""
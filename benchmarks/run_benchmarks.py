@@ -0,0 +1,337 @@
+"""
+Center Scanner Benchmarks
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Times the single-center entry points of the scanner scripts on a synthetic tree
+(see synthetic_tree) and reports, for each of them:
+    - seconds: Median wall time of the repeated runs (after one untimed warm-up run)
+    - min_seconds: Fastest of the repeated runs
+    - files_per_second: EDF files of the tree divided by seconds
+    - peak_memory_mb: Peak Python memory of one extra run, measured with tracemalloc
+      (run separately, as tracing slows the code down)
+
+The tree is generated once per run from one of BENCHMARK_PROFILES. The
+"_warm_manifest" benchmarks read the headers through a header manifest that was
+filled by a run before the timing starts, which is the normal case for weekly
+re-runs; the others read every file.
+
+Baselines:
+    baselines.json keeps the results of earlier runs per profile. Each new run is
+    compared with them, and a benchmark is flagged as a regression when its median
+    got slower by more than the tolerance (25 % by default) and by more than
+    MIN_REGRESSION_SECONDS, so the jitter of runs that take a few hundredths of a
+    second is not reported. Wall times depend on the machine and disk, so refresh
+    the baselines (Option 2) when moving to another machine.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks
+
+    # or from Python
+    results = run_benchmarks(profile_name="small")
+    compare_with_baselines(results, load_baselines()["small"])
+
+Note:
+    Scanner output is silenced while timing. The channel benchmark collects its
+    sheets in a WorkbookSink that is never written, so no workbooks are left in
+    the tree and only the scan is timed.
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from edf_header_manifest import EdfHeaderManifest
+from get_FU_DX_intervals import calculate_intervals_single_center
+from get_channel_labels_and_sampling_freq import process_single_center
+from get_cross_folder_overlaps import find_center_cross_folder_overlaps
+from get_edf_timing_info import process_single_center_timing
+from get_edfs_overlaps import process_single_center_overlaps
+from get_sampling_freq_validation import process_single_center_fs_validation
+from scan_center_tree import scan_single_center
+from workbook_sink import WorkbookSink
+
+from benchmarks.synthetic_tree import generate_synthetic_tree
+
+
+# File the baselines are stored in (next to this script)
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# Synthetic tree sizes (arguments of generate_synthetic_tree)
+BENCHMARK_PROFILES = {
+    'small': {'centers': 1, 'patients_per_center': 10, 'files_per_folder': 3,
+              'n_channels': 19, 'duration_seconds': 60, 'sampling_frequencies': (256,)},
+    'medium': {'centers': 1, 'patients_per_center': 40, 'files_per_folder': 4,
+               'n_channels': 23, 'duration_seconds': 60, 'sampling_frequencies': (256, 256, 512)},
+    'large': {'centers': 1, 'patients_per_center': 200, 'files_per_folder': 4,
+              'n_channels': 19, 'duration_seconds': 30, 'sampling_frequencies': (256,)},
+}
+
+# Relative slowdown over the baseline reported as a regression
+REGRESSION_TOLERANCE = 0.25
+
+# Slowdowns smaller than this (seconds) are never reported: they are within run-to-run noise
+MIN_REGRESSION_SECONDS = 0.05
+
+# Timed runs per benchmark
+DEFAULT_REPEATS = 7
+
+
+def _bench_timing(center_dir, manifest=None):
+    return process_single_center_timing(center_dir, manifest=manifest)
+
+
+def _bench_fs_validation(center_dir, manifest=None):
+    return process_single_center_fs_validation(center_dir, manifest=manifest)
+
+
+def _bench_fs_validation_header_only(center_dir, manifest=None):
+    return process_single_center_fs_validation(center_dir, manifest=manifest, header_only=True)
+
+
+def _bench_fs_validation_signal_quality(center_dir, manifest=None):
+    return process_single_center_fs_validation(center_dir, manifest=manifest, header_only=True,
+                                               signal_quality=True)
+
+
+def _bench_overlaps(center_dir, manifest=None):
+    return process_single_center_overlaps(center_dir, manifest=manifest)
+
+
+def _bench_intervals(center_dir, manifest=None):
+    return calculate_intervals_single_center(center_dir, manifest=manifest)
+
+
+def _bench_channels(center_dir, manifest=None):
+    # The sink is never written: only the scan and the sheet building are timed
+    return process_single_center(center_dir, manifest=manifest, sink=WorkbookSink())
+
+
+def _bench_cross_folder_overlaps(center_dir, manifest=None):
+    return find_center_cross_folder_overlaps(center_dir, manifest=manifest)
+
+
+def _bench_scan_single_center(center_dir, manifest=None):
+    return scan_single_center(center_dir, manifest=manifest)
+
+
+# Benchmark name -> (function of center_dir and manifest, uses a warm header manifest)
+BENCHMARKS = {
+    'timing': (_bench_timing, False),
+    'fs_validation': (_bench_fs_validation, False),
+    'fs_validation_header_only': (_bench_fs_validation_header_only, False),
+    'fs_validation_signal_quality': (_bench_fs_validation_signal_quality, False),
+    'overlaps': (_bench_overlaps, False),
+    'intervals': (_bench_intervals, False),
+    'channels': (_bench_channels, False),
+    'cross_folder_overlaps': (_bench_cross_folder_overlaps, False),
+    'scan_single_center': (_bench_scan_single_center, False),
+    'timing_warm_manifest': (_bench_timing, True),
+    'scan_single_center_warm_manifest': (_bench_scan_single_center, True),
+}
+
+
+def time_benchmark(benchmark_function, center_dir, n_files, manifest=None, repeats=DEFAULT_REPEATS):
+    """
+    Time one entry point on a center.
+
+    Args:
+        benchmark_function (callable): Function of (center_dir, manifest) to time
+        center_dir (str): Path to the center directory
+        n_files (int): Number of EDF files in the center (for files/sec)
+        manifest (EdfHeaderManifest): Manifest passed to the function (default: None)
+        repeats (int): Number of timed runs; their median is kept (default: DEFAULT_REPEATS)
+
+    Returns:
+        dict: 'seconds' (median), 'min_seconds', 'files_per_second' and 'peak_memory_mb'
+    """
+    run_seconds = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Untimed warm-up run, so the first timed run does not pay for cold file caches and imports
+        benchmark_function(center_dir, manifest)
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            benchmark_function(center_dir, manifest)
+            run_seconds.append(time.perf_counter() - start_time)
+
+        tracemalloc.start()
+        try:
+            benchmark_function(center_dir, manifest)
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    median_seconds = float(np.median(run_seconds))
+    return {'seconds': round(median_seconds, 4),
+            'min_seconds': round(min(run_seconds), 4),
+            'files_per_second': round(n_files / median_seconds, 1) if median_seconds > 0 else None,
+            'peak_memory_mb': round(peak_bytes / 1e6, 2)}
+
+
+def run_benchmarks(profile_name='small', benchmark_names=None, repeats=DEFAULT_REPEATS, work_folder=None,
+                   keep_tree=False):
+    """
+    Generate a synthetic tree and time the entry points on it.
+
+    Args:
+        profile_name (str): Key of BENCHMARK_PROFILES (default: 'small')
+        benchmark_names (list): Benchmarks to run (default: None, every one in BENCHMARKS)
+        repeats (int): Number of timed runs per benchmark (default: DEFAULT_REPEATS)
+        work_folder (str): Folder the tree is generated in (default: None, a temporary folder)
+        keep_tree (bool): Keep the generated tree after the run (default: False)
+
+    Returns:
+        dict: benchmark name -> result of time_benchmark
+    """
+    if profile_name not in BENCHMARK_PROFILES:
+        raise ValueError(f"Unknown profile '{profile_name}', expected one of {list(BENCHMARK_PROFILES)}")
+    if benchmark_names is None:
+        benchmark_names = list(BENCHMARKS)
+
+    root_folder = tempfile.mkdtemp(prefix='edf_bench_', dir=work_folder)
+    try:
+        tree = generate_synthetic_tree(root_folder, **BENCHMARK_PROFILES[profile_name])
+        center_dir = tree['center_dirs'][0]
+        n_files = tree['n_files'] // len(tree['center_dirs'])
+
+        results = {}
+        # Kept in the temporary tree, so it is removed with it
+        with EdfHeaderManifest(root_folder, store_on_share=True) as manifest:
+            for benchmark_name in benchmark_names:
+                benchmark_function, warm_manifest = BENCHMARKS[benchmark_name]
+                benchmark_manifest = manifest if warm_manifest else None
+                if warm_manifest:
+                    # Fill the manifest before timing
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        benchmark_function(center_dir, manifest)
+                    manifest.commit()
+
+                try:
+                    results[benchmark_name] = time_benchmark(benchmark_function, center_dir, n_files,
+                                                             benchmark_manifest, repeats)
+                except Exception as e:
+                    print(f"Error running benchmark {benchmark_name}: {str(e)}")
+                    continue
+                print(f"  {benchmark_name}: {results[benchmark_name]['seconds']:.3f} s, "
+                      f"{results[benchmark_name]['files_per_second']} files/s, "
+                      f"{results[benchmark_name]['peak_memory_mb']} MB peak")
+    finally:
+        if keep_tree:
+            print(f"Synthetic tree kept in {root_folder}")
+        else:
+            shutil.rmtree(root_folder, ignore_errors=True)
+
+    return results
+
+
+def load_baselines(baselines_path=BASELINES_PATH):
+    """
+    Read the stored baselines.
+
+    Args:
+        baselines_path (str): Path of the baselines file (default: BASELINES_PATH)
+
+    Returns:
+        dict: profile name -> {'recorded': date, 'results': {benchmark name -> result}};
+              empty when the file does not exist
+    """
+    if not os.path.exists(baselines_path):
+        return {}
+    with open(baselines_path, 'r', encoding='utf-8') as baselines_file:
+        return json.load(baselines_file)
+
+
+def save_baselines(results, profile_name, baselines_path=BASELINES_PATH):
+    """
+    Store results as the baselines of a profile (other profiles are kept).
+
+    Args:
+        results (dict): Output of run_benchmarks
+        profile_name (str): Profile the results were measured on
+        baselines_path (str): Path of the baselines file (default: BASELINES_PATH)
+    """
+    baselines = load_baselines(baselines_path)
+    baselines[profile_name] = {'recorded': datetime.now().strftime('%Y-%m-%d'), 'results': results}
+    with open(baselines_path, 'w', encoding='utf-8') as baselines_file:
+        json.dump(baselines, baselines_file, indent=2, sort_keys=True)
+        baselines_file.write('\n')
+    print(f"Saved baselines of profile '{profile_name}' to {baselines_path}")
+
+
+def compare_with_baselines(results, profile_baselines, tolerance=REGRESSION_TOLERANCE,
+                           min_seconds=MIN_REGRESSION_SECONDS):
+    """
+    Compare benchmark results with the stored baselines of their profile.
+
+    Args:
+        results (dict): Output of run_benchmarks
+        profile_baselines (dict): Entry of load_baselines() for the profile (may be None)
+        tolerance (float): Relative slowdown reported as a regression (default: 0.25)
+        min_seconds (float): Smallest slowdown in seconds reported as a regression
+            (default: MIN_REGRESSION_SECONDS)
+
+    Returns:
+        pd.DataFrame: One row per benchmark with 'Benchmark', 'Seconds', 'Baseline Seconds',
+                      'Change %', 'Files/sec', 'Peak MB', 'Baseline Peak MB' and 'Status'
+                      ('ok', 'faster', 'REGRESSION' or 'no baseline')
+    """
+    baseline_results = (profile_baselines or {}).get('results', {})
+
+    rows = []
+    for benchmark_name, result in results.items():
+        baseline = baseline_results.get(benchmark_name)
+        row = {'Benchmark': benchmark_name,
+               'Seconds': result['seconds'],
+               'Baseline Seconds': None,
+               'Change %': None,
+               'Files/sec': result['files_per_second'],
+               'Peak MB': result['peak_memory_mb'],
+               'Baseline Peak MB': None,
+               'Status': 'no baseline'}
+        if baseline is not None and baseline['seconds'] > 0:
+            change = result['seconds'] / baseline['seconds'] - 1
+            significant = abs(result['seconds'] - baseline['seconds']) > min_seconds
+            row['Baseline Seconds'] = baseline['seconds']
+            row['Change %'] = round(100 * change, 1)
+            row['Baseline Peak MB'] = baseline['peak_memory_mb']
+            if change > tolerance and significant:
+                row['Status'] = 'REGRESSION'
+            elif change < -tolerance and significant:
+                row['Status'] = 'faster'
+            else:
+                row['Status'] = 'ok'
+        rows.append(row)
+
+    comparison = pd.DataFrame(rows)
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(comparison.to_string(index=False))
+    n_regressions = int((comparison['Status'] == 'REGRESSION').sum()) if not comparison.empty else 0
+    print(f"{n_regressions} regression(s) over {int(tolerance * 100)}% slower than the baseline")
+    return comparison
+
+
+if __name__ == '__main__':
+    # CONFIGURATION
+    PROFILE = 'small'
+    REPEATS = DEFAULT_REPEATS
+    BENCHMARK_NAMES = None  # None runs every benchmark, e.g. ['timing', 'scan_single_center']
+
+    benchmark_results = run_benchmarks(profile_name=PROFILE, benchmark_names=BENCHMARK_NAMES, repeats=REPEATS)
+
+    # ------ Option 1: Compare with the stored baselines ------
+    compare_with_baselines(benchmark_results, load_baselines().get(PROFILE))
+
+    # ------ Option 2: Store this run as the new baselines ------
+    # Uncomment after a change that is meant to alter the timings, or on a new machine:
+    # save_baselines(benchmark_results, PROFILE)
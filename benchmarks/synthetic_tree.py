@@ -0,0 +1,160 @@
+"""
+Synthetic Center Tree Generator
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Writes a tree of synthetic EDF+ recordings laid out like the sites' uploads, so
+the scanner scripts can be run and timed without access to the Z: share:
+
+    root_folder/
+    ├── 10.SYNTH/
+    │   ├── 10-0001 (2017)/
+    │   │   ├── diagnosis/
+    │   │   │   ├── 10-0001_DX_01.edf
+    │   │   │   └── ...
+    │   │   └── follow up/
+    │   │       └── 10-0001_FU_01.edf
+    │   └── ...
+    └── 11.SYNTH/
+        └── ...
+
+Every file of a folder starts overlap_seconds before the previous one ends, so the
+overlap reports have rows to build, and the follow-up recordings start
+follow_up_days after the diagnosis recordings. Channels are named like the sites'
+labels ("EEG Fp1-Ref", ...) and take their sampling rates from
+sampling_frequencies in turn. The signal is low-amplitude noise written as digital
+values, which keeps generating large trees fast.
+
+Usage:
+    generate_synthetic_tree("path/to/bench-root", centers=1, patients_per_center=10,
+                            files_per_folder=3, n_channels=19, duration_seconds=60)
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pyedflib
+
+
+# Channel labels used for the synthetic recordings, in the order they are written
+SYNTHETIC_CHANNEL_LABELS = [
+    'EEG Fp1-Ref', 'EEG Fp2-Ref', 'EEG F3-Ref', 'EEG F4-Ref', 'EEG C3-Ref', 'EEG C4-Ref',
+    'EEG P3-Ref', 'EEG P4-Ref', 'EEG O1-Ref', 'EEG O2-Ref', 'EEG F7-Ref', 'EEG F8-Ref',
+    'EEG T3-Ref', 'EEG T4-Ref', 'EEG T5-Ref', 'EEG T6-Ref', 'EEG Fz-Ref', 'EEG Cz-Ref',
+    'EEG Pz-Ref', 'EEG A1-Ref', 'EEG A2-Ref', 'EKG1', 'EKG2', 'EMG1', 'EMG2', 'Eye1', 'Eye2'
+]
+
+# Start of the first diagnosis recording of the first patient
+FIRST_RECORDING_START = datetime(2017, 1, 2, 8, 0, 0)
+
+
+def channel_labels(n_channels):
+    """
+    Labels of the first n_channels synthetic channels.
+
+    Args:
+        n_channels (int): Number of channels
+
+    Returns:
+        list: Channel labels; channels past the standard ones are named "EEG X<n>-Ref"
+    """
+    labels = SYNTHETIC_CHANNEL_LABELS[:n_channels]
+    labels += [f'EEG X{index + 1}-Ref' for index in range(n_channels - len(labels))]
+    return labels
+
+
+def write_synthetic_edf(full_path, labels, sampling_frequencies, duration_seconds, start_datetime,
+                        random_state=None):
+    """
+    Write one synthetic EDF+ file.
+
+    Args:
+        full_path (str): Path of the EDF file
+        labels (list): Channel labels
+        sampling_frequencies (list): Sampling rate of each channel (Hz, whole numbers)
+        duration_seconds (int): Length of the recording in seconds (whole data records of 1 s)
+        start_datetime (datetime): Start of the recording
+        random_state (np.random.Generator): Source of the signal values (default: None, seeded with 0)
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    if random_state is None:
+        random_state = np.random.default_rng(0)
+
+    signal_headers = [{'label': label, 'dimension': 'uV', 'sample_frequency': sampling_frequency,
+                       'physical_max': 3276.7, 'physical_min': -3276.8,
+                       'digital_max': 32767, 'digital_min': -32768,
+                       'transducer': '', 'prefilter': ''}
+                      for label, sampling_frequency in zip(labels, sampling_frequencies)]
+    signals = [random_state.integers(-500, 500, size=int(sampling_frequency * duration_seconds), dtype=np.int32)
+               for sampling_frequency in sampling_frequencies]
+
+    edf_writer = pyedflib.EdfWriter(full_path, len(labels), file_type=pyedflib.FILETYPE_EDFPLUS)
+    try:
+        edf_writer.setSignalHeaders(signal_headers)
+        edf_writer.setStartdatetime(start_datetime)
+        edf_writer.writeSamples(signals, digital=True)
+    finally:
+        edf_writer.close()
+    return os.path.getsize(full_path)
+
+
+def generate_synthetic_tree(root_folder, centers=1, patients_per_center=10, files_per_folder=3,
+                            n_channels=19, duration_seconds=60, sampling_frequencies=(256,),
+                            diagnosis_folder_name="diagnosis", follow_up_folder_name="follow up",
+                            overlap_seconds=5, follow_up_days=180, seed=0):
+    """
+    Write a synthetic center/patient/diagnosis|follow up tree of EDF files.
+
+    Args:
+        root_folder (str): Folder the center folders are written into (created if needed)
+        centers (int): Number of centers (default: 1)
+        patients_per_center (int): Number of patients per center (default: 10)
+        files_per_folder (int): EDF files in each diagnosis and follow-up folder (default: 3)
+        n_channels (int): Channels per EDF file (default: 19)
+        duration_seconds (int): Length of every recording in seconds (default: 60)
+        sampling_frequencies (tuple): Sampling rates assigned to the channels in turn (default: (256,))
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        overlap_seconds (int): How long each file overlaps the previous one of its folder (default: 5)
+        follow_up_days (int): Days between the diagnosis and follow-up recordings (default: 180)
+        seed (int): Seed of the signal values (default: 0)
+
+    Returns:
+        dict: 'center_dirs' (list of center paths), 'n_files' and 'total_bytes'
+    """
+    labels = channel_labels(n_channels)
+    channel_frequencies = [sampling_frequencies[index % len(sampling_frequencies)] for index in range(n_channels)]
+    random_state = np.random.default_rng(seed)
+    file_step = timedelta(seconds=duration_seconds - overlap_seconds)
+
+    center_dirs = []
+    n_files = 0
+    total_bytes = 0
+    for center_index in range(centers):
+        center_code = 10 + center_index
+        center_dir = os.path.join(root_folder, f'{center_code}.SYNTH')
+        center_dirs.append(center_dir)
+
+        for patient_index in range(patients_per_center):
+            patient_code = f'{center_code}-{patient_index + 1:04d}'
+            patient_dir = os.path.join(center_dir, f'{patient_code} (2017)')
+            patient_start = FIRST_RECORDING_START + timedelta(days=patient_index)
+
+            for folder_name, tag, folder_start in [
+                    (diagnosis_folder_name, 'DX', patient_start),
+                    (follow_up_folder_name, 'FU', patient_start + timedelta(days=follow_up_days))]:
+                folder_path = os.path.join(patient_dir, folder_name)
+                os.makedirs(folder_path, exist_ok=True)
+                for file_index in range(files_per_folder):
+                    full_path = os.path.join(folder_path, f'{patient_code}_{tag}_{file_index + 1:02d}.edf')
+                    total_bytes += write_synthetic_edf(full_path, labels, channel_frequencies, duration_seconds,
+                                                       folder_start + file_index * file_step, random_state)
+                    n_files += 1
+
+    print(f"Wrote {n_files} synthetic EDF files ({total_bytes / 1e6:.1f} MB) to {root_folder}")
+    return {'center_dirs': center_dirs, 'n_files': n_files, 'total_bytes': total_bytes}
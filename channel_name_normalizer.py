@@ -0,0 +1,104 @@
+"""
+EEG Channel Name Normalizer
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Sites label the same electrode in many ways ("EEG Fp1-Ref", "FP1", "Fp1-Org",
+"T7" for T3, ...). This module turns a raw EDF channel label into one canonical
+name:
+    1. A precompiled regex strips the "EEG" prefix and the "-Ref"/"-Org" suffix
+       (only as a prefix/suffix, so the name itself is never cut into fragments;
+       the prefix may be glued to the name, "EEGFp1", but "EEG1" is left alone)
+    2. The canonical spelling is looked up ignoring case ("FP1", "fp1" -> "Fp1")
+    3. Optionally, site-specific variants are mapped through CHANNEL_ALIASES
+       ("T7" -> "T3", "M1" -> "A1", ...)
+Labels that are not in the tables keep their (stripped) text.
+
+Results are memoized in a bounded LRU cache, since the same few labels repeat in
+every EDF of a site, and normalize_channel_column applies the normalizer to a
+whole pandas column by normalizing each distinct label once.
+
+Usage:
+    normalize_channel_name("EEG FP1-Ref")          # 'Fp1'
+    normalize_channel_name("EEG T7-Ref")           # 'T3'
+    normalize_channel_name("T7", use_aliases=False) # 'T7'
+    labels_df[edf_filename] = normalize_channel_column(labels_df[edf_filename])
+"""
+
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+
+# Canonical spelling of the channel names (10-20 system + additional channels)
+CANONICAL_CHANNEL_NAMES = [
+    'Fp1', 'Fp2', 'Fpz', 'F3', 'F4', 'C3', 'C4', 'P3', 'P4', 'O1', 'O2', 'Oz',
+    'F7', 'F8', 'T3', 'T4', 'T5', 'T6', 'Fz', 'Cz', 'Pz',
+    'A1', 'A2', 'Eye1', 'Eye2', 'EKG1', 'EKG2', 'EMG1', 'EMG2'
+]
+
+# Site-specific variants -> canonical name (keys are compared ignoring case)
+CHANNEL_ALIASES = {
+    'T7': 'T3',
+    'T8': 'T4',
+    'P7': 'T5',
+    'P8': 'T6',
+    'M1': 'A1',
+    'M2': 'A2',
+    'ECG1': 'EKG1',
+    'ECG2': 'EKG2',
+}
+
+# Number of distinct (label, use_aliases) results kept in the cache
+NORMALIZATION_CACHE_SIZE = 4096
+
+# "EEG " / "EEG-" / "EEG" (before a letter) prefix and "-Ref" / " Org" suffix around the channel name
+_LABEL_PATTERN = re.compile(r"^\s*(?:EEG(?:[\s_-]+|(?=[A-Z])))?(?P<name>.*?)(?:[\s_-]+(?:REF|ORG))?\s*$",
+                            re.IGNORECASE)
+
+_CANONICAL_BY_KEY = {channel_name.lower(): channel_name for channel_name in CANONICAL_CHANNEL_NAMES}
+_ALIAS_BY_KEY = {alias.lower(): channel_name for alias, channel_name in CHANNEL_ALIASES.items()}
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def normalize_channel_name(label: str, use_aliases: bool = True) -> str:
+    """
+    Normalize one EDF channel label.
+
+    Args:
+        label: Raw channel label
+        use_aliases: Also map site-specific variants through CHANNEL_ALIASES (default: True)
+
+    Returns:
+        str: Canonical channel name, or the stripped label when it is not a known channel
+
+    Example:
+        'EEG-Fp1-Ref' -> 'Fp1'
+        'EEG FZ-Org' -> 'Fz'
+        'EEGFp1' -> 'Fp1'
+        'EEG T7-Ref' -> 'T3' (with use_aliases)
+    """
+    name = _LABEL_PATTERN.match(label).group('name') or label.strip()
+    key = name.lower()
+    if use_aliases and key in _ALIAS_BY_KEY:
+        return _ALIAS_BY_KEY[key]
+    return _CANONICAL_BY_KEY.get(key, name)
+
+
+def normalize_channel_column(labels: pd.Series, use_aliases: bool = True) -> pd.Series:
+    """
+    Normalize a whole column of channel labels, each distinct label once.
+
+    Args:
+        labels: Series of raw channel labels (missing values stay missing)
+        use_aliases: Also map site-specific variants through CHANNEL_ALIASES (default: True)
+
+    Returns:
+        pd.Series: Normalized labels with the same index
+    """
+    distinct_labels = labels.dropna().unique()
+    normalized = {label: normalize_channel_name(str(label), use_aliases) for label in distinct_labels}
+    return labels.map(normalized)
@@ -0,0 +1,219 @@
+"""
+In-Memory Comprehensive Report Pipeline
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+generate_comprehensive_report reads a hand-assembled *_overall_report_input.xlsx,
+which means running the timing, duration summary, fs validation, channel and
+interval scripts, writing their workbooks and copying the sheets into one file.
+This script builds the same input sheets straight from the single-pass scanner
+(scan_center_tree) and passes them to build_comprehensive_report in memory:
+
+    scan_single_center results          ->  input sheet
+    'timing' (summarize_patient_durations)  'EDF Duration'
+    'intervals'                             'FU-DX interval'
+    'fs_matching_DX' / 'fs_matching_FU'     'fs-matching DX' / 'fs-matching FU'
+    'channels_DX' + 'channels_FU'           'Channel Labels'
+
+The 'Channel Labels' sheet has one row per EDF and one column per standard channel
+(STANDARD_CHANNEL_NAMES of get_channel_harmonization_report), holding the label
+found in the EDF or '***' when the channel is missing. Labels are matched after
+normalization (channel_name_normalizer, including site aliases such as T7 -> T3).
+
+Output:
+    comprehensive_report.xlsx (root folder): One sheet per center
+
+Usage:
+    # One center (returns the DataFrame)
+    report = build_center_comprehensive_report(center_dir="path/to/center/")
+
+    # All centers, written to one workbook
+    build_all_centers_comprehensive_reports(root_folder="path/to/root/")
+"""
+
+import contextlib
+import os
+
+import pandas as pd
+
+from channel_name_normalizer import normalize_channel_column
+from edf_header_manifest import EdfHeaderManifest
+from extract_Comprehensive_report import MISSING_CHANNEL_MARKER, build_comprehensive_report
+from get_channel_harmonization_report import STANDARD_CHANNEL_NAMES
+from get_patient_eeg_length_summary import summarize_patient_durations
+from run_instrumentation import instrumented_run
+from scan_center_tree import scan_single_center
+from workbook_sink import WorkbookSink, write_sheet
+
+
+def build_channel_labels_sheet(channel_label_frames, standard_channels=STANDARD_CHANNEL_NAMES):
+    """
+    Build the 'Channel Labels' sheet from the per-patient channel label DataFrames.
+
+    Args:
+        channel_label_frames (list): DataFrames with one column of labels per EDF file
+            (the values of scan_single_center's 'channels_DX'/'channels_FU' dicts)
+        standard_channels (list): Channel columns of the sheet (default: STANDARD_CHANNEL_NAMES)
+
+    Returns:
+        pd.DataFrame: 'identifier' (EDF file name) plus one column per standard channel
+    """
+    standard_set = set(standard_channels)
+
+    rows = []
+    for labels_df in channel_label_frames:
+        for edf_filename in labels_df.columns:
+            row = dict.fromkeys(standard_channels, MISSING_CHANNEL_MARKER)
+            row['identifier'] = edf_filename
+            edf_labels = labels_df[edf_filename].dropna()
+            for label, channel_name in zip(edf_labels, normalize_channel_column(edf_labels)):
+                if channel_name in standard_set and row[channel_name] == MISSING_CHANNEL_MARKER:
+                    row[channel_name] = label
+            rows.append(row)
+    return pd.DataFrame(rows, columns=['identifier'] + list(standard_channels))
+
+
+def report_sheets_from_scan(scan_results, min_duration_seconds=120):
+    """
+    Build the input sheets of build_comprehensive_report from scanner results.
+
+    Args:
+        scan_results (dict): Output of scan_center_tree.scan_single_center
+        min_duration_seconds (int): Minimum duration threshold in seconds (default: 120)
+
+    Returns:
+        dict: Sheet name -> DataFrame, named like the sheets of *_overall_report_input.xlsx
+    """
+    timing_df = scan_results['timing']
+    if timing_df.empty:
+        duration_df = pd.DataFrame(columns=['PatientID', 'Sum_Duration', 'Max_Duration',
+                                            'duration_max_above_120'])
+    else:
+        duration_df = summarize_patient_durations(timing_df, min_duration_seconds)
+
+    channel_label_frames = list(scan_results['channels_DX'].values()) + list(scan_results['channels_FU'].values())
+
+    return {'EDF Duration': duration_df,
+            'FU-DX interval': scan_results['intervals'],
+            'fs-matching DX': scan_results['fs_matching_DX'].copy(),
+            'fs-matching FU': scan_results['fs_matching_FU'].copy(),
+            'Channel Labels': build_channel_labels_sheet(channel_label_frames)}
+
+
+def build_center_comprehensive_report(center_dir, diagnosis_folder_name="diagnosis",
+                                      follow_up_folder_name="follow up",
+                                      min_duration_seconds=120, manifest=None, max_concurrent_reads=1):
+    """
+    Scan one center and build its comprehensive report in memory.
+
+    Args:
+        center_dir (str): Path to the center directory
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        min_duration_seconds (int): Minimum duration threshold in seconds (default: 120)
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+
+    Returns:
+        pd.DataFrame: Comprehensive report of the center (see build_comprehensive_report)
+    """
+    scan_results = scan_single_center(center_dir,
+                                      diagnosis_folder_name=diagnosis_folder_name,
+                                      follow_up_folder_name=follow_up_folder_name,
+                                      min_duration_seconds=min_duration_seconds,
+                                      manifest=manifest,
+                                      max_concurrent_reads=max_concurrent_reads)
+    return build_comprehensive_report(report_sheets_from_scan(scan_results, min_duration_seconds))
+
+
+def build_all_centers_comprehensive_reports(root_folder, diagnosis_folder_name="diagnosis",
+                                            follow_up_folder_name="follow up",
+                                            excel_filename="comprehensive_report.xlsx",
+                                            min_duration_seconds=120, use_manifest=True,
+                                            max_concurrent_reads=1, output_format="excel",
+                                            instrument=False):
+    """
+    Build the comprehensive report of every center in one process.
+
+    Args:
+        root_folder (str): Path to root directory containing center folders
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        excel_filename (str): Output file in root_folder, one sheet per center
+            (default: "comprehensive_report.xlsx"; None to only return the reports)
+        min_duration_seconds (int): Minimum duration threshold in seconds (default: 120)
+        use_manifest (bool): Reuse headers cached in the root folder's header manifest, a
+            local file in MANIFEST_CACHE_FOLDER (see edf_header_manifest) (default: True)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+        output_format (str): 'excel' (default), 'parquet', 'feather' or 'csv'. Columnar
+            formats write one file per sheet next to the workbook path (see workbook_sink)
+        instrument (bool): Record per-stage wall time, EDF opens, bytes read and per-file
+            read latencies, and write them to {excel stem}_run_report.json in root_folder
+            (default: False; see run_instrumentation)
+
+    Returns:
+        dict: center_name -> comprehensive report DataFrame
+    """
+    if not os.path.exists(root_folder):
+        raise FileNotFoundError(f"Root folder not found: {root_folder}")
+
+    with instrumented_run(root_folder, excel_filename or "comprehensive_report", instrument):
+        # Get all center directories
+        center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
+        center_names = [os.path.basename(center_dir) for center_dir in center_directories]
+        print(f"Found {len(center_names)} centers to process")
+
+        with (EdfHeaderManifest(root_folder) if use_manifest else contextlib.nullcontext()) as manifest:
+            sink = WorkbookSink(output_format=output_format)
+
+            all_reports = {}
+            for center_idx, center_directory in enumerate(center_directories):
+                center_name = center_names[center_idx]
+                print(f"Processing Center {center_idx + 1}/{len(center_directories)}: {center_name}")
+                try:
+                    center_report = build_center_comprehensive_report(center_directory,
+                                                                      diagnosis_folder_name=diagnosis_folder_name,
+                                                                      follow_up_folder_name=follow_up_folder_name,
+                                                                      min_duration_seconds=min_duration_seconds,
+                                                                      manifest=manifest,
+                                                                      max_concurrent_reads=max_concurrent_reads)
+                except Exception as e:
+                    print(f"Error building the comprehensive report of {center_name}: {str(e)}")
+                    continue
+
+                all_reports[center_name] = center_report
+                if excel_filename is not None and not center_report.empty:
+                    write_sheet(center_report, os.path.join(root_folder, excel_filename), center_name, sink=sink)
+
+            sink.write()
+
+    return all_reports
+
+
+if __name__ == '__main__':
+    # CONFIGURATION
+    DIAGNOSIS_FOLDER = "diagnosis"
+    FOLLOWUP_FOLDER = "follow up"
+    MIN_DURATION_SECONDS = 120
+
+    # ------ Option 1: ALL Centers ------
+    # Uncomment to process multiple centers:
+    # build_all_centers_comprehensive_reports(
+    #     root_folder="Z:/uci_vmostaghimi/testing-root/",
+    #     diagnosis_folder_name=DIAGNOSIS_FOLDER,
+    #     follow_up_folder_name=FOLLOWUP_FOLDER,
+    #     min_duration_seconds=MIN_DURATION_SECONDS
+    # )
+
+    # ------ Option 2: SINGLE Center ------
+    CENTER_DIR = 'Z:/uci_vmostaghimi/23.uconn_jmadan_new'
+    center_report = build_center_comprehensive_report(
+        center_dir=CENTER_DIR,
+        diagnosis_folder_name=DIAGNOSIS_FOLDER,
+        follow_up_folder_name=FOLLOWUP_FOLDER,
+        min_duration_seconds=MIN_DURATION_SECONDS
+    )
+    write_sheet(center_report, os.path.join(CENTER_DIR, 'comprehensive_report.xlsx'),
+                'comprehensive_report', mode='w')
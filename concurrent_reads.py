@@ -0,0 +1,54 @@
+"""
+Concurrent File Reads
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+On the mapped network drive almost all of the scanning time is spent waiting on
+open/seek/read round trips, not on parsing. This module keeps several reads in
+flight at once using a bounded thread pool. The number of concurrent reads is
+capped by max_concurrent_reads so it can be tuned against the file server.
+
+Results are returned in the order of the input paths, so the folder scanners
+produce the same rows in the same order as with sequential reads.
+
+Usage:
+    results = read_concurrently(read_edf_header, full_paths, max_concurrent_reads=16)
+    for full_path, (edf_header, error) in zip(full_paths, results):
+        ...
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from run_instrumentation import instrumented_stage
+
+
+def _read_one(read_function, full_path):
+    """Call read_function, returning (value, None) or (None, exception)."""
+    try:
+        return read_function(full_path), None
+    except Exception as e:
+        return None, e
+
+
+def read_concurrently(read_function, full_paths, max_concurrent_reads=1):
+    """
+    Apply a per-file read function to many files with bounded concurrency.
+
+    Args:
+        read_function (callable): Function of one full path (e.g. read_edf_header)
+        full_paths (list): Full paths of the files to read
+        max_concurrent_reads (int): Maximum number of reads in flight (default: 1, sequential)
+
+    Returns:
+        list: (value, error) tuples in input order; error is the raised exception
+              or None, value is None when the read failed
+    """
+    full_paths = list(full_paths)
+    with instrumented_stage('file_reads'):
+        if max_concurrent_reads is None or max_concurrent_reads <= 1 or len(full_paths) <= 1:
+            return [_read_one(read_function, full_path) for full_path in full_paths]
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrent_reads, len(full_paths))) as executor:
+            return list(executor.map(lambda full_path: _read_one(read_function, full_path), full_paths))
@@ -0,0 +1,174 @@
+"""
+Memory-Mapped EDF Data Records
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Checks that need the samples themselves (the sampling frequency validation,
+signal quality metrics) used to go through pyedflib's readSignal, which allocates
+a full array per channel. This module maps the data-record region of an EDF file
+with numpy.memmap instead, without reading or copying anything up front:
+
+    EDF file:  | header (header_bytes) | record 0 | record 1 | ... | record n-1 |
+    record:    | signal 0 samples | signal 1 samples | ... | annotation signal |
+
+EdfDataRecords.records is a zero-copy (n_records, samples_per_record_total) int16
+view of the data records. signal_records(k) slices the columns of one signal out
+of it, which is still a strided view of the file, and iter_signal_chunks walks a
+signal a few records at a time, so only one chunk is in memory at once no matter
+how long the recording is.
+
+Signals are numbered like pyedflib.EdfReader: signal_index counts the ordinary
+signals only (annotation signals are skipped), so signal_records(0) holds the
+samples of readSignal(0, digital=True).
+
+Usage:
+    with EdfDataRecords("path/to/file.edf") as data_records:
+        print(data_records.n_records, data_records.signal_length(0))
+        for chunk in data_records.iter_signal_chunks(0, physical=True):
+            ...
+
+Note:
+    Only 16-bit EDF/EDF+ files can be viewed as int16; BDF files (24-bit samples)
+    raise a ValueError. Only complete data records are mapped: a truncated last
+    record (e.g. of a recording that was still being written) is left out.
+"""
+
+import numpy as np
+
+from edf_header_reader import read_edf_header
+
+
+# Data records per chunk in iter_signal_chunks / iter_record_chunks
+DEFAULT_RECORDS_PER_CHUNK = 256
+
+
+class EdfDataRecords:
+    """
+    Memory-mapped data records of one EDF file.
+
+    Attributes:
+        full_path: Path of the EDF file
+        header: EdfHeader of the file
+        n_records: Number of complete data records mapped
+        records: Read-only (n_records, samples_per_record_total) int16 view of the
+            data records (None after close)
+    """
+
+    def __init__(self, full_path, edf_header=None):
+        """
+        Map the data records of an EDF file.
+
+        Args:
+            full_path (str): Full path to the EDF file
+            edf_header (EdfHeader): Header of the file if already read (default: None, read it)
+
+        Raises:
+            ValueError: If the file is a BDF file or its header is invalid
+        """
+        self.full_path = full_path
+        self.header = edf_header if edf_header is not None else read_edf_header(full_path)
+        if self.header.bytes_per_sample != 2:
+            raise ValueError(f"Only 16-bit EDF files can be memory-mapped, not BDF: {full_path}")
+
+        # Column where each signal (all signals, including annotations) starts in a record
+        self._record_offsets = np.concatenate([[0], np.cumsum(self.header.samples_per_record)]).astype(int)
+        self._ordinary_positions = self.header.signal_indices
+
+        self.n_records = max(min(self.header.n_data_records, self.header.n_data_records_on_disk), 0)
+        record_samples = int(self._record_offsets[-1])
+        if self.n_records == 0 or record_samples == 0:
+            self.records = np.empty((0, record_samples), dtype='<i2')
+        else:
+            self.records = np.memmap(full_path, dtype='<i2', mode='r', offset=self.header.header_bytes,
+                                     shape=(self.n_records, record_samples))
+
+    def _position(self, signal_index):
+        """Position among all signals of the ordinary signal signal_index."""
+        if not 0 <= signal_index < len(self._ordinary_positions):
+            raise IndexError(f"Signal {signal_index} out of range "
+                             f"({len(self._ordinary_positions)} signals in {self.full_path})")
+        return self._ordinary_positions[signal_index]
+
+    def samples_per_record(self, signal_index):
+        """Number of samples of a signal in one data record."""
+        return self.header.samples_per_record[self._position(signal_index)]
+
+    def signal_length(self, signal_index):
+        """Number of samples of a signal in the mapped data records."""
+        return self.n_records * self.samples_per_record(signal_index)
+
+    def signal_columns(self, signal_index):
+        """Columns of a signal within a data record (a slice of the columns of records)."""
+        position = self._position(signal_index)
+        return slice(int(self._record_offsets[position]), int(self._record_offsets[position + 1]))
+
+    def signal_records(self, signal_index):
+        """
+        Zero-copy view of one signal.
+
+        Args:
+            signal_index (int): Ordinary signal number (as in pyedflib.EdfReader)
+
+        Returns:
+            np.ndarray: (n_records, samples_per_record) strided int16 view; row r holds
+                        the samples of data record r
+        """
+        return self.records[:, self.signal_columns(signal_index)]
+
+    def physical_scale(self, signal_index):
+        """
+        Scaling from digital to physical values of a signal.
+
+        Returns:
+            tuple: (gain, offset) such that physical = gain * digital + offset
+        """
+        position = self._position(signal_index)
+        digital_range = self.header.digital_max[position] - self.header.digital_min[position]
+        if digital_range == 0:
+            return 1.0, 0.0
+        gain = (self.header.physical_max[position] - self.header.physical_min[position]) / digital_range
+        return gain, self.header.physical_min[position] - gain * self.header.digital_min[position]
+
+    def iter_signal_chunks(self, signal_index, records_per_chunk=DEFAULT_RECORDS_PER_CHUNK, physical=False):
+        """
+        Walk one signal a few data records at a time.
+
+        Args:
+            signal_index (int): Ordinary signal number (as in pyedflib.EdfReader)
+            records_per_chunk (int): Data records per chunk (default: DEFAULT_RECORDS_PER_CHUNK)
+            physical (bool): Yield physical values (float64) instead of digital int16 (default: False)
+
+        Yields:
+            np.ndarray: 1-D samples of consecutive data records; only this chunk is
+                        copied into memory
+        """
+        signal_view = self.signal_records(signal_index)
+        gain, offset = self.physical_scale(signal_index) if physical else (1.0, 0.0)
+        for first_record in range(0, self.n_records, records_per_chunk):
+            chunk = signal_view[first_record:first_record + records_per_chunk].reshape(-1)
+            yield chunk * gain + offset if physical else chunk
+
+    def iter_record_chunks(self, records_per_chunk=DEFAULT_RECORDS_PER_CHUNK):
+        """
+        Walk the data records of all signals a few records at a time.
+
+        Args:
+            records_per_chunk (int): Data records per chunk (default: DEFAULT_RECORDS_PER_CHUNK)
+
+        Yields:
+            np.ndarray: (records in chunk, samples_per_record_total) int16 views of the file
+        """
+        for first_record in range(0, self.n_records, records_per_chunk):
+            yield self.records[first_record:first_record + records_per_chunk]
+
+    def close(self):
+        """Drop the mapping (views taken from records keep the file mapped until released)."""
+        self.records = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
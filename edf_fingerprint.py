@@ -0,0 +1,292 @@
+"""
+EDF Content Fingerprints and Duplicate Index
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Finds EDF files that hold the same recording under another name or with a
+rewritten header (e.g. a de-identified copy, or a file renamed in its folder),
+which the timestamp-based overlap detection misses.
+
+Each EDF gets a fingerprint made of:
+    - data_digest: Hash of a fixed number of data records sampled evenly over the
+      file (always the first and the last), ordinary signals only
+    - layout_digest: Hash of the header fields that describe the data: number of
+      records, record duration, samples per record and scaling of every signal.
+      Patient, recording, start time and labels are left out, so rewriting them
+      keeps the fingerprint
+    - header_digest: Hash of the raw header bytes, to tell exact copies from copies
+      with a rewritten header
+Only the header and the sampled records are read, so the cost and memory per
+file do not depend on the length of the recording.
+
+find_duplicate_edfs fingerprints every EDF below the root folder in one pass and
+lists the files that share a fingerprint.
+
+Output:
+    root_folder/duplicate_edfs.xlsx: One row per file of each duplicate group
+        - 'Group': Number of the duplicate group
+        - 'Center', 'Path': Center folder and path relative to it
+        - 'EDF': File name
+        - 'Renamed': File name differs from the first file of the group
+        - 'Same Header': Raw header equals the one of the first file of the group
+        - 'Start DateTime', 'Duration (s)': From the header of the file
+        - 'Fingerprint'
+
+Usage:
+    fingerprint = compute_edf_fingerprint("path/to/file.edf")
+    find_duplicate_edfs(root_folder="path/to/root/", workers=4)
+
+Note:
+    Files are compared by the sampled records only, so two files that differ in
+    records that were not sampled get the same fingerprint. With the default 32
+    sampled records this needs recordings that are identical in layout and in all
+    sampled records, which does not happen for separate recordings in practice.
+"""
+
+import contextlib
+import hashlib
+import os
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from concurrent_reads import read_concurrently
+from edf_header_manifest import EdfHeaderManifest
+from edf_header_reader import read_edf_header
+from parallel_map import map_in_order
+from run_instrumentation import instrumented_run, instrumented_stage, record_file_read
+from workbook_sink import write_sheet
+
+
+# Manifest key under which fingerprints are cached
+FINGERPRINT_MANIFEST_KEY = 'fingerprint'
+
+# Data records hashed per file (spread evenly, including the first and the last)
+DEFAULT_SAMPLED_RECORDS = 32
+
+DUPLICATE_COLUMNS = ['Group', 'Center', 'Path', 'EDF', 'Renamed', 'Same Header',
+                     'Start DateTime', 'Duration (s)', 'Fingerprint']
+
+
+def _digest(*parts):
+    """Hex digest of byte strings."""
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(part)
+    return hasher.hexdigest()
+
+
+def sampled_record_indices(n_records, sampled_records=DEFAULT_SAMPLED_RECORDS):
+    """
+    Data records hashed for a file with n_records records.
+
+    Returns:
+        list: Sorted record numbers, evenly spread and including the first and the last
+    """
+    if n_records <= 0:
+        return []
+    if n_records <= sampled_records:
+        return list(range(n_records))
+    return sorted(set(np.linspace(0, n_records - 1, sampled_records).round().astype(int).tolist()))
+
+
+def compute_edf_fingerprint(full_path, sampled_records=DEFAULT_SAMPLED_RECORDS):
+    """
+    Compute the content fingerprint of an EDF/BDF file.
+
+    Args:
+        full_path (str): Full path to the EDF file
+        sampled_records (int): Number of data records hashed (default: DEFAULT_SAMPLED_RECORDS)
+
+    Returns:
+        dict: 'fingerprint', 'data_digest', 'layout_digest', 'header_digest',
+              'n_records', 'start_datetime' (ISO format) and 'duration_seconds'
+    """
+    start_time = time.perf_counter()
+    edf_header = read_edf_header(full_path)
+    n_records = edf_header.n_data_records_on_disk
+    record_bytes = edf_header.record_bytes
+    signal_positions = edf_header.signal_indices
+
+    # Byte range of every ordinary signal within a data record
+    signal_offsets = np.concatenate([[0], np.cumsum(edf_header.samples_per_record)]) * edf_header.bytes_per_sample
+    signal_ranges = [(int(signal_offsets[position]), int(signal_offsets[position + 1]))
+                     for position in signal_positions]
+
+    layout = repr((n_records, edf_header.record_duration, edf_header.bytes_per_sample,
+                   [(edf_header.samples_per_record[position], edf_header.physical_min[position],
+                     edf_header.physical_max[position], edf_header.digital_min[position],
+                     edf_header.digital_max[position]) for position in signal_positions]))
+
+    data_hasher = hashlib.blake2b(digest_size=16)
+    bytes_read = edf_header.header_bytes
+    with open(full_path, 'rb') as edf_file:
+        raw_header = edf_file.read(edf_header.header_bytes)
+        for record_index in sampled_record_indices(n_records, sampled_records):
+            edf_file.seek(edf_header.header_bytes + record_index * record_bytes)
+            record = edf_file.read(record_bytes)
+            bytes_read += len(record)
+            # Annotation signals are left out: their onsets and texts may be rewritten
+            for start, stop in signal_ranges:
+                data_hasher.update(record[start:stop])
+    record_file_read('edf_fingerprint', time.perf_counter() - start_time, bytes_read, 'fingerprint_opens')
+
+    data_digest = data_hasher.hexdigest()
+    layout_digest = _digest(layout.encode('ascii'))
+    return {"fingerprint": _digest(layout_digest.encode('ascii'), data_digest.encode('ascii')),
+            "data_digest": data_digest,
+            "layout_digest": layout_digest,
+            "header_digest": _digest(raw_header),
+            "n_records": int(n_records),
+            "start_datetime": edf_header.start_datetime.isoformat(),
+            "duration_seconds": float(edf_header.duration_seconds)}
+
+
+def read_edf_fingerprint_cached(full_path, manifest=None):
+    """
+    Compute the fingerprint through the manifest if one is given.
+
+    Args:
+        full_path (str): Full path to the EDF file
+        manifest (EdfHeaderManifest or None): Manifest to use, or None to always read the file
+
+    Returns:
+        dict: See compute_edf_fingerprint
+    """
+    if manifest is None:
+        return compute_edf_fingerprint(full_path)
+    return manifest.get_cached_value(full_path, FINGERPRINT_MANIFEST_KEY, compute_edf_fingerprint)
+
+
+def fingerprint_center(center_dir, manifest=None, max_concurrent_reads=1):
+    """
+    Fingerprint every EDF file below a center folder.
+
+    Args:
+        center_dir (str): Path to the center directory
+        manifest (EdfHeaderManifest): Optional manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of files read at the same time (default: 1)
+
+    Returns:
+        list: One dict per file with 'Center', 'Path', 'EDF' and the fingerprint values
+    """
+    center_name = os.path.basename(os.path.normpath(center_dir))
+    print(f"\nFingerprinting Center: {center_name}")
+
+    full_paths = []
+    with instrumented_stage('listing'):
+        for folder_path, folder_names, file_names in os.walk(center_dir):
+            folder_names.sort()
+            full_paths.extend(os.path.join(folder_path, file_name) for file_name in sorted(file_names)
+                              if file_name.lower().endswith('.edf'))
+    print(f"  Found {len(full_paths)} EDF files")
+
+    fingerprint_rows = []
+    fingerprints = read_concurrently(partial(read_edf_fingerprint_cached, manifest=manifest),
+                                     full_paths, max_concurrent_reads)
+    for full_path, (fingerprint, error) in zip(full_paths, fingerprints):
+        if error is not None:
+            print(f"    Error fingerprinting {full_path}: {str(error)}")
+            continue
+        fingerprint_rows.append(dict(fingerprint,
+                                     Center=center_name,
+                                     Path=os.path.relpath(full_path, center_dir).replace(os.sep, '/'),
+                                     EDF=os.path.basename(full_path)))
+    return fingerprint_rows
+
+
+def group_duplicate_edfs(fingerprint_rows):
+    """
+    Group the files that share a fingerprint.
+
+    Args:
+        fingerprint_rows (list): Rows of fingerprint_center (any number of centers)
+
+    Returns:
+        pd.DataFrame: DUPLICATE_COLUMNS, one row per file of each group with more than
+                      one file; groups are numbered from 1 in order of their first file
+    """
+    groups = {}
+    for row in fingerprint_rows:
+        groups.setdefault(row['fingerprint'], []).append(row)
+
+    duplicate_rows = []
+    group_number = 0
+    for group_rows in groups.values():
+        if len(group_rows) < 2:
+            continue
+        group_number += 1
+        first_row = group_rows[0]
+        for row in group_rows:
+            duplicate_rows.append({'Group': group_number,
+                                   'Center': row['Center'],
+                                   'Path': row['Path'],
+                                   'EDF': row['EDF'],
+                                   'Renamed': row['EDF'] != first_row['EDF'],
+                                   'Same Header': row['header_digest'] == first_row['header_digest'],
+                                   'Start DateTime': row['start_datetime'],
+                                   'Duration (s)': row['duration_seconds'],
+                                   'Fingerprint': row['fingerprint']})
+    return pd.DataFrame(duplicate_rows, columns=DUPLICATE_COLUMNS)
+
+
+def find_duplicate_edfs(root_folder, excel_filename="duplicate_edfs.xlsx", use_manifest=True, workers=1,
+                        max_concurrent_reads=1, output_format="excel", instrument=False):
+    """
+    Fingerprint every EDF file below the root folder and report the duplicates.
+
+    Args:
+        root_folder (str): Path to root directory containing center folders
+        excel_filename (str): Report written to root_folder (default: "duplicate_edfs.xlsx")
+        use_manifest (bool): Reuse fingerprints cached in the root folder's header manifest, a
+            local file in MANIFEST_CACHE_FOLDER (see edf_header_manifest), only re-reading files
+            whose size or mtime changed (default: True)
+        workers (int): Number of processes centers are spread across (default: 1)
+        max_concurrent_reads (int): Maximum number of files read at the same time per center (default: 1)
+        output_format (str): 'excel' (default), 'parquet', 'feather' or 'csv' (see workbook_sink)
+        instrument (bool): Record per-stage wall time, file opens, bytes read and per-file
+            read latencies, and write them to {excel stem}_run_report.json in root_folder
+            (default: False; see run_instrumentation)
+
+    Returns:
+        pd.DataFrame: Duplicate groups (see group_duplicate_edfs)
+    """
+    if not os.path.exists(root_folder):
+        raise FileNotFoundError(f"Root folder not found: {root_folder}")
+
+    with instrumented_run(root_folder, excel_filename, instrument):
+        center_directories = sorted(f.path for f in os.scandir(root_folder) if f.is_dir())
+
+        with (EdfHeaderManifest(root_folder) if use_manifest else contextlib.nullcontext()) as manifest:
+            all_center_rows = map_in_order(partial(fingerprint_center,
+                                                   manifest=manifest,
+                                                   max_concurrent_reads=max_concurrent_reads),
+                                           center_directories, workers)
+
+            fingerprint_rows = [row for center_rows in all_center_rows for row in center_rows]
+            duplicates = group_duplicate_edfs(fingerprint_rows)
+            n_groups = duplicates['Group'].nunique() if not duplicates.empty else 0
+            print(f"\n{len(fingerprint_rows)} EDF files fingerprinted, "
+                  f"{len(duplicates)} files in {n_groups} duplicate groups")
+
+            if not duplicates.empty:
+                try:
+                    write_sheet(duplicates, os.path.join(root_folder, excel_filename), 'duplicates', mode='w',
+                                output_format=output_format)
+                except Exception as e:
+                    print(f"Error writing to Excel file {excel_filename}: {str(e)}")
+
+    return duplicates
+
+
+if __name__ == '__main__':
+    # CONFIGURATION
+    ROOT_FOLDER = "Z:/uci_vmostaghimi/"
+    WORKERS = 4
+    MAX_CONCURRENT_READS = 8
+
+    find_duplicate_edfs(root_folder=ROOT_FOLDER, workers=WORKERS, max_concurrent_reads=MAX_CONCURRENT_READS)
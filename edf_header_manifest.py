@@ -0,0 +1,408 @@
+"""
+EDF Header Manifest
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+This module keeps an on-disk manifest (SQLite) of parsed EDF header fields, so that
+repeated passes over the same center tree do not have to re-open every EDF on the
+network share. Each entry is keyed by the file path and validated against the file
+size and modification time; files whose size or mtime changed are re-read and the
+entry is replaced.
+
+Besides the parsed header, the manifest can cache any other per-file value that
+only depends on the file content (for example the signal length used by the
+sampling frequency validation) through EdfHeaderManifest.get_cached_value.
+
+The manifest of a root folder is kept in a local cache folder by default
+(MANIFEST_CACHE_FOLDER, one file per root folder), not on the network share:
+SQLite locking over SMB is unreliable, and worker processes write to it. With
+store_on_share=True it is created in the root folder itself, to share it between
+machines:
+    root_folder/
+    ├── edf_header_manifest.sqlite
+    ├── center1/
+    └── center2/
+
+Every row carries the MANIFEST_SCHEMA_VERSION it was written with; rows of another
+version are ignored and re-read, so a change to EdfHeader (or any other cached
+value) only needs the version to be increased.
+
+The manifest also stores per-folder results (for example the timing rows of one
+patient) together with a signature of the folder contents, which the incremental
+mode of the center scripts uses to skip patients that did not change (see
+incremental_results).
+
+The manifest can be shared by the reader threads of concurrent_reads; SQLite
+access is serialized with a lock while the file reads themselves run in parallel.
+
+Usage:
+    with EdfHeaderManifest(root_folder) as manifest:
+        header = manifest.read_header("path/to/file.edf")
+
+    # or, in functions that accept an optional manifest
+    header = read_edf_header_cached(full_path, manifest)
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from concurrent_reads import read_concurrently
+from edf_header_reader import EdfHeader, read_edf_header
+from run_instrumentation import count_event
+
+
+MANIFEST_FILENAME = 'edf_header_manifest.sqlite'
+HEADER_KEY = 'header'
+
+# Local folder the manifests are kept in (unless store_on_share=True)
+MANIFEST_CACHE_FOLDER = os.path.join(os.environ.get('LOCALAPPDATA')
+                                     or os.path.join(os.path.expanduser('~'), '.cache'),
+                                     'edf_header_manifest')
+
+# Increase when the fields of EdfHeader or the format of a cached value change
+MANIFEST_SCHEMA_VERSION = 1
+
+
+def _header_to_json(edf_header: EdfHeader) -> str:
+    """Serialize an EdfHeader to a JSON string."""
+    values = edf_header._asdict()
+    values['start_datetime'] = edf_header.start_datetime.isoformat()
+    values['sample_frequencies'] = edf_header.sample_frequencies.tolist()
+    return json.dumps(values)
+
+
+def _header_from_json(text: str) -> EdfHeader:
+    """Rebuild an EdfHeader from its JSON string."""
+    values = json.loads(text)
+    values['start_datetime'] = datetime.fromisoformat(values['start_datetime'])
+    values['sample_frequencies'] = np.array(values['sample_frequencies'], dtype=float)
+    return EdfHeader(**values)
+
+
+def _result_to_jsonable(value):
+    """Convert a folder result to JSON-compatible values, tagging the types JSON lacks."""
+    if isinstance(value, pd.DataFrame):
+        # The index is stored apart: orient='table' cannot hold a non-unique one
+        return {'__dataframe__': value.to_json(orient='table', index=False, date_format='iso'),
+                '__index__': _result_to_jsonable(value.index.tolist())}
+    if isinstance(value, tuple):
+        return {'__tuple__': [_result_to_jsonable(item) for item in value]}
+    if isinstance(value, list):
+        return [_result_to_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {'__dict__': [[_result_to_jsonable(key), _result_to_jsonable(item)] for key, item in value.items()]}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, timedelta):
+        return {'__timedelta__': value.total_seconds()}
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Cannot store a folder result of type {type(value).__name__}")
+
+
+def _result_from_jsonable(value):
+    """Rebuild a folder result from the output of _result_to_jsonable."""
+    if isinstance(value, list):
+        return [_result_from_jsonable(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if '__dataframe__' in value:
+        data_frame = pd.read_json(io.StringIO(value['__dataframe__']), orient='table')
+        data_frame.index = pd.Index(_result_from_jsonable(value['__index__']))
+        return data_frame
+    if '__tuple__' in value:
+        return tuple(_result_from_jsonable(item) for item in value['__tuple__'])
+    if '__dict__' in value:
+        return {_result_from_jsonable(key): _result_from_jsonable(item) for key, item in value['__dict__']}
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    if '__timedelta__' in value:
+        return timedelta(seconds=value['__timedelta__'])
+    raise ValueError(f"Unknown folder result value: {sorted(value)}")
+
+
+class EdfHeaderManifest:
+    """
+    SQLite-backed cache of per-file EDF values, keyed by path, size and mtime.
+
+    Attributes:
+        manifest_path: Full path of the SQLite manifest file
+        root_folder: Folder the manifest is for; paths under it are stored
+            relative to it so the manifest survives drive letter changes
+        hits: Number of lookups answered from the manifest
+        misses: Number of lookups that had to read the file
+    """
+
+    def __init__(self, root_folder, manifest_filename=MANIFEST_FILENAME, commit_interval=200,
+                 store_on_share=False, cache_folder=MANIFEST_CACHE_FOLDER):
+        """
+        Open (or create) the manifest of a root folder.
+
+        Args:
+            root_folder (str): Folder whose EDF files are cached (usually the root folder)
+            manifest_filename (str): Name of the manifest file (default: MANIFEST_FILENAME)
+            commit_interval (int): Number of new entries written per commit (default: 200)
+            store_on_share (bool): Create the manifest in root_folder instead of the local
+                cache folder (default: False)
+            cache_folder (str): Local folder for the manifest (default: MANIFEST_CACHE_FOLDER)
+        """
+        self.root_folder = os.path.abspath(root_folder)
+        if store_on_share:
+            self.manifest_path = os.path.join(self.root_folder, manifest_filename)
+        else:
+            # One manifest per root folder, named after the folder and a hash of its path
+            root_hash = hashlib.sha1(os.path.normcase(self.root_folder).encode('utf-8')).hexdigest()[:12]
+            root_name = os.path.basename(self.root_folder.rstrip('\\/')) or 'root'
+            os.makedirs(cache_folder, exist_ok=True)
+            self.manifest_path = os.path.join(cache_folder, f"{root_name}_{root_hash}_{manifest_filename}")
+        self.commit_interval = commit_interval
+        self.hits = 0
+        self.misses = 0
+        self._pending_writes = 0
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        """Open the SQLite connection and create the table if needed."""
+        self._connection = sqlite3.connect(self.manifest_path, timeout=60, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS edf_manifest ("
+            " path TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " value TEXT NOT NULL,"
+            " schema_version INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (path, key))"
+        )
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(edf_manifest)")]
+        if 'schema_version' not in columns:
+            # Manifest written before rows were versioned: its rows count as version 0
+            self._connection.execute(
+                "ALTER TABLE edf_manifest ADD COLUMN schema_version INTEGER NOT NULL DEFAULT 0")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS folder_results ("
+            " path TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " signature TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " PRIMARY KEY (path, key))"
+        )
+        self._connection.commit()
+
+    def _manifest_key(self, full_path: str) -> str:
+        """Path used as manifest key (relative to root_folder when inside it)."""
+        absolute_path = os.path.abspath(full_path)
+        try:
+            manifest_path = os.path.relpath(absolute_path, self.root_folder)
+        except ValueError:
+            # Different drive on Windows
+            manifest_path = absolute_path
+        if manifest_path.startswith(os.pardir):
+            manifest_path = absolute_path
+        return os.path.normcase(manifest_path).replace(os.sep, '/')
+
+    def get_cached_value(self, full_path, key, compute, encode=json.dumps, decode=json.loads):
+        """
+        Return a cached per-file value, recomputing it if the file changed.
+
+        Args:
+            full_path (str): Full path to the EDF file
+            key (str): Name of the cached value (e.g. 'header')
+            compute (callable): Function of full_path that computes the value
+            encode (callable): Converts the value to a string (default: json.dumps)
+            decode (callable): Converts the stored string back (default: json.loads)
+
+        Returns:
+            The cached or freshly computed value
+        """
+        file_stat = os.stat(full_path)
+        manifest_key = self._manifest_key(full_path)
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, value, schema_version FROM edf_manifest WHERE path = ? AND key = ?",
+                (manifest_key, key)).fetchone()
+            if (row is not None and row[0] == file_stat.st_size and row[1] == file_stat.st_mtime_ns
+                    and row[3] == MANIFEST_SCHEMA_VERSION):
+                self.hits += 1
+            else:
+                self.misses += 1
+                row = None
+        count_event('manifest_hits' if row is not None else 'manifest_misses')
+        if row is not None:
+            return decode(row[2])
+
+        value = compute(full_path)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO edf_manifest (path, key, size, mtime_ns, value, schema_version)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (manifest_key, key, file_stat.st_size, file_stat.st_mtime_ns, encode(value),
+                 MANIFEST_SCHEMA_VERSION))
+            self._pending_writes += 1
+            if self._pending_writes >= self.commit_interval:
+                self._connection.commit()
+                self._pending_writes = 0
+        return value
+
+    def get_folder_result(self, folder_path, key, signature):
+        """
+        Return the stored result of a folder if its signature is unchanged.
+
+        Args:
+            folder_path (str): Full path of the folder (e.g. a patient folder)
+            key (str): Name of the stored result (e.g. 'timing')
+            signature (str): Current signature of the folder contents
+
+        Returns:
+            tuple: (found, value); value is None when not found or stale
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT signature, value FROM folder_results WHERE path = ? AND key = ?",
+                (self._manifest_key(folder_path), key)).fetchone()
+        if row is None or row[0] != signature:
+            return False, None
+        try:
+            return True, _result_from_jsonable(json.loads(row[1]))
+        except (TypeError, ValueError):
+            # Not a JSON result (e.g. written by an older version): recompute it
+            return False, None
+
+    def store_folder_result(self, folder_path, key, signature, value):
+        """
+        Store the result of a folder with the signature it was computed for.
+
+        Args:
+            folder_path (str): Full path of the folder
+            key (str): Name of the stored result
+            signature (str): Signature of the folder contents
+            value: Result made of DataFrames, tuples, lists, dicts, datetimes and scalars;
+                stored as JSON (DataFrames with their column types)
+        """
+        value_json = json.dumps(_result_to_jsonable(value))
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO folder_results (path, key, signature, value) VALUES (?, ?, ?, ?)",
+                (self._manifest_key(folder_path), key, signature, value_json))
+            self._pending_writes += 1
+            if self._pending_writes >= self.commit_interval:
+                self._connection.commit()
+                self._pending_writes = 0
+
+    def drop_stale_folder_results(self, parent_path, key, kept_folder_paths):
+        """
+        Drop stored results of folders under parent_path that no longer exist.
+
+        Args:
+            parent_path (str): Full path of the parent folder (e.g. a center folder)
+            key (str): Name of the stored result
+            kept_folder_paths (list): Full paths of the folders still present
+
+        Returns:
+            int: Number of results dropped
+        """
+        parent_key = self._manifest_key(parent_path) + '/'
+        kept_keys = {self._manifest_key(folder_path) for folder_path in kept_folder_paths}
+        with self._lock:
+            stored_keys = [row[0] for row in self._connection.execute(
+                "SELECT path FROM folder_results WHERE key = ?", (key,))]
+            stale_keys = [stored_key for stored_key in stored_keys
+                          if stored_key.startswith(parent_key) and stored_key not in kept_keys]
+            self._connection.executemany("DELETE FROM folder_results WHERE path = ? AND key = ?",
+                                         [(stale_key, key) for stale_key in stale_keys])
+        return len(stale_keys)
+
+    def read_header(self, full_path: str) -> EdfHeader:
+        """
+        Return the parsed header of an EDF file, from the manifest when up to date.
+
+        Args:
+            full_path (str): Full path to the EDF file
+
+        Returns:
+            EdfHeader: Parsed header fields
+        """
+        return self.get_cached_value(full_path, HEADER_KEY, read_edf_header,
+                                     encode=_header_to_json, decode=_header_from_json)
+
+    def __getstate__(self):
+        # The SQLite connection cannot be pickled; worker processes reopen the
+        # manifest file, so commit first to let them see our entries
+        self.commit()
+        return {'root_folder': self.root_folder,
+                'manifest_path': self.manifest_path}
+
+    def __setstate__(self, state):
+        self.root_folder = state['root_folder']
+        self.manifest_path = state['manifest_path']
+        # Worker copies are never closed explicitly, so write every entry straight away
+        self.commit_interval = 1
+        self.hits = 0
+        self.misses = 0
+        self._pending_writes = 0
+        self._lock = threading.Lock()
+        self._connect()
+
+    def commit(self):
+        """Write pending manifest entries to disk."""
+        with self._lock:
+            self._connection.commit()
+            self._pending_writes = 0
+
+    def close(self):
+        """Commit pending entries and close the manifest."""
+        self.commit()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_edf_header_cached(full_path: str, manifest=None) -> EdfHeader:
+    """
+    Read an EDF header through the manifest if one is given.
+
+    Args:
+        full_path (str): Full path to the EDF file
+        manifest (EdfHeaderManifest or None): Manifest to use, or None to always read the file
+
+    Returns:
+        EdfHeader: Parsed header fields
+    """
+    if manifest is None:
+        return read_edf_header(full_path)
+    return manifest.read_header(full_path)
+
+
+def read_edf_headers(full_paths, manifest=None, max_concurrent_reads=1):
+    """
+    Read many EDF headers, keeping up to max_concurrent_reads reads in flight.
+
+    Args:
+        full_paths (list): Full paths to the EDF files
+        manifest (EdfHeaderManifest or None): Manifest to use, or None to always read the files
+        max_concurrent_reads (int): Maximum number of header reads in flight (default: 1, sequential)
+
+    Returns:
+        list: (EdfHeader, error) tuples in input order (see concurrent_reads.read_concurrently)
+    """
+    return read_concurrently(partial(read_edf_header_cached, manifest=manifest),
+                             full_paths, max_concurrent_reads)
@@ -0,0 +1,263 @@
+"""
+EDF Header Reader
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+This module reads the fixed-width ASCII header of EDF/EDF+ (and BDF) files without
+going through pyedflib.EdfReader. EdfReader opens and validates the whole file,
+which is slow on the network share; the scanners only need the start time, the
+duration, the channel labels and the sampling frequencies, all of which live in
+the first 256 + 256 * ns bytes of the file.
+
+EDF header layout:
+    Fixed header (256 bytes):
+        version (8), patient (80), recording (80), start date dd.mm.yy (8),
+        start time hh.mm.ss (8), header bytes (8), reserved (44),
+        number of data records (8), data record duration (8), ns (4)
+    Signal header (256 * ns bytes), each field stored for all signals in turn:
+        label (16), transducer (80), physical dimension (8), physical min (8),
+        physical max (8), digital min (8), digital max (8), prefilter (80),
+        samples per data record (8), reserved (32)
+
+The returned EdfHeader mirrors what the scripts used to get from EdfReader:
+    getStartdatetime()      -> header.start_datetime
+    getFileDuration()       -> header.duration_seconds
+    getSignalLabels()       -> header.signal_labels
+    getSampleFrequencies()  -> header.sample_frequencies
+
+Usage:
+    header = read_edf_header("path/to/file.edf")
+    print(header.start_datetime, header.duration_seconds)
+"""
+
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import List, NamedTuple
+
+import numpy as np
+
+from run_instrumentation import record_file_read
+
+FIXED_HEADER_BYTES = 256
+SIGNAL_HEADER_BYTES = 256
+
+# Annotation channels are not returned by EdfReader.getSignalLabels()
+ANNOTATION_LABELS = ('EDF Annotations', 'BDF Annotations')
+
+# Width of each per-signal field, in the order they are stored in the header
+_SIGNAL_FIELD_WIDTHS = [
+    ('label', 16),
+    ('transducer', 80),
+    ('physical_dimension', 8),
+    ('physical_min', 8),
+    ('physical_max', 8),
+    ('digital_min', 8),
+    ('digital_max', 8),
+    ('prefilter', 80),
+    ('samples_per_record', 8),
+    ('reserved', 32),
+]
+
+# EDF+ recording field: "Startdate 02-MAR-2002 ..." carries the 4-digit year
+_EDFPLUS_STARTDATE_PATTERN = re.compile(r"Startdate\s+(\d{2})-([A-Z]{3})-(\d{4})")
+_MONTHS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN',
+           'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+
+class EdfHeader(NamedTuple):
+    """
+    Parsed EDF header fields.
+
+    Attributes:
+        start_datetime: Recording start (including EDF+ subsecond offset)
+        duration_seconds: n_data_records * record_duration
+        n_data_records: Number of data records stated in the header
+        record_duration: Duration of one data record in seconds
+        header_bytes: Size of the header (start of the data records)
+        bytes_per_sample: 2 for EDF, 3 for BDF
+        file_size: Size of the file on disk in bytes
+        signal_labels: Labels of the ordinary (non-annotation) signals
+        sample_frequencies: Sampling frequency of each ordinary signal (Hz)
+        all_labels: Labels of every signal, including annotation signals
+        samples_per_record: Samples per data record for every signal
+        physical_min, physical_max, digital_min, digital_max: Per-signal scaling
+            (every signal, including annotation signals)
+    """
+    start_datetime: datetime
+    duration_seconds: float
+    n_data_records: int
+    record_duration: float
+    header_bytes: int
+    bytes_per_sample: int
+    file_size: int
+    signal_labels: List[str]
+    sample_frequencies: np.ndarray
+    all_labels: List[str]
+    samples_per_record: List[int]
+    physical_min: List[float]
+    physical_max: List[float]
+    digital_min: List[int]
+    digital_max: List[int]
+
+    @property
+    def signal_indices(self) -> List[int]:
+        """Positions of the ordinary signals among all signals."""
+        return [k for k, label in enumerate(self.all_labels) if label not in ANNOTATION_LABELS]
+
+    @property
+    def record_bytes(self) -> int:
+        """Size in bytes of one data record."""
+        return sum(self.samples_per_record) * self.bytes_per_sample
+
+    @property
+    def n_data_records_on_disk(self) -> int:
+        """Number of complete data records actually present in the file."""
+        if self.record_bytes == 0:
+            return 0
+        return max(self.file_size - self.header_bytes, 0) // self.record_bytes
+
+
+def _field(raw: bytes, start: int, width: int) -> str:
+    """Decode one space-padded ASCII header field."""
+    return raw[start:start + width].decode('latin-1').strip()
+
+
+def _parse_start_datetime(startdate: str, starttime: str, recording: str) -> datetime:
+    """
+    Build the start datetime the same way edflib does.
+
+    Two-digit years 85-99 map to 19xx, everything else to 20xx. EDF+ files
+    carry the full year in the recording field, which takes precedence.
+    """
+    day, month, year = [int(part) for part in startdate.split('.')]
+    hour, minute, second = [int(part) for part in starttime.split('.')]
+    year += 1900 if year >= 85 else 2000
+
+    match = _EDFPLUS_STARTDATE_PATTERN.search(recording)
+    if match and match.group(2) in _MONTHS:
+        year = int(match.group(3))
+
+    return datetime(year, month, day, hour, minute, second)
+
+
+def _read_subsecond_offset(edf_file, header_bytes, samples_per_record,
+                           bytes_per_sample, annotation_index) -> float:
+    """
+    Read the start-time offset from the first TAL of the first data record.
+
+    Only the annotation signal of the first data record is read. Returns 0.0
+    if the offset cannot be parsed.
+    """
+    offset = header_bytes + sum(samples_per_record[:annotation_index]) * bytes_per_sample
+    edf_file.seek(offset)
+    tal = edf_file.read(samples_per_record[annotation_index] * bytes_per_sample)
+    first_onset = tal.split(b'\x14', 1)[0].decode('latin-1')
+    try:
+        return float(first_onset) % 1
+    except ValueError:
+        return 0.0
+
+
+def read_edf_header(full_path: str) -> EdfHeader:
+    """
+    Read the header of an EDF/EDF+/BDF file.
+
+    Only the 256-byte fixed header and the 256 * ns signal header are read
+    (plus the annotation signal of the first data record for EDF+ files, to get
+    the subsecond start time).
+
+    Args:
+        full_path (str): Full path to the EDF file
+
+    Returns:
+        EdfHeader: Parsed header fields
+
+    Raises:
+        ValueError: If the header is truncated or contains invalid fields
+    """
+    start_time = time.perf_counter()
+    with open(full_path, 'rb') as edf_file:
+        file_size = os.fstat(edf_file.fileno()).st_size
+        fixed = edf_file.read(FIXED_HEADER_BYTES)
+        if len(fixed) < FIXED_HEADER_BYTES:
+            raise ValueError(f"Truncated EDF header in {full_path}")
+
+        try:
+            n_signals = int(_field(fixed, 252, 4))
+            header_bytes = int(_field(fixed, 184, 8))
+            n_data_records = int(_field(fixed, 236, 8))
+            record_duration = float(_field(fixed, 244, 8))
+            start_datetime = _parse_start_datetime(_field(fixed, 168, 8),
+                                                   _field(fixed, 176, 8),
+                                                   _field(fixed, 88, 80))
+        except ValueError as e:
+            raise ValueError(f"Invalid EDF header in {full_path}: {str(e)}")
+
+        signal_block = edf_file.read(SIGNAL_HEADER_BYTES * n_signals)
+        if len(signal_block) < SIGNAL_HEADER_BYTES * n_signals:
+            raise ValueError(f"Truncated EDF signal header in {full_path}")
+
+        # Each field is stored for all signals before the next field starts
+        signal_fields = {}
+        position = 0
+        for field_name, width in _SIGNAL_FIELD_WIDTHS:
+            signal_fields[field_name] = [_field(signal_block, position + k * width, width)
+                                         for k in range(n_signals)]
+            position += width * n_signals
+
+        try:
+            samples_per_record = [int(value) for value in signal_fields['samples_per_record']]
+            physical_min = [float(value) for value in signal_fields['physical_min']]
+            physical_max = [float(value) for value in signal_fields['physical_max']]
+            digital_min = [int(value) for value in signal_fields['digital_min']]
+            digital_max = [int(value) for value in signal_fields['digital_max']]
+        except ValueError as e:
+            raise ValueError(f"Invalid EDF signal header in {full_path}: {str(e)}")
+
+        bytes_per_sample = 3 if fixed[:1] == b'\xff' else 2
+        all_labels = signal_fields['label']
+        annotation_indices = [k for k, label in enumerate(all_labels) if label in ANNOTATION_LABELS]
+
+        # Same as edflib: a record count of -1 means "still recording",
+        # so derive it from the file size
+        record_bytes = sum(samples_per_record) * bytes_per_sample
+        if n_data_records == -1 and record_bytes > 0:
+            n_data_records = (file_size - header_bytes) // record_bytes
+
+        # EDF+ keeps the subsecond part of the start time in the first annotation
+        bytes_read = len(fixed) + len(signal_block)
+        if annotation_indices and n_data_records > 0:
+            subsecond = _read_subsecond_offset(edf_file, header_bytes, samples_per_record,
+                                               bytes_per_sample, annotation_indices[0])
+            start_datetime += timedelta(microseconds=round(subsecond * 1e6))
+            bytes_read += samples_per_record[annotation_indices[0]] * bytes_per_sample
+    record_file_read('edf_header', time.perf_counter() - start_time, bytes_read, 'header_opens')
+
+    ordinary_indices = [k for k in range(n_signals) if k not in annotation_indices]
+    if record_duration > 0:
+        sample_frequencies = np.array([samples_per_record[k] / record_duration
+                                       for k in ordinary_indices])
+    else:
+        sample_frequencies = np.array([float(samples_per_record[k]) for k in ordinary_indices])
+
+    return EdfHeader(
+        start_datetime=start_datetime,
+        duration_seconds=n_data_records * record_duration,
+        n_data_records=n_data_records,
+        record_duration=record_duration,
+        header_bytes=header_bytes,
+        bytes_per_sample=bytes_per_sample,
+        file_size=file_size,
+        signal_labels=[all_labels[k] for k in ordinary_indices],
+        sample_frequencies=sample_frequencies,
+        all_labels=all_labels,
+        samples_per_record=samples_per_record,
+        physical_min=physical_min,
+        physical_max=physical_max,
+        digital_min=digital_min,
+        digital_max=digital_max,
+    )
@@ -17,6 +17,10 @@ Input Excel Sheets Expected:
     - 'fs-matching FU': Follow-up sampling frequency validation
     - 'Channel Labels': Channel configuration validation
 
+The input sheets can also be given as Parquet/Feather/CSV files named after the
+input workbook (e.g. 10.CHOC_overall_report_input__EDF Duration.parquet), which are
+read directly instead of the workbook (see workbook_sink).
+
 Output:
     comprehensive_report.xlsx: Single sheet with merged validation results
 
@@ -28,9 +32,12 @@ Note:
 
 
 import os
+import numpy as np
 import pandas as pd
 from typing import Dict, List
 
+from workbook_sink import WorkbookSink, read_report, report_exists, write_sheet
+
 
 # Constants
 PATIENT_ID_PREFIX_LENGTH = 13  # First 13 characters identify the patient
@@ -75,22 +82,18 @@ def validate_sampling_frequency_data(fs_df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame with added 'FS_check' column (1 = pass, 0 = fail)
     """
-    fs_check_list = []
-
-    for idx, _ in fs_df.iterrows():
-        header_fs = fs_df.loc[idx, 'Header_Fs']
-        calculated_fs = fs_df.loc[idx, 'Calculated_Fs']
-
-        # Calculate percentage error
-        if header_fs != 0:
-            error_percent = abs((calculated_fs - header_fs) / header_fs * 100)
-            is_valid = (error_percent <= MAX_SAMPLING_FREQUENCY_ERROR_PERCENT and
-                        header_fs >= MIN_SAMPLING_FREQUENCY_HZ)
-            fs_check_list.append(1 if is_valid else 0)
-        else:
-            fs_check_list.append(0)
-
-    fs_df['FS_check'] = fs_check_list
+    header_fs = fs_df['Header_Fs'].to_numpy(dtype=float)
+    calculated_fs = fs_df['Calculated_Fs'].to_numpy(dtype=float)
+
+    # Calculate percentage error for all rows at once; rows with a header fs of 0
+    # (division by zero) or a missing value (NaN) fail the check
+    with np.errstate(divide='ignore', invalid='ignore'):
+        error_percent = np.abs((calculated_fs - header_fs) / header_fs * 100)
+    is_valid = ((header_fs != 0) &
+                (error_percent <= MAX_SAMPLING_FREQUENCY_ERROR_PERCENT) &
+                (header_fs >= MIN_SAMPLING_FREQUENCY_HZ))
+
+    fs_df['FS_check'] = is_valid.astype(int)
     fs_df['PatientID_prefix'] = extract_patient_id_prefix(fs_df['PatientID'])
 
     # Group by patient - all EDFs must pass for patient to pass
@@ -140,91 +143,53 @@ def process_channel_labels_sheet(channel_df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame grouped by patient with channel validation results
     """
-    # Find missing channels (marked with '***') for each row
-    missing_channels_per_row = []
-
-    for _, row in channel_df.iterrows():
-        missing_channels = channel_df.columns[row == MISSING_CHANNEL_MARKER].tolist()
-        missing_channels_per_row.append(missing_channels)
-
-    channel_df['missingChans'] = missing_channels_per_row
-    channel_df['PatientID_prefix'] = extract_patient_id_prefix(channel_df['identifier'])
-
-    # Group by patient
-    grouped_missing_channels = (
-        channel_df
-        .groupby('PatientID_prefix')['missingChans']
-        .apply(lambda x: x)
-    )
-
-    # Check if essential channels are missing
-    essential_channels_check = pd.DataFrame({
-        'PatientID_prefix': channel_df['PatientID_prefix'],
-        'essential_channels_ok': ~grouped_missing_channels.isin(ESSENTIAL_CHANNEL_NAMES)
-    })
-
-    # Check if montage is valid
-    montage_check = pd.DataFrame({
-        'PatientID_prefix': channel_df['PatientID_prefix'],
-        'montage_check': ~grouped_missing_channels.isin(MONTAGE_REQUIRED_CHANNELS)
+    channel_columns = channel_df.columns.drop('identifier')
+
+    # Boolean presence matrix (EDFs x channels): a channel is missing when marked with '***'
+    channel_presence = pd.DataFrame(channel_df[channel_columns].to_numpy() != MISSING_CHANNEL_MARKER,
+                                    columns=channel_columns)
+
+    # A patient has a channel only if all of its EDFs have it
+    patient_id_prefix = extract_patient_id_prefix(channel_df['identifier']).to_numpy()
+    patient_presence = channel_presence.groupby(patient_id_prefix).all()
+
+    # Required channels without a column in the sheet are missing in every EDF
+    absent_channels = [channel_name for channel_name in ESSENTIAL_CHANNEL_NAMES
+                       if channel_name not in channel_columns]
+    if absent_channels:
+        channel_columns = channel_columns.append(pd.Index(absent_channels))
+        patient_presence = patient_presence.reindex(columns=channel_columns, fill_value=False)
+    presence_matrix = patient_presence.to_numpy(dtype=bool)
+
+    channel_validation = pd.DataFrame({
+        'PatientID_prefix': patient_presence.index,
+        'missingChans': [channel_columns[~patient_row].tolist() for patient_row in presence_matrix],
+        'essential_channels_ok': patient_presence[ESSENTIAL_CHANNEL_NAMES].all(axis=1).to_numpy(),
+        'montage_check': patient_presence[MONTAGE_REQUIRED_CHANNELS].all(axis=1).to_numpy()
     })
 
-    # Merge and remove duplicates
-    channel_validation = pd.merge(
-        grouped_missing_channels,
-        essential_channels_check,
-        on='PatientID_prefix',
-        how='outer'
-    )
-
-    montage_check_unique = montage_check.drop_duplicates(subset=['PatientID_prefix'])
-
-    channel_validation = pd.merge(
-        channel_validation,
-        montage_check_unique,
-        on='PatientID_prefix',
-        how='outer'
-    )
-
-    channel_validation_unique = channel_validation.drop_duplicates(subset=['PatientID_prefix'])
-
-    return channel_validation_unique
+    return channel_validation
 
 
-def generate_comprehensive_report(root_folder: str = 'D:/Users/vmostaghimi_choc/Desktop/site reports/10.CHOC',
-                                  input_excel_filename: str = '10.CHOC_overall_report_input.xlsx',
-                                  output_excel_filename: str = 'comprehensive_report.xlsx') -> None:
+def build_comprehensive_report(report_sheets: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     """
-    Generate comprehensive EEG quality validation report.
-
-    Reads multiple validation sheets from an input Excel file and merges them
-    into a single comprehensive report showing all quality checks per patient.
+    Merge the validation sheets into the comprehensive report.
 
     Args:
-        root_folder: Path to folder containing input Excel file
-        input_excel_filename: Name of input Excel file with validation sheets
-        output_excel_filename: Name of output Excel file for comprehensive report
+        report_sheets: Sheet name -> DataFrame, using the sheet names of the input
+            Excel file ('EDF Duration', 'FU-DX interval', 'fs-matching DX',
+            'fs-matching FU', 'Channel Labels'); other sheets are ignored
+
+    Returns:
+        DataFrame with one row per patient and every quality check
 
     Raises:
-        FileNotFoundError: If input Excel file doesn't exist
-        ValueError: If required sheets are missing or data format is invalid
+        ValueError: If required sheets are missing
     """
-
-    # Validate input file exists
-    excel_file_path = os.path.join(root_folder, input_excel_filename)
-    if not os.path.exists(excel_file_path):
-        raise FileNotFoundError(f"Input Excel file not found: {excel_file_path}")
-
-    # Read all sheets from Excel file
-    try:
-        excel_data = pd.read_excel(excel_file_path, sheet_name=None)
-    except Exception as e:
-        raise ValueError(f"Error reading Excel file: {str(e)}")
-
     # Process each sheet
     sheet_results = {}
 
-    for sheet_name, sheet_df in excel_data.items():
+    for sheet_name, sheet_df in report_sheets.items():
         print(f"  Processing sheet: {sheet_name}")
 
         if sheet_name == 'EDF Duration':
@@ -270,23 +235,62 @@ def generate_comprehensive_report(root_folder: str = 'D:/Users/vmostaghimi_choc/
     )
 
     # Rename for clarity
-    comprehensive_report = comprehensive_report.rename(columns={'PatientID_prefix': 'PatientID'})
+    return comprehensive_report.rename(columns={'PatientID_prefix': 'PatientID'})
+
+
+def generate_comprehensive_report(root_folder: str = 'D:/Users/vmostaghimi_choc/Desktop/site reports/10.CHOC',
+                                  input_excel_filename: str = '10.CHOC_overall_report_input.xlsx',
+                                  output_excel_filename: str = 'comprehensive_report.xlsx',
+                                  output_format: str = 'excel') -> None:
+    """
+    Generate comprehensive EEG quality validation report.
+
+    Reads multiple validation sheets from an input Excel file and merges them
+    into a single comprehensive report showing all quality checks per patient
+    (see build_comprehensive_report; comprehensive_pipeline builds the same
+    report straight from the scanner results, without an input file).
+
+    Args:
+        root_folder: Path to folder containing input Excel file
+        input_excel_filename: Name of input Excel file with validation sheets
+        output_excel_filename: Name of output Excel file for comprehensive report
+        output_format: 'excel' (default), 'parquet', 'feather' or 'csv' for the report
+
+    Raises:
+        FileNotFoundError: If input Excel file doesn't exist
+        ValueError: If required sheets are missing or data format is invalid
+    """
+
+    # Validate input file exists
+    excel_file_path = os.path.join(root_folder, input_excel_filename)
+    if not report_exists(excel_file_path):
+        raise FileNotFoundError(f"Input Excel file not found: {excel_file_path}")
+
+    # Read all sheets (the columnar files are read directly when present)
+    try:
+        excel_data = read_report(excel_file_path)
+    except Exception as e:
+        raise ValueError(f"Error reading Excel file: {str(e)}")
+
+    comprehensive_report = build_comprehensive_report(excel_data)
 
     # Write output
     try:
-        write_dataframe_to_excel(
-            comprehensive_report,
-            root_folder,
-            output_excel_filename,
-            'comprehensive_report',
-            mode='w'  # Overwrite mode for fresh report
-        )
+        with WorkbookSink(output_format=output_format) as sink:
+            write_dataframe_to_excel(
+                comprehensive_report,
+                root_folder,
+                output_excel_filename,
+                'comprehensive_report',
+                mode='w',  # Overwrite mode for fresh report
+                sink=sink
+            )
 
     except Exception as e:
         raise IOError(f"Error writing output file: {str(e)}")
 
 
-def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a'):
+def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a', sink=None):
     """
     Write a DataFrame to an Excel file as a new sheet.
 
@@ -296,6 +300,8 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         excel_filename (str): Name of the Excel file
         sheet_name (str): Name of the sheet to create
         mode (str): Write mode - 'a' for append (default), 'w' for overwrite
+        sink (WorkbookSink): Optional sink that writes the workbook once at the end of the run
+            (default: None, write now; a missing workbook is created)
     """
 
     if data_frame.empty:
@@ -303,8 +309,7 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         return
     try:
         excel_path = os.path.join(folder_dir, excel_filename)
-        with pd.ExcelWriter(excel_path, mode=mode, engine='openpyxl') as writer:
-            data_frame.to_excel(writer, sheet_name=sheet_name, index=False, na_rep='')
+        write_sheet(data_frame, excel_path, sheet_name, mode, sink)
     except Exception as e:
         print(f"Error writing to Excel file {excel_filename}, sheet {sheet_name}: {str(e)}")
 
@@ -38,17 +38,23 @@ Usage:
     calculate_intervals_multiple_centers(root_folder="path/to/root/")
 
 Note:
-    If you want to run calculate_intervals_multiple_centers, make sure you make an empty
-    Excel spreadsheet with the exact same name as you input to the function, in the
-    directory you want to save the Excel spreadsheet (in this scrip the root_folder)
+    calculate_intervals_multiple_centers collects every sheet and writes each Excel file once at
+    the end of the run, creating it in the root_folder if it does not exist yet.
 """
 
+import contextlib
 import os
-import pyedflib
 import pandas as pd
+from functools import partial
 
+from edf_header_manifest import EdfHeaderManifest, read_edf_headers
+from incremental_results import map_patients_incrementally
+from parallel_map import map_in_order
+from run_instrumentation import instrumented_run, instrumented_stage
+from workbook_sink import WorkbookSink, write_sheet
 
-def get_first_edf_start_datetime(folder_path):
+
+def get_first_edf_start_datetime(folder_path, manifest=None, max_concurrent_reads=1):
     """
     Extract start datetime from the first EDF file in a folder.
 
@@ -57,6 +63,8 @@ def get_first_edf_start_datetime(folder_path):
 
     Args:
         folder_path (str): Path to folder containing EDF files
+        manifest (EdfHeaderManifest): Optional header manifest to reuse previously read headers
+        max_concurrent_reads (int): Maximum number of header reads in flight (default: 1)
 
     Returns:
         datetime or None: Start datetime of the first EDF file, or None if:
@@ -72,7 +80,8 @@ def get_first_edf_start_datetime(folder_path):
 
     # Get all EDF files in the folder
     try:
-        edf_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.edf')]
+        with instrumented_stage('listing'):
+            edf_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.edf')]
     except Exception as e:
         print(f"Error listing directory {folder_path}: {str(e)}")
         return None
@@ -81,33 +90,82 @@ def get_first_edf_start_datetime(folder_path):
         print(f"Warning: No EDF files found in {folder_path}")
         return None
 
-    # Read first EDF file's start datetime
-
-    first_edf_datetime = None
-    for edf_index, edf_filename in enumerate(edf_files):
-        try:
-            full_path = os.path.join(folder_path, edf_filename)
-            # full_path = folder_path + edf_filename
-            with pyedflib.EdfReader(full_path) as edf_reader:
-                current_datetime = edf_reader.getStartdatetime()
-
-            # Store the first file's datetime
-            if edf_index == 0:
-                first_edf_datetime = current_datetime
-
-            # Validate subsequent files have the same datetime
-            else:
-                if first_edf_datetime != current_datetime:  # Add "if"!
-                    print(f"  Warning: Datetime discrepancy in {edf_filename}")
-                    print(f"    Expected: {first_edf_datetime}")
-                    print(f"    Found: {current_datetime}")
-
-        except Exception as e:
-            print(f"Error handling {edf_filename}: {str(e)}")
+    # Read each EDF file's start datetime
+    full_paths = [os.path.join(folder_path, edf_filename) for edf_filename in edf_files]
+    folder_headers = read_edf_headers(full_paths, manifest, max_concurrent_reads)
+
+    edf_start_datetimes = []
+    for edf_filename, (edf_header, error) in zip(edf_files, folder_headers):
+        if error is not None:
+            print(f"Error handling {edf_filename}: {str(error)}")
             continue
+        edf_start_datetimes.append((edf_filename, edf_header.start_datetime))
+    return select_first_start_datetime(edf_start_datetimes)
+
+
+def select_first_start_datetime(edf_start_datetimes):
+    """
+    Return the start datetime of the first EDF file of a folder.
+
+    Prints a warning for every other file whose start datetime differs.
+
+    Args:
+        edf_start_datetimes (list): (edf_filename, start_datetime) tuples in folder order
+
+    Returns:
+        datetime or None: Start datetime of the first file, or None if the list is empty
+    """
+    if not edf_start_datetimes:
+        return None
+
+    # Store the first file's datetime
+    first_edf_datetime = edf_start_datetimes[0][1]
+
+    # Validate subsequent files have the same datetime
+    for edf_filename, current_datetime in edf_start_datetimes[1:]:
+        if first_edf_datetime != current_datetime:
+            print(f"  Warning: Datetime discrepancy in {edf_filename}")
+            print(f"    Expected: {first_edf_datetime}")
+            print(f"    Found: {current_datetime}")
     return first_edf_datetime
 
-def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a'):
+
+def build_interval_record(patient_id, dx_start, fu_start):
+    """
+    Build the DX-FU interval row of one patient.
+
+    Args:
+        patient_id (str): Patient folder name
+        dx_start (datetime or None): Start datetime of the first DX EDF
+        fu_start (datetime or None): Start datetime of the first FU EDF
+
+    Returns:
+        dict: Row with 'patientID', 'interval_days' and 'status'
+    """
+    # Calculate interval if both datetimes are valid
+    if dx_start is None or fu_start is None:
+        print(f"      Skipping {patient_id} - missing DX or FU data")
+        return {'patientID': patient_id,
+                'interval_days': None,
+                'status': 'Missing data'}
+
+    # Calculate interval
+    try:
+        interval = fu_start - dx_start
+        interval_seconds = interval.total_seconds()
+        interval_hours = interval_seconds/ 3600
+        interval_days = interval_hours/24
+
+        return {'patientID': patient_id,
+                'interval_days': round(interval_days),
+                'status': 'Success'}
+    except Exception as e:
+        print(f"Error calculating interval: {str(e)}")
+        return {'patientID': patient_id,
+                'interval_days': None,
+                'status':  f'Error: {str(e)}'}
+
+def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a', sink=None):
     """
     Write a DataFrame to an Excel file as a new sheet.
 
@@ -117,6 +175,8 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         excel_filename (str): Name of the Excel file
         sheet_name (str): Name of the sheet to create
         mode (str): Write mode - 'a' for append (default), 'w' for overwrite
+        sink (WorkbookSink): Optional sink that writes the workbook once at the end of the run
+            (default: None, write now; a missing workbook is created)
     """
 
     if data_frame.empty:
@@ -124,12 +184,41 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         return
     try:
         excel_path = os.path.join(folder_dir, excel_filename)
-        with pd.ExcelWriter(excel_path, mode=mode, engine='openpyxl') as writer:
-            data_frame.to_excel(writer, sheet_name=sheet_name, index=False, na_rep='')
+        write_sheet(data_frame, excel_path, sheet_name, mode, sink)
     except Exception as e:
         print(f"Error writing to Excel file {excel_filename}, sheet {sheet_name}: {str(e)}")
 
-def calculate_intervals_single_center(center_dir, diagnosis_folder_name = "diagnosis", follow_up_folder_name = "follow up"):
+def calculate_patient_interval(patient_id, center_dir, diagnosis_folder_name="diagnosis",
+                               follow_up_folder_name="follow up", manifest=None, max_concurrent_reads=1):
+    """
+    Calculate the DX-FU interval of one patient.
+
+    Args:
+        patient_id (str): Patient folder name
+        center_dir (str): Path to the center directory
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of header reads in flight (default: 1)
+
+    Returns:
+        dict: Row with 'patientID', 'interval_days' and 'status'
+    """
+    print(f"Processing Patient: {patient_id}")
+
+    # Build paths to DX and FU folders
+    dx_folder_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
+    fu_folder_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
+
+    # Get start datetimes
+    dx_start = get_first_edf_start_datetime(dx_folder_path, manifest, max_concurrent_reads)
+    fu_start = get_first_edf_start_datetime(fu_folder_path, manifest, max_concurrent_reads)
+
+    return build_interval_record(patient_id, dx_start, fu_start)
+
+
+def calculate_intervals_single_center(center_dir, diagnosis_folder_name = "diagnosis", follow_up_folder_name = "follow up",
+                                      manifest=None, workers=1, max_concurrent_reads=1, incremental=False):
     """
     Calculate DX-FU intervals for all patients in a single center.
 
@@ -137,6 +226,14 @@ def calculate_intervals_single_center(center_dir, diagnosis_folder_name = "diagn
         center_dir (str): Path to the center directory
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        workers (int): Number of processes patients are spread across (default: 1).
+            Results are merged in patient order, so the output does not depend on it.
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder
+            (default: 1). Raise it on high-latency network shares.
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run, reusing the results stored in the manifest
+            (default: False; needs a manifest)
 
     Returns:
         pd.DataFrame: DataFrame with columns 'patientID' and 'interval_days'
@@ -148,58 +245,33 @@ def calculate_intervals_single_center(center_dir, diagnosis_folder_name = "diagn
     print(f"\nProcessing Center: {center_name}")
 
     # Get all patient IDs (subdirectories only, exclude any other file such as excel or .mat files
-    patient_ids = [id for id in os.listdir(center_dir) if os.path.isdir(os.path.join(center_dir, id))]
+    with instrumented_stage('listing'):
+        patient_ids = [id for id in os.listdir(center_dir) if os.path.isdir(os.path.join(center_dir, id))]
 
     print(f"  Found {len(patient_ids)} patients")
 
     # Collect interval data
-    intervals_data = []
-
-    for patient_id in patient_ids:
-        print(f"Processing Patient: {patient_id}")
-
-        # Build paths to DX and FU folders
-        dx_folder_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
-        fu_folder_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
-
-        # Get start datetimes
-        dx_start = get_first_edf_start_datetime(dx_folder_path)
-        fu_start = get_first_edf_start_datetime(fu_folder_path)
-
-        # Calculate interval if both datetimes are valid
-        if dx_start is None or fu_start is None:
-            print(f"      Skipping {patient_id} - missing DX or FU data")
-            intervals_data.append({'patientID': patient_id,
-                                   'interval_days': None,
-                                   'status': 'Missing data'})
-            continue
-
-        # Calculate interval
-        try:
-            interval = fu_start - dx_start
-            interval_seconds = interval.total_seconds()
-            interval_hours = interval_seconds/ 3600
-            interval_days = interval_hours/24
-
-            intervals_data.append({
-                'patientID': patient_id,
-                'interval_days': round(interval_days),
-                'status': 'Success'
-            })
-        except Exception as e:
-            print(f"Error calculating interval: {str(e)}")
-            intervals_data.append({
-                'patientID': patient_id,
-               'interval_days': None,
-                'status':  f'Error: {str(e)}'
-            })
+    calculate_interval = partial(calculate_patient_interval,
+                                 center_dir=center_dir,
+                                 diagnosis_folder_name=diagnosis_folder_name,
+                                 follow_up_folder_name=follow_up_folder_name,
+                                 manifest=manifest,
+                                 max_concurrent_reads=max_concurrent_reads)
+    if incremental and manifest is not None:
+        intervals_data = map_patients_incrementally(calculate_interval, patient_ids, center_dir,
+                                                    [diagnosis_folder_name, follow_up_folder_name],
+                                                    manifest, "intervals", workers)
+    else:
+        intervals_data = map_in_order(calculate_interval, patient_ids, workers)
     intervals_df = pd.DataFrame(intervals_data)
     return intervals_df
 
 def calculate_intervals_multiple_centers(root_folder,
                                          diagnosis_folder_name="diagnosis",
                                          follow_up_folder_name="follow up",
-                                         excel_filename="FU_DX_intervals_new.xlsx"):
+                                         excel_filename="FU_DX_intervals_new.xlsx",
+                                         use_manifest=True, workers=1, max_concurrent_reads=1,
+                                         output_format="excel", incremental=False, instrument=False):
     """
     Calculate DX-FU intervals for all centers in root folder.
 
@@ -207,6 +279,19 @@ def calculate_intervals_multiple_centers(root_folder,
         root_folder (str): Path to root directory containing center folders
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        use_manifest (bool): Reuse headers cached in the root folder's header manifest, a
+            local file in MANIFEST_CACHE_FOLDER (see edf_header_manifest), only re-reading files
+            whose size or mtime changed (default: True)
+        workers (int): Number of processes centers are spread across (default: 1)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+        output_format (str): 'excel' (default), 'parquet', 'feather' or 'csv'. Columnar
+            formats write one file per sheet next to the workbook path (see workbook_sink)
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run and merge them with the stored results of the
+            other patients; removed patients are dropped (default: False; needs use_manifest)
+        instrument (bool): Record per-stage wall time, EDF opens, bytes read and per-file
+            read latencies, and write them to {excel stem}_run_report.json in root_folder
+            (default: False; see run_instrumentation)
 
     Output Files (saved in root_folder):
         FU_DX_intervals.xlsx: One sheet per center with patient intervals
@@ -215,28 +300,41 @@ def calculate_intervals_multiple_centers(root_folder,
     if not os.path.exists(root_folder):
         raise FileNotFoundError(f"Root folder not found: {root_folder}")
 
-    # Get all center directories
-    center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
-    center_names = [os.path.basename(center_dir) for center_dir in center_directories]
-
-    print(f"\nFound {len(center_names)} centers to process\n")
-
-    # process each center
-    for center_idx, center_directory in enumerate(center_directories):
-
-        center_name = center_names[center_idx]
-        print(f"Processing Center {center_idx + 1}/{len(center_directories)}: {center_name}")
-        center_intervals = calculate_intervals_single_center(center_directory, diagnosis_folder_name=diagnosis_folder_name,
-                                          follow_up_folder_name=follow_up_folder_name)
-
-        # Save to Excel (one sheet per center)
-        write_dataframe_to_excel(
-            center_intervals,
-            root_folder,
-            excel_filename,
-            center_name,
-            mode='a'
-        )
+    with instrumented_run(root_folder, excel_filename, instrument):
+        # Get all center directories
+        center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
+        center_names = [os.path.basename(center_dir) for center_dir in center_directories]
+
+        print(f"\nFound {len(center_names)} centers to process\n")
+
+        with (EdfHeaderManifest(root_folder) if use_manifest else contextlib.nullcontext()) as manifest:
+            sink = WorkbookSink(output_format=output_format)
+
+            # process each center (in parallel when workers > 1)
+            all_center_intervals = map_in_order(partial(calculate_intervals_single_center,
+                                                        diagnosis_folder_name=diagnosis_folder_name,
+                                                        follow_up_folder_name=follow_up_folder_name,
+                                                        manifest=manifest,
+                                                        max_concurrent_reads=max_concurrent_reads,
+                                                        incremental=incremental),
+                                                center_directories, workers)
+
+            for center_idx, center_intervals in enumerate(all_center_intervals):
+
+                center_name = center_names[center_idx]
+                print(f"Saving Center {center_idx + 1}/{len(center_directories)}: {center_name}")
+
+                # Save to Excel (one sheet per center)
+                write_dataframe_to_excel(
+                    center_intervals,
+                    root_folder,
+                    excel_filename,
+                    center_name,
+                    mode='a',
+                    sink=sink
+                )
+
+            sink.write()
 
 
 if __name__ == "__main__":
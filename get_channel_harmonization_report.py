@@ -16,13 +16,19 @@ Input CSV Format:
     - Row 2: Renamed channel names
     - Row 3: Reordered channel names
 
+    The file is read with the csv module, so channel names containing commas must
+    be quoted. iter_channel_mapping_triplets streams one EDF at a time.
+
 Output:
     - CSV report showing channel consistency across all files
     - Identifies common channels, renamed channels, and unknown channels
 """
+import csv
 import os
 import sys
-from typing import Collection, Tuple, Dict, List
+from typing import Collection, Tuple, Dict, Iterable, Iterator, List, Union
+
+from channel_name_normalizer import normalize_channel_name
 
 # Standard EEG channel names (10-20 system + additional channels)
 STANDARD_CHANNEL_NAMES = [
@@ -32,11 +38,14 @@ STANDARD_CHANNEL_NAMES = [
 ]
 
 
-# This function removes what "-REF" and "EEG-", from the channel names
+# This function removes the "EEG" prefix and the "-Ref"/"-Org" suffix from the channel names
 def preprocess_channel_names(name: str) -> str:
     """
     Standardize channel names by removing common prefixes/suffixes.
 
+    Site aliases (e.g. T7 -> T3) are not applied here, so renames done in the
+    channel mapping still show up in the report.
+
     Args:
         name (str): Original channel name
 
@@ -47,86 +56,111 @@ def preprocess_channel_names(name: str) -> str:
         'EEG-Fp1-Ref' -> 'Fp1'
         'EEG-FZ-Org' -> 'Fz'
     """
+    return normalize_channel_name(name, use_aliases=False)
+
 
-    # Remove common prefixes and suffixes
-    name = name.replace("EEG", "")
-    name = name.replace("Org", "")
-    name = name.replace("Ref", "")
+TRIPLET_CATEGORIES = ["original", "renamed", "reordered"]
 
-    # Standardize midline electrode capitalization
-    name = name.replace("CZ", "Cz")
-    name = name.replace("FZ", "Fz")
-    name = name.replace("PZ", "Pz")
-    return name.strip()
 
+def _print_triplet(edf_filename: str, categories: Dict[str, List[str]]):
+    """Print the channels of one EDF (verbose mode)."""
+    print(f"* {edf_filename}")
+    for category, channels in categories.items():
+        print(f"   {category}: {channels}")
+
+
+# This function reads the csv file row by row, removes the spaces in the channel names and removes
+# the empty cells in the re-ordered channels, yielding one EDF at a time
+def iter_channel_mapping_triplets(filename: str, verbose: bool = False) -> Iterator[Tuple[str, Dict[str, List[str]]]]:
+    """
+    Stream the channel mapping triplets of a channel_mapping.csv file.
+
+    The file is parsed with the csv module, so quoted channel names may contain
+    commas. Only one triplet is held in memory at a time.
 
-# This function reads the csv files, line by line, and removes the spaces in the channel names and removes the empty cells in the re-ordered channels
-def read_channel_mapping_triplets(filename: str) -> Dict[str, Dict[str, List[str]]]:
+    Args:
+        filename: Path to channel_mapping.csv
+        verbose: Print every triplet as it is read (default: False)
+
+    Yields:
+        tuple: (edf_filename, {'original': [...], 'renamed': [...], 'reordered': [...]})
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If a triplet is incomplete (with the line number where it breaks)
+    """
     if not os.path.exists(filename):
         raise FileNotFoundError(f"Channel mapping file not found: {filename}")
 
-    def _print_records(triplet_info):
-        print(f"Dataset:")
-        for key, dict_values in triplet_info.items():
-            print(f"* {key}")
-            for category, channels in dict_values.items():
-                print(f"   {category}: {channels}")
+    with open(filename, "rt", newline="") as f:
+        reader = csv.reader(f)
+        # skip the header line
+        next(reader, None)
+
+        edf_filename = None
+        triplet_line = 0
+        categories = {}
+
+        for cells in reader:
+            cells = [cell.strip() for cell in cells]
+            # Skip blank lines only: an all-empty row with commas (",,,,") is the
+            # renamed row of a file where no channel was renamed
+            if len(cells) <= 1 and not any(cells):
+                continue
+
+            # The EDF filename is only on the original channel rows, not the renamed or reordered rows
+            category = TRIPLET_CATEGORIES[len(categories)]
+            if category == "original":
+                if not cells[0]:
+                    raise ValueError(f"Line {reader.line_num}: expected the original channels of a new EDF, "
+                                     f"but the filename column is empty")
+                edf_filename = cells[0]
+                triplet_line = reader.line_num
+            elif cells[0]:
+                raise ValueError(f"Incomplete triplet for file {edf_filename} (line {triplet_line}): "
+                                 f"line {reader.line_num} starts a new EDF before the {category} row")
+
+            # Remaining columns are channel names
+            channel_names = cells[1:]
+            if category == "reordered":
+                # Remove empty cells for reordered channels only
+                channel_names = [name for name in channel_names if len(name) > 0]
+
+            # Preprocess channel names (remove -EEG,...)
+            categories[category] = [preprocess_channel_names(name) for name in channel_names]
+
+            if len(categories) == len(TRIPLET_CATEGORIES):
+                if verbose:
+                    _print_triplet(edf_filename, categories)
+                yield edf_filename, categories
+                categories = {}
+
+        if categories:
+            raise ValueError(f"Incomplete triplet for file {edf_filename} (line {triplet_line}): "
+                             f"the file ends before the {TRIPLET_CATEGORIES[len(categories)]} row")
+
+
+def read_channel_mapping_triplets(filename: str, verbose: bool = False) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Read every channel mapping triplet of a channel_mapping.csv file into a dict.
+
+    Args:
+        filename: Path to channel_mapping.csv
+        verbose: Print every triplet as it is read (default: False)
+
+    Returns:
+        dict: edf_filename -> {'original': [...], 'renamed': [...], 'reordered': [...]}
+    """
+    if not os.path.exists(filename):
+        raise FileNotFoundError(f"Channel mapping file not found: {filename}")
 
-    triplet_result = {}
     try:
-        with open(filename, "rt") as f:
-            # skip the header line
-            header = f.readline()
-
-            counter = 0
-            edf_filename = None
-
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-
-                # Parse CSV line (note: this will break if channel names contain commas)
-                cells = [s.strip() for s in line.split(",")]  # TODO: this will break if the name has a comma
-
-                # We only update the "key" with original file names
-                # First column is the EDF filename (only on original channel rows, not the reorder or the new)
-                if counter % 3 == 0:
-                    edf_filename = cells[0]
-
-                # Remaining columns are channel names
-                channel_names = cells[1:]
-                categories: str  # this is just a comment
-
-                # seperating each 3 rows that belong to one edf and making a new dict out of it
-                if counter % 3 == 0:
-                    categories = "original"
-                    pass
-                elif counter % 3 == 1:
-                    categories = "renamed"
-                    pass
-                else:  # counter % 3 == 2
-                    categories = "reordered"
-
-                    # Remove empty cells for reordered channels only
-                    channel_names = [name for name in channel_names if len(name) > 0]
-                    pass
-
-                # Preprocess channel names (remove -EEG,...)
-                channel_names = [preprocess_channel_names(name) for name in channel_names]
-
-                # setdefault is a function for Dict and returns the value of the item with the specified key
-                # and here we defined the key to be the edf file name
-                # then we put the channel order as the value
-                # Store in result dictionary
-                triplet_result.setdefault(edf_filename, {})
-                triplet_result[edf_filename][categories] = channel_names
-                counter += 1
-
-        for edf_file, categories in triplet_result.items():
-            if not all(category in categories for category in ['original', 'renamed', 'reordered']):
-                raise ValueError(f"Incomplete triplet for file: {edf_file}")
-        _print_records(triplet_result)
+        # setdefault is a function for Dict and returns the value of the item with the specified key
+        # and here we defined the key to be the edf file name
+        # then we put the channel order as the value
+        triplet_result = {}
+        for edf_filename, categories in iter_channel_mapping_triplets(filename, verbose):
+            triplet_result.setdefault(edf_filename, {}).update(categories)
     except Exception as e:
         raise ValueError(f"Error reading channel mapping file: {str(e)}")
 
@@ -163,6 +197,9 @@ class ChannelMappingInfo:
     """
     Information about channel mapping for a single EDF file.
 
+    Lookups go through sets and dicts built once in __init__, so the channel
+    lists should be treated as read-only after construction.
+
     Attributes:
         edf_filename: Name of the EDF file
         existing_unchanged: Channels that exist and weren't renamed
@@ -170,6 +207,9 @@ class ChannelMappingInfo:
         absent: Channels expected but not present in this file
         unknown: Channels present but not in the standard List
     """
+    __slots__ = ('edf_filename', 'existing_unchanged', 'existing_renamed_tuples', 'absent', 'unknown',
+                 '_unchanged_or_unknown', '_listed', '_renamed_by_original', '_renamed_by_renamed')
+
     edf_filename: str
     existing_unchanged: List[str]
     existing_renamed_tuples: List[Tuple[str, str]]
@@ -183,50 +223,55 @@ class ChannelMappingInfo:
         self.unknown = unknown
         self.edf_filename = edf_filename
 
+        # Indexes for contains/get_channel_name
+        self._unchanged_or_unknown = set(existing_unchanged).union(unknown)
+        self._listed = self._unchanged_or_unknown.union(absent)
+        # original -> tuple and renamed -> tuple (the first tuple wins, like list.index)
+        self._renamed_by_original = {}
+        self._renamed_by_renamed = {}
+        for renamed_tuple in existing_renamed_tuples:
+            original_name, renamed_name = renamed_tuple
+            self._renamed_by_original.setdefault(original_name, renamed_tuple)
+            self._renamed_by_renamed.setdefault(renamed_name, renamed_tuple)
+
+    def _renamed_index(self, check_original_names: bool) -> Dict[str, Tuple[str, str]]:
+        """Index of the renamed tuples by original or by renamed name."""
+        return self._renamed_by_original if check_original_names else self._renamed_by_renamed
+
     def contains(self, channel_name: str, check_original_names: bool) -> bool:
         """Check if a channel name exists in this mapping."""
 
-        existing_renamed = [
-            original_name if check_original_names else renamed_name
-            for original_name, renamed_name in self.existing_renamed_tuples
-        ]
-        return (
-                channel_name in self.existing_unchanged or
-                channel_name in existing_renamed or
-                channel_name in self.absent or
-                channel_name in self.unknown
-        )
+        return channel_name in self._listed or channel_name in self._renamed_index(check_original_names)
 
     def get_channel_name(self, channel_name: str, check_original_names: bool, return_original_name: bool) -> str:
 
         """Get the channel name (original or renamed) if it exists."""
 
         # Check if it's an unchanged channel
-        if channel_name in self.existing_unchanged or channel_name in self.unknown:
+        if channel_name in self._unchanged_or_unknown:
             return channel_name
 
         # Check if it's a renamed channel
-        renamed_list = [
-            original_name if check_original_names else renamed_name
-            for original_name, renamed_name in self.existing_renamed_tuples
-        ]
-        if channel_name in renamed_list:
-            index = renamed_list.index(channel_name)
-            channel_original_name, channel_renamed_name = self.existing_renamed_tuples[index]
+        renamed_tuple = self._renamed_index(check_original_names).get(channel_name)
+        if renamed_tuple is not None:
+            channel_original_name, channel_renamed_name = renamed_tuple
             return channel_original_name if return_original_name else channel_renamed_name
 
         return "***"
 
 
 def analyze_channel_mappings(standard_channels: List[str],
-                             triplet_info: Dict[str, Dict[str, List[str]]]) -> \
+                             triplet_info: Union[Dict[str, Dict[str, List[str]]],
+                                                 Iterable[Tuple[str, Dict[str, List[str]]]]]) -> \
         list[ChannelMappingInfo]:
     """
     Analyze channel mappings for all EDF files.
 
     Args:
         standard_channels: List of expected standard channel names
-        triplet_info: Dictionary of channel mapping triplets
+        triplet_info: Dictionary of channel mapping triplets, or (edf_filename, categories)
+            pairs such as iter_channel_mapping_triplets yields (a file listed twice
+            keeps its first position and its last triplet, as in the dictionary)
 
     Returns:
         list: List of ChannelMappingInfo objects, one per EDF file
@@ -273,13 +318,13 @@ def analyze_channel_mappings(standard_channels: List[str],
         )
 
     # Analyze all files
-    results = []
+    results = {}
     standard_set = set(standard_channels)
 
-    for edf_file, categories in triplet_info.items():
-        mapping_info = _analyze_single_file(standard_set, edf_file, categories)
-        results.append(mapping_info)
-    return results
+    triplet_items = triplet_info.items() if isinstance(triplet_info, dict) else triplet_info
+    for edf_file, categories in triplet_items:
+        results[edf_file] = _analyze_single_file(standard_set, edf_file, categories)
+    return list(results.values())
 
 
 def get_common_nonrenamed_channels(mapping_info_list: List[ChannelMappingInfo]) -> List[str]:
@@ -391,15 +436,13 @@ def export_as_csv(output_filename: str, mapping_info_list: List[ChannelMappingIn
     unknown_column_headers = [f"Unknown{k + 1}" for k in range(max_extra_columns)]
 
     try:
-        with open(output_filename, "wt", encoding='utf-8') as f:
+        with open(output_filename, "wt", encoding='utf-8', newline="") as f:
+            # Quote channel names that contain commas, so the report reads back with the csv module
+            writer = csv.writer(f, lineterminator="\n")
             # Write header
-            header = "identifier," + ",".join(column_order) + ","
-            if unknown_column_headers:
-                header += ",".join(unknown_column_headers)
-            f.write(header + "\n")
+            writer.writerow(["identifier"] + column_order + (unknown_column_headers or [""]))
             # Write data rows
-            for row in rows:
-                f.write(",".join(row) + "\n")
+            writer.writerows(rows)
     except Exception as e:
         raise IOError(f"Error writing report file: {str(e)}")
 
@@ -418,15 +461,17 @@ def main():
 
     # Use standard channel list or auto-detect
     USE_STANDARD_CHANNELS = True
+    # Print every triplet while reading
+    VERBOSE = False
 
-    # Read channel mapping data
     print(f"Reading: {INPUT_CSV_FILENAME}")
-    triplet_data = read_channel_mapping_triplets(INPUT_CSV_FILENAME)
-
-    # Determine reference channel list
     if USE_STANDARD_CHANNELS:
+        # Stream the triplets straight into the analysis
         reference_channels = STANDARD_CHANNEL_NAMES
+        triplet_data = iter_channel_mapping_triplets(INPUT_CSV_FILENAME, verbose=VERBOSE)
     else:
+        # The reference order needs every triplet first
+        triplet_data = read_channel_mapping_triplets(INPUT_CSV_FILENAME, verbose=VERBOSE)
         reference_channels = find_most_complete_channel_order(triplet_data)
         print(f"Reference channel order:{reference_channels}")
     # Analyze channel mappings
@@ -24,23 +24,18 @@ Output:
     No need to pre-create files - they will be generated automatically.
 
 Important:
-    1. To be able to run this script, you need to make 4 empty Excel sheets,
-    with the following names:
+    1. The 4 Excel files of a center are created in the center directory if they
+    do not exist yet:
     f'{center_name}_SF_FU'
     f'{center_name}_SF_DX'
     f'{center_name}_channels_DX'
     f'{center_name}_channels_FU'
 
-    so for example for a center with name "10.CHOC" you should have these 4 empty
-    Excel sheets ready in the center directory:
-    10.CHOC_SF_FU
-    10.CHOC_SF_DX
-    10.CHOC_channels_DX
-    10.CHOC_channels_FU
+    All patient sheets are collected first and each file is written once at the
+    end of the center, instead of re-opening the workbook for every patient.
 
-
-    2. If you run the script multiple times on the same center, delete the
-    existing Excel files first to avoid duplicate sheet errors.
+    2. If you run the script multiple times on the same center, sheets of the
+    same patient are replaced.
 
 Usage:
     # Process single center
@@ -50,17 +45,26 @@ Usage:
     process_multiple_centers(root_folder="path/to/root/")
 """
 
-import pyedflib
+import contextlib
 import pandas as pd
 import os
+from functools import partial
 # Requires: openpyxl (used by pandas ExcelWriter)
 
-def extract_metadata_from_edf_folder(folder_path):
+from edf_header_manifest import EdfHeaderManifest, read_edf_headers
+from incremental_results import map_patients_incrementally
+from parallel_map import map_in_order
+from run_instrumentation import instrumented_run, instrumented_stage
+from workbook_sink import WorkbookSink, write_sheet
+
+def extract_metadata_from_edf_folder(folder_path, manifest=None, max_concurrent_reads=1):
     """
     Extract channel labels and sampling frequencies from all EDF files in a folder.
 
     Args:
         folder_path (str): Path to the folder containing EDF files
+        manifest (EdfHeaderManifest): Optional header manifest to reuse previously read headers
+        max_concurrent_reads (int): Maximum number of header reads in flight (default: 1)
 
     Returns:
         tuple: (signal_labels_df, sampling_frequency_df)
@@ -78,32 +82,41 @@ def extract_metadata_from_edf_folder(folder_path):
         return pd.DataFrame(), pd.DataFrame()
 
     # Get all EDF files in the folder
-    edf_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.edf')]
+    with instrumented_stage('listing'):
+        edf_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.edf')]
 
     if not edf_files:
         print(f"Warning: No EDF files found in {folder_path}")
         return pd.DataFrame(), pd.DataFrame()
 
+    # Read sampling frequency and channel labels from each EDF header
+    full_paths = [os.path.join(folder_path, edf_filename) for edf_filename in edf_files]
+    folder_headers = read_edf_headers(full_paths, manifest, max_concurrent_reads)
+
     # Process each EDF file
+    for edf_filename, (edf_header, error) in zip(edf_files, folder_headers):
+        if error is not None:
+            print(f"Error reading {edf_filename}: {str(error)}")
+            continue
 
-    for edf_filename in edf_files:
-        try:
-            full_path = os.path.join(folder_path, edf_filename)
-            # full_path = folder_path + edf_filename
+        # Store data in dictionaries
+        signal_labels_dict[edf_filename] = edf_header.signal_labels
+        sampling_frequency_dict[edf_filename] = edf_header.sample_frequencies
 
-            # Open and read sampling frequency and channel labels in each EDF file
-            with pyedflib.EdfReader(full_path) as edf_reader:
-                signal_labels = edf_reader.getSignalLabels()
-                sampling_frequencies = edf_reader.getSampleFrequencies()
+    return build_metadata_dataframes(signal_labels_dict, sampling_frequency_dict)
 
-            # Store data in dictionaries
-            signal_labels_dict[edf_filename] = signal_labels
-            sampling_frequency_dict[edf_filename] = sampling_frequencies
 
-        except Exception as e:
-            print(f"Error reading {edf_filename}: {str(e)}")
-            continue
+def build_metadata_dataframes(signal_labels_dict, sampling_frequency_dict):
+    """
+    Build the channel label and sampling frequency DataFrames of one folder.
+
+    Args:
+        signal_labels_dict (dict): EDF filename -> list of channel labels
+        sampling_frequency_dict (dict): EDF filename -> sampling frequencies
 
+    Returns:
+        tuple: (signal_labels_df, sampling_frequency_df), one column per EDF file
+    """
     # Convert dictionaries to DataFrames, using the pd.DataFrame.from_dict,
     # orient='index' and then .transpose, because sometimes, we have various
     # length of channels and just using p.DataFrame will raise an error
@@ -113,7 +126,7 @@ def extract_metadata_from_edf_folder(folder_path):
 #
 
 
-def write_dataframe_to_excel(data_frame, output_dir, excel_filename, sheet_name, mode='a'):
+def write_dataframe_to_excel(data_frame, output_dir, excel_filename, sheet_name, mode='a', sink=None):
     """
     Write a DataFrame to an Excel file as a new sheet.
 
@@ -123,6 +136,8 @@ def write_dataframe_to_excel(data_frame, output_dir, excel_filename, sheet_name,
         excel_filename (str): Name of the Excel file
         sheet_name (str): Name of the sheet to create
         mode (str): Write mode - 'a' for append (default), 'w' for overwrite
+        sink (WorkbookSink): Optional sink that writes the workbook once at the end of the run
+            (default: None, write now; a missing workbook is created)
     """
 
     if data_frame.empty:
@@ -131,8 +146,7 @@ def write_dataframe_to_excel(data_frame, output_dir, excel_filename, sheet_name,
 
     try:
         excel_path = os.path.join(output_dir, excel_filename)
-        with pd.ExcelWriter(excel_path, mode=mode, engine='openpyxl') as writer:
-            data_frame.to_excel(writer, sheet_name=sheet_name, index=False, na_rep='')
+        write_sheet(data_frame, excel_path, sheet_name, mode, sink)
 
     except Exception as e:
         print(f"Error writing to Excel file {excel_filename}, sheet {sheet_name}: {str(e)}")
@@ -140,7 +154,40 @@ def write_dataframe_to_excel(data_frame, output_dir, excel_filename, sheet_name,
 # r"c:\ta" -> c:\ta
 # "c:\ta" -> c:    a
 
-def process_single_center (center_dir,  diagnosis_folder_name = "diagnosis", follow_up_folder_name = "follow up"):
+def extract_patient_metadata(patient_id, center_dir, diagnosis_folder_name="diagnosis",
+                             follow_up_folder_name="follow up", manifest=None, max_concurrent_reads=1):
+    """
+    Extract channel labels and sampling frequencies for the DX and FU folders of one patient.
+
+    Args:
+        patient_id (str): Patient folder name
+        center_dir (str): Path to the center directory
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of header reads in flight (default: 1)
+
+    Returns:
+        tuple: (signal_labels_dx, signal_labels_fu, sampling_freq_dx, sampling_freq_fu)
+    """
+    print(f"    Processing Patient: {patient_id}")
+
+    # Extract metadata from diagnosis folder
+    dx_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
+    # dx_path = f'{center_dir}/{patient_ids[j]}/{diagnosis_folder_name}/'
+    signal_labels_dx, sampling_freq_dx = extract_metadata_from_edf_folder(dx_path, manifest, max_concurrent_reads)
+
+    # Extract metadata from follow up folder
+    fu_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
+    # fu_path = f'{center_dir}/{patient_ids[j]}/{follow_up_folder_name}/'
+    signal_labels_fu, sampling_freq_fu = extract_metadata_from_edf_folder(fu_path, manifest, max_concurrent_reads)
+
+    return signal_labels_dx, signal_labels_fu, sampling_freq_dx, sampling_freq_fu
+
+
+def process_single_center (center_dir,  diagnosis_folder_name = "diagnosis", follow_up_folder_name = "follow up",
+                           manifest=None, workers=1, max_concurrent_reads=1, sink=None,
+                           output_format="excel", incremental=False):
 
     """
     Process all patients in a single center directory.
@@ -149,6 +196,17 @@ def process_single_center (center_dir,  diagnosis_folder_name = "diagnosis", fol
         center_dir (str): Path to the center directory
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        workers (int): Number of processes patients are spread across (default: 1).
+            Sheets are still written in patient order.
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder
+            (default: 1). Raise it on high-latency network shares.
+        sink (WorkbookSink): Optional sink to collect the sheets in (default: None, the
+            four workbooks are written once when the center is done)
+        output_format (str): Output format used when no sink is given (default: "excel")
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run, reusing the results stored in the manifest
+            (default: False; needs a manifest)
 
     Output Files (saved in center_dir):
         - {center_name}_channels_DX.xlsx: Diagnosis channel labels
@@ -164,32 +222,42 @@ def process_single_center (center_dir,  diagnosis_folder_name = "diagnosis", fol
     print(f"Processing Center: {center_name}")
 
     # Get all patient IDs (subdirectories only, exclude any other file such as excel or .mat files
-    patient_ids = [id for id in os.listdir(center_dir) if os.path.isdir(os.path.join(center_dir, id))]
+    with instrumented_stage('listing'):
+        patient_ids = [id for id in os.listdir(center_dir) if os.path.isdir(os.path.join(center_dir, id))]
     # patient_ids = os.listdir(center_dir + '/')
 
-    # Process each patient
-    for patient_id in patient_ids:
-        print(f"    Processing Patient: {patient_id}")
-
-        # Extract metadata from diagnosis folder
-        dx_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
-        # dx_path = f'{center_dir}/{patient_ids[j]}/{diagnosis_folder_name}/'
-        signal_labels_dx, sampling_freq_dx = extract_metadata_from_edf_folder(dx_path)
-
-        # Extract metadata from follow up folder
-        fu_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
-        # fu_path = f'{center_dir}/{patient_ids[j]}/{follow_up_folder_name}/'
-        signal_labels_fu, sampling_freq_fu = extract_metadata_from_edf_folder(fu_path)
+    # Process each patient (in parallel when workers > 1)
+    extract_metadata = partial(extract_patient_metadata,
+                               center_dir=center_dir,
+                               diagnosis_folder_name=diagnosis_folder_name,
+                               follow_up_folder_name=follow_up_folder_name,
+                               manifest=manifest,
+                               max_concurrent_reads=max_concurrent_reads)
+    if incremental and manifest is not None:
+        all_metadata = map_patients_incrementally(extract_metadata, patient_ids, center_dir,
+                                                  [diagnosis_folder_name, follow_up_folder_name],
+                                                  manifest, "channels", workers)
+    else:
+        all_metadata = map_in_order(extract_metadata, patient_ids, workers)
+
+    center_sink = sink if sink is not None else WorkbookSink(output_format=output_format)
+    for patient_id, patient_metadata in zip(patient_ids, all_metadata):
+        signal_labels_dx, signal_labels_fu, sampling_freq_dx, sampling_freq_fu = patient_metadata
 
         # Save patient data to Excel (each patient gets own sheet)
         sheet_name = patient_id
-        write_dataframe_to_excel(signal_labels_dx, center_dir, f'{center_name}_channels_DX.xlsx', sheet_name, mode='a')
-        write_dataframe_to_excel(signal_labels_fu, center_dir, f'{center_name}_channels_FU.xlsx', sheet_name, mode='a')
-        write_dataframe_to_excel(sampling_freq_dx, center_dir, f'{center_name}_SF_DX.xlsx', sheet_name, mode='a')
-        write_dataframe_to_excel(sampling_freq_fu, center_dir, f'{center_name}_SF_FU.xlsx', sheet_name, mode='a')
+        write_dataframe_to_excel(signal_labels_dx, center_dir, f'{center_name}_channels_DX.xlsx', sheet_name, mode='a', sink=center_sink)
+        write_dataframe_to_excel(signal_labels_fu, center_dir, f'{center_name}_channels_FU.xlsx', sheet_name, mode='a', sink=center_sink)
+        write_dataframe_to_excel(sampling_freq_dx, center_dir, f'{center_name}_SF_DX.xlsx', sheet_name, mode='a', sink=center_sink)
+        write_dataframe_to_excel(sampling_freq_fu, center_dir, f'{center_name}_SF_FU.xlsx', sheet_name, mode='a', sink=center_sink)
+
+    if sink is None:
+        center_sink.write()
 
 
-def process_multiple_centers(root_folder="Z:/uci_vmostaghimi/testing-root/", diagnosis_folder_name = "diagnosis", follow_up_folder_name = "follow up"):
+def process_multiple_centers(root_folder="Z:/uci_vmostaghimi/testing-root/", diagnosis_folder_name = "diagnosis", follow_up_folder_name = "follow up",
+                             use_manifest=True, workers=1, max_concurrent_reads=1,
+                             output_format="excel", incremental=False, instrument=False):
     """
     Process all EEG files across multiple centers and patients, extracting metadata.
 
@@ -203,6 +271,20 @@ def process_multiple_centers(root_folder="Z:/uci_vmostaghimi/testing-root/", dia
         root_folder (str): Path to root directory containing center folders
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        use_manifest (bool): Reuse headers cached in the root folder's header manifest, a
+            local file in MANIFEST_CACHE_FOLDER (see edf_header_manifest), only re-reading files
+            whose size or mtime changed (default: True)
+        workers (int): Number of processes centers are spread across (default: 1).
+            Each center writes its own files, so centers do not share a workbook.
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+        output_format (str): 'excel' (default), 'parquet', 'feather' or 'csv'. Columnar
+            formats write one file per sheet next to the workbook path (see workbook_sink)
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run and merge them with the stored results of the
+            other patients; removed patients are dropped (default: False; needs use_manifest)
+        instrument (bool): Record per-stage wall time, EDF opens, bytes read and per-file
+            read latencies, and write them to channels_and_SF_run_report.json in root_folder
+            (default: False; see run_instrumentation)
 
     Output Files (per center):
         - {center_name}_channels_DX.xlsx: Diagnosis channel labels
@@ -214,16 +296,26 @@ def process_multiple_centers(root_folder="Z:/uci_vmostaghimi/testing-root/", dia
     if not os.path.exists(root_folder):
         raise FileNotFoundError(f"Root folder not found: {root_folder}")
 
-    # Get all center directories
-    center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
-    center_names = [os.path.basename(center_dir) for center_dir in center_directories]
-    print(f"Found {len(center_names)} center to process\n")
+    with instrumented_run(root_folder, 'channels_and_SF', instrument):
+        # Get all center directories
+        center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
+        center_names = [os.path.basename(center_dir) for center_dir in center_directories]
+        print(f"Found {len(center_names)} center to process\n")
+
+        with (EdfHeaderManifest(root_folder) if use_manifest else contextlib.nullcontext()) as manifest:
+
+            # Process each center (in parallel when workers > 1)
+            map_in_order(partial(process_single_center,
+                                 diagnosis_folder_name=diagnosis_folder_name,
+                                 follow_up_folder_name=follow_up_folder_name,
+                                 manifest=manifest,
+                                 max_concurrent_reads=max_concurrent_reads,
+                                 output_format=output_format,
+                                 incremental=incremental),
+                         center_directories, workers)
+            for center_name in center_names:
+                print(f"  ✓ Completed {center_name}")
 
-    # Process each center
-    for center_idx, center_dir in enumerate(center_directories):
-        center_name = center_names[center_idx]
-        process_single_center(center_dir,  diagnosis_folder_name, follow_up_folder_name)
-        print(f"  ✓ Completed {center_name}\n")
     print("All centers processed successfully!")
 
 if __name__ == "__main__":
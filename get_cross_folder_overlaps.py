@@ -0,0 +1,403 @@
+"""
+Cross-Folder Overlap Detector
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+get_edfs_overlaps only compares recordings inside one 'diagnosis' or 'follow up'
+folder, so it misses files duplicated between DX and FU or copied into another
+patient's folder. This script builds an interval index over the timing of every
+recording of a center (or of the whole network) and reports every pair of
+overlapping recordings that live in different folders.
+
+The index is built from header timing only (start datetime and duration), so no
+file is opened more than once and no pairwise file opens are needed. Looking up
+the recordings that overlap a given time span takes O(log n + number of matches).
+
+Directory Structure:
+    root_folder/
+    ├── center1/
+    │   ├── patient1/
+    │   │   ├── diagnosis/
+    │   │   │   └── *.edf
+    │   │   └── follow up/
+    │   │       └── *.edf
+    └── center2/
+        └── ...
+
+Output:
+    cross_folder_overlaps.xlsx: One sheet per center (or a single 'all_centers'
+                                sheet with network_wide=True) listing pairs of
+                                overlapping recordings from different folders
+
+Usage:
+    # Process single center
+    cross_overlaps = find_center_cross_folder_overlaps(center_dir="path/to/center/")
+
+    # Reuse the recordings of the single-pass scanner
+    scan_results = scan_single_center(center_dir="path/to/center/")
+    cross_overlaps = find_cross_folder_overlaps(scan_results['recordings'])
+
+    # Process all centers
+    process_all_centers_cross_folder_overlaps(root_folder="path/to/root/")
+
+Note:
+    process_all_centers_cross_folder_overlaps collects every sheet and writes the Excel
+    file once at the end of the run, creating it in the root_folder if it does not exist yet.
+"""
+
+import contextlib
+import os
+
+import pandas as pd
+
+from edf_header_manifest import EdfHeaderManifest
+from get_edf_timing_info import build_timing_record
+from run_instrumentation import instrumented_run, instrumented_stage
+from scan_center_tree import read_folder_headers
+from workbook_sink import WorkbookSink, write_sheet
+
+
+RECORDING_COLUMNS = ["Patient_ID", "Folder", "EDF", "Start DateTime", "Finish DateTime",
+                     "Duration in seconds"]
+LOCATION_COLUMNS = ["Center", "Patient_ID", "Folder", "EDF"]
+
+
+class RecordingIntervalIndex:
+    """
+    Static interval tree over the recordings of a center or of the whole network.
+
+    The recordings are sorted by start time and seen as an implicit balanced binary
+    tree (the middle element of every range is its root). Each node stores the
+    latest finish time of its subtree, so subtrees that end before the queried span
+    are skipped.
+
+    Attributes:
+        recordings: DataFrame the index was built from (positional row order is
+            used for every returned index)
+        start_datetimes, finish_datetimes: Start and finish of every recording, by row position
+    """
+
+    def __init__(self, recordings):
+        self.recordings = recordings.reset_index(drop=True)
+        # Object arrays keep the values as .iloc returns them (Timestamp / datetime)
+        self.start_datetimes = self.recordings["Start DateTime"].to_numpy(dtype=object)
+        self.finish_datetimes = self.recordings["Finish DateTime"].to_numpy(dtype=object)
+
+        self._order = sorted(range(len(self.start_datetimes)), key=lambda k: self.start_datetimes[k])
+        self._starts = [self.start_datetimes[k] for k in self._order]
+        self._finishes = [self.finish_datetimes[k] for k in self._order]
+        self._max_finish = [None] * len(self._order)
+        self._build(0, len(self._order))
+
+    def _build(self, lo, hi):
+        """Fill the subtree latest finish times of the range [lo, hi)."""
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        max_finish = self._finishes[mid]
+        for child_max_finish in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child_max_finish is not None and child_max_finish > max_finish:
+                max_finish = child_max_finish
+        self._max_finish[mid] = max_finish
+        return max_finish
+
+    def __len__(self):
+        return len(self._order)
+
+    def overlapping(self, start_datetime, finish_datetime):
+        """
+        Find the recordings overlapping a time span.
+
+        Recordings that only touch the span (one ends exactly when the other
+        starts) count as overlapping, as in get_edfs_overlaps.
+
+        Args:
+            start_datetime (datetime): Start of the span
+            finish_datetime (datetime): End of the span
+
+        Returns:
+            list: Row positions in self.recordings, in increasing order
+        """
+        found = []
+        ranges = [(0, len(self._order))]
+        while ranges:
+            lo, hi = ranges.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_finish[mid] < start_datetime:
+                continue
+            ranges.append((lo, mid))
+            if self._starts[mid] <= finish_datetime:
+                if self._finishes[mid] >= start_datetime:
+                    found.append(self._order[mid])
+                ranges.append((mid + 1, hi))
+        return sorted(found)
+
+    def overlaps_of(self, position):
+        """
+        Find the recordings overlapping one of the indexed recordings.
+
+        Args:
+            position (int): Row position of the recording in self.recordings
+
+        Returns:
+            list: Row positions of the other overlapping recordings
+        """
+        return [other for other in self.overlapping(self.start_datetimes[position], self.finish_datetimes[position])
+                if other != position]
+
+
+def find_cross_folder_overlaps(recordings, include_same_folder=False):
+    """
+    Report overlapping recordings across folders, patients (and centers).
+
+    Args:
+        recordings (pd.DataFrame): One row per EDF with 'Patient_ID', 'Folder', 'EDF',
+            'Start DateTime' and 'Finish DateTime' (and optionally 'Center'), e.g.
+            scan_single_center(...)['recordings']
+        include_same_folder (bool): Also report pairs inside one folder, which
+            get_edfs_overlaps already lists (default: False)
+
+    Returns:
+        pd.DataFrame: One row per overlapping pair with the location columns of both
+                      recordings (suffixed 1 and 2), 'Same Patient', 'Overlap in seconds'
+                      and 'Identical Timing' (1 if both start and finish match, which
+                      usually means the file was copied)
+    """
+    location_columns = [column for column in LOCATION_COLUMNS if column in recordings.columns]
+    report_columns = ([f"{column}1" for column in location_columns]
+                      + [f"{column}2" for column in location_columns]
+                      + ["Same Patient", "Overlap in seconds", "Identical Timing"])
+    if recordings.empty:
+        return pd.DataFrame(columns=report_columns)
+
+    interval_index = RecordingIntervalIndex(recordings)
+    indexed = interval_index.recordings
+    folder_keys = list(zip(*(indexed[column] for column in location_columns[:-1])))
+    patient_keys = [folder_key[:-1] for folder_key in folder_keys]
+    # Columns pulled out once, so each pair is built from array lookups instead of two .iloc rows
+    locations = {column: indexed[column].to_numpy(dtype=object) for column in location_columns}
+    start_datetimes = interval_index.start_datetimes
+    finish_datetimes = interval_index.finish_datetimes
+
+    overlap_data = []
+    for i in range(len(indexed)):
+        for j in interval_index.overlaps_of(i):
+            # Each pair once, and pairs inside one folder only when asked for
+            if j < i or (not include_same_folder and folder_keys[i] == folder_keys[j]):
+                continue
+
+            overlap = (min(finish_datetimes[i], finish_datetimes[j])
+                       - max(start_datetimes[i], start_datetimes[j]))
+            identical_timing = (start_datetimes[i] == start_datetimes[j]
+                                and finish_datetimes[i] == finish_datetimes[j])
+
+            row = {f"{column}1": locations[column][i] for column in location_columns}
+            row.update({f"{column}2": locations[column][j] for column in location_columns})
+            row["Same Patient"] = 1 if patient_keys[i] == patient_keys[j] else 0
+            row["Overlap in seconds"] = overlap.total_seconds()
+            row["Identical Timing"] = 1 if identical_timing else 0
+            overlap_data.append(row)
+
+    return pd.DataFrame(overlap_data, columns=report_columns)
+
+
+def collect_center_recordings(center_dir, diagnosis_folder_name="diagnosis",
+                              follow_up_folder_name="follow up", manifest=None,
+                              max_concurrent_reads=1):
+    """
+    Read the timing of every EDF of a center from the headers.
+
+    Args:
+        center_dir (str): Path to the center directory
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+
+    Returns:
+        pd.DataFrame: Same columns as the 'recordings' of scan_single_center
+    """
+    if not os.path.exists(center_dir):
+        raise FileNotFoundError(f"Center directory not found: {center_dir}")
+
+    # Get all patient IDs (subdirectories only)
+    with instrumented_stage('listing'):
+        patient_ids = [d for d in os.listdir(center_dir)
+                       if os.path.isdir(os.path.join(center_dir, d))]
+    print(f"  Found {len(patient_ids)} patients")
+
+    recordings_data = []
+    for patient_id in patient_ids:
+        for folder_name in [diagnosis_folder_name, follow_up_folder_name]:
+            folder_path = os.path.join(center_dir, patient_id, folder_name)
+            for edf_filename, edf_header in read_folder_headers(folder_path, manifest, max_concurrent_reads):
+                timing = build_timing_record(edf_filename, edf_header)
+                recordings_data.append({"Patient_ID": patient_id,
+                                        "Folder": folder_name,
+                                        "EDF": edf_filename,
+                                        "Start DateTime": timing["Start DateTime"],
+                                        "Finish DateTime": timing["Finish DateTime"],
+                                        "Duration in seconds": timing["Duration in seconds"]})
+
+    return pd.DataFrame(recordings_data, columns=RECORDING_COLUMNS)
+
+
+def find_center_cross_folder_overlaps(center_dir, diagnosis_folder_name="diagnosis",
+                                      follow_up_folder_name="follow up", manifest=None,
+                                      max_concurrent_reads=1, include_same_folder=False):
+    """
+    Find recordings of a center that overlap across folders or patients.
+
+    Args:
+        center_dir (str): Path to the center directory
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+        include_same_folder (bool): Also report pairs inside one folder (default: False)
+
+    Returns:
+        pd.DataFrame: See find_cross_folder_overlaps
+    """
+    center_name = os.path.basename(os.path.normpath(center_dir))
+    print(f"\nProcessing Center: {center_name}")
+
+    recordings = collect_center_recordings(center_dir, diagnosis_folder_name, follow_up_folder_name,
+                                           manifest, max_concurrent_reads)
+    cross_overlaps = find_cross_folder_overlaps(recordings, include_same_folder)
+    print(f"  Found {len(cross_overlaps)} cross-folder overlap(s) in {center_name}")
+    return cross_overlaps
+
+
+def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a', sink=None):
+    """
+    Write a DataFrame to an Excel file as a new sheet.
+
+    Args:
+        data_frame (pd.DataFrame): Data to write
+        folder_dir (str): Directory where Excel file should be saved
+        excel_filename (str): Name of the Excel file
+        sheet_name (str): Name of the sheet to create
+        mode (str): Write mode - 'a' for append (default), 'w' for overwrite
+        sink (WorkbookSink): Optional sink that writes the workbook once at the end of the run
+            (default: None, write now; a missing workbook is created)
+    """
+    if data_frame.empty:
+        print(f"  ✓ No cross-folder overlaps found for {sheet_name}")
+    try:
+        excel_path = os.path.join(folder_dir, excel_filename)
+        write_sheet(data_frame, excel_path, sheet_name, mode, sink)
+    except Exception as e:
+        print(f"Error writing to Excel file {excel_filename}, sheet {sheet_name}: {str(e)}")
+
+
+def process_all_centers_cross_folder_overlaps(root_folder, diagnosis_folder_name="diagnosis",
+                                              follow_up_folder_name="follow up",
+                                              excel_filename="cross_folder_overlaps.xlsx",
+                                              network_wide=False, include_same_folder=False,
+                                              use_manifest=True, max_concurrent_reads=1,
+                                              output_format="excel", instrument=False):
+    """
+    Find recordings overlapping across folders for every center.
+
+    Args:
+        root_folder (str): Path to root directory containing center folders
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        excel_filename (str): Name of output Excel file (default: "cross_folder_overlaps.xlsx")
+        network_wide (bool): Index all centers together, so files copied between centers
+            are found too, and write a single 'all_centers' sheet (default: False)
+        include_same_folder (bool): Also report pairs inside one folder (default: False)
+        use_manifest (bool): Reuse headers cached in the root folder's header manifest, a
+            local file in MANIFEST_CACHE_FOLDER (see edf_header_manifest) (default: True)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+        output_format (str): 'excel' (default), 'parquet', 'feather' or 'csv'. Columnar
+            formats write one file per sheet next to the workbook path (see workbook_sink)
+        instrument (bool): Record per-stage wall time, EDF opens, bytes read and per-file
+            read latencies, and write them to {excel stem}_run_report.json in root_folder
+            (default: False; see run_instrumentation)
+
+    Output Files (saved in root_folder):
+        cross_folder_overlaps.xlsx: One sheet per center, or one 'all_centers' sheet
+
+    Returns:
+        pd.DataFrame: All reported pairs, with the center of each recording
+    """
+    if not os.path.exists(root_folder):
+        raise FileNotFoundError(f"Root folder not found: {root_folder}")
+
+    with instrumented_run(root_folder, excel_filename, instrument):
+        # Get all center directories
+        center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
+        center_names = [os.path.basename(center_dir) for center_dir in center_directories]
+        print(f"Found {len(center_names)} centers to process")
+
+        with (EdfHeaderManifest(root_folder) if use_manifest else contextlib.nullcontext()) as manifest:
+            all_recordings = []
+            for center_idx, center_directory in enumerate(center_directories):
+                center_name = center_names[center_idx]
+                print(f"Processing Center {center_idx + 1}/{len(center_directories)}: {center_name}")
+                recordings = collect_center_recordings(center_directory, diagnosis_folder_name,
+                                                       follow_up_folder_name, manifest, max_concurrent_reads)
+                recordings.insert(0, 'Center', center_name)
+                all_recordings.append(recordings)
+
+        sink = WorkbookSink(output_format=output_format)
+        if network_wide:
+            network_recordings = (pd.concat(all_recordings, ignore_index=True) if all_recordings
+                                  else pd.DataFrame(columns=["Center"] + RECORDING_COLUMNS))
+            all_cross_overlaps = find_cross_folder_overlaps(network_recordings, include_same_folder)
+            write_dataframe_to_excel(all_cross_overlaps, root_folder, excel_filename, 'all_centers', mode='a',
+                                     sink=sink)
+            sink.write()
+            return all_cross_overlaps
+
+        center_cross_overlaps = []
+        for center_name, recordings in zip(center_names, all_recordings):
+            cross_overlaps = find_cross_folder_overlaps(recordings, include_same_folder)
+            write_dataframe_to_excel(cross_overlaps, root_folder, excel_filename, center_name, mode='a', sink=sink)
+            center_cross_overlaps.append(cross_overlaps)
+        sink.write()
+
+    if not center_cross_overlaps:
+        return find_cross_folder_overlaps(pd.DataFrame(columns=["Center"] + RECORDING_COLUMNS))
+    return pd.concat(center_cross_overlaps, ignore_index=True)
+
+
+if __name__ == '__main__':
+    # CONFIGURATION
+    DIAGNOSIS_FOLDER = "diagnosis"
+    FOLLOWUP_FOLDER = "follow up"
+    EXCEL_FILENAME = "cross_folder_overlaps.xlsx"
+
+    # ------ Option 1: Process ALL Centers ------
+    # Uncomment to process multiple centers:
+    # process_all_centers_cross_folder_overlaps(
+    #     root_folder="Z:/uci_vmostaghimi/testing-root/",
+    #     diagnosis_folder_name=DIAGNOSIS_FOLDER,
+    #     follow_up_folder_name=FOLLOWUP_FOLDER,
+    #     excel_filename=EXCEL_FILENAME,
+    #     network_wide=True
+    # )
+
+    # ------ Option 2: Process SINGLE Center ------
+    CENTER_DIR = 'Z:/uci_vmostaghimi/23.uconn_jmadan_new'
+    with EdfHeaderManifest(CENTER_DIR) as center_manifest:
+        cross_overlaps_df = find_center_cross_folder_overlaps(
+            center_dir=CENTER_DIR,
+            diagnosis_folder_name=DIAGNOSIS_FOLDER,
+            follow_up_folder_name=FOLLOWUP_FOLDER,
+            manifest=center_manifest
+        )
+
+    write_dataframe_to_excel(
+        cross_overlaps_df,
+        folder_dir=CENTER_DIR,
+        excel_filename=EXCEL_FILENAME,
+        sheet_name="23.uconn_jmadan",
+        mode='w'
+    )
@@ -38,19 +38,52 @@ Usage:
 
 
 Note:
-    If you want to run process_all_centers_timing, make sure you make an empty
-    Excel spreadsheet with the exact same name as you input to the function, in the
-    directory you want to save the Excel spreadsheet (in this scrip the root_folder)
+    process_all_centers_timing collects every sheet and writes the Excel file once at
+    the end of the run, creating it in the root_folder if it does not exist yet.
 """
 
 
-import pyedflib
+import contextlib
 import pandas as pd
 import os
 
 from datetime import timedelta
+from functools import partial
 
-def   extract_edf_timing_info(folder_path, min_duration_seconds=120):
+from edf_header_manifest import EdfHeaderManifest, read_edf_headers
+from incremental_results import map_patients_incrementally
+from parallel_map import map_in_order
+from run_instrumentation import instrumented_run, instrumented_stage
+from workbook_sink import WorkbookSink, write_sheet
+
+def build_timing_record(edf_filename, edf_header, min_duration_seconds=120):
+    """
+    Build the timing row of one EDF file from its parsed header.
+
+    Args:
+        edf_filename (str): Name of the EDF file
+        edf_header (EdfHeader): Parsed header of the file
+        min_duration_seconds (int): Minimum acceptable duration in seconds (default: 120)
+
+    Returns:
+        dict: One row of the timing DataFrame
+    """
+    start_datetime = edf_header.start_datetime
+    duration_seconds = edf_header.duration_seconds
+
+    # Calculate end time
+    duration = timedelta(seconds=duration_seconds)
+    end_datetime = start_datetime + duration
+
+    flag = 1 if duration_seconds < min_duration_seconds else 0
+    return {"PatientID": edf_filename,
+            "Start DateTime": start_datetime,
+            "Finish DateTime": end_datetime,
+            "Duration in seconds": duration_seconds,
+            "Duration < 120 s": flag}
+
+
+def   extract_edf_timing_info(folder_path, min_duration_seconds=120, manifest=None, max_concurrent_reads=1):
     """
         Extract timing information from all EDF files in a folder.
 
@@ -60,6 +93,8 @@ def   extract_edf_timing_info(folder_path, min_duration_seconds=120):
         Args:
             folder_path (str): Path to folder containing EDF files
             min_duration_seconds (int): Minimum acceptable duration in seconds (default: 120)
+            manifest (EdfHeaderManifest): Optional header manifest to reuse previously read headers
+            max_concurrent_reads (int): Maximum number of header reads in flight (default: 1)
 
         Returns:
             pd.DataFrame: DataFrame with columns:
@@ -76,7 +111,8 @@ def   extract_edf_timing_info(folder_path, min_duration_seconds=120):
 
     # Get all EDF files
     try:
-        edf_files = [file for file in os.listdir(folder_path) if file.lower().endswith('.edf')]
+        with instrumented_stage('listing'):
+            edf_files = [file for file in os.listdir(folder_path) if file.lower().endswith('.edf')]
     except Exception as e:
         print(f"Error listing directory {folder_path}: {str(e)}")
         return pd.DataFrame()
@@ -87,29 +123,15 @@ def   extract_edf_timing_info(folder_path, min_duration_seconds=120):
 
     timing_data = []
 
-    for edf_filename in edf_files:
-        try:
-            full_path = os.path.join(folder_path, edf_filename)
-
-            # Read edf timing information
+    # Read edf timing information from the headers only
+    full_paths = [os.path.join(folder_path, edf_filename) for edf_filename in edf_files]
+    folder_headers = read_edf_headers(full_paths, manifest, max_concurrent_reads)
 
-            with pyedflib.EdfReader(full_path) as edf_reader:
-                start_datetime = edf_reader.getStartdatetime()
-                duration_seconds = edf_reader.getFileDuration()
-
-            # Calculate end time
-            duration = timedelta(seconds=duration_seconds)
-            end_datetime = start_datetime + duration
-
-            flag = 1 if duration_seconds < min_duration_seconds else 0
-            timing_data.append({"PatientID": edf_filename,
-                                     "Start DateTime": start_datetime,
-                                     "Finish DateTime": end_datetime,
-                                     "Duration in seconds": duration_seconds,
-                                     "Duration < 120 s": flag})
-        except Exception as e:
-            print(f"Error reading {edf_filename}: {str(e)}")
+    for edf_filename, (edf_header, error) in zip(edf_files, folder_headers):
+        if error is not None:
+            print(f"Error reading {edf_filename}: {str(error)}")
             continue
+        timing_data.append(build_timing_record(edf_filename, edf_header, min_duration_seconds))
     if not timing_data:
         print(f"Warning: No valid EDF timing data collected from {folder_path}")
         return pd.DataFrame()
@@ -118,7 +140,7 @@ def   extract_edf_timing_info(folder_path, min_duration_seconds=120):
     return timing_data_df
 
 
-def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a'):
+def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a', sink=None):
     """
     Write a DataFrame to an Excel file as a new sheet.
 
@@ -128,6 +150,8 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         excel_filename (str): Name of the Excel file
         sheet_name (str): Name of the sheet to create
         mode (str): Write mode - 'a' for append (default), 'w' for overwrite
+        sink (WorkbookSink): Optional sink that writes the workbook once at the end of the run
+            (default: None, write now; a missing workbook is created)
     """
 
     if data_frame.empty:
@@ -135,15 +159,43 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         return
     excel_path = os.path.join(folder_dir, excel_filename)
     try:
-        with pd.ExcelWriter(excel_path, mode=mode, engine='openpyxl') as writer:
-            data_frame.to_excel(writer, sheet_name=sheet_name, na_rep='', index=False )
+        write_sheet(data_frame, excel_path, sheet_name, mode, sink)
     except Exception as e:
         print(f"Error writing to Excel file {excel_filename}, sheet {sheet_name}: {str(e)}")
 
 
+def process_single_patient_timing(patient_id, center_dir, diagnosis_folder_name="diagnosis",
+                                  follow_up_folder_name="follow up",
+                                  min_duration_seconds=120, manifest=None, max_concurrent_reads=1):
+    """
+    Extract timing information for the DX and FU folders of one patient.
+
+    Args:
+        patient_id (str): Patient folder name
+        center_dir (str): Path to the center directory
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        min_duration_seconds (int): Minimum duration threshold in seconds (default: 120)
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of header reads in flight (default: 1)
+
+    Returns:
+        pd.DataFrame: DX rows followed by FU rows
+    """
+    print(f"Processing Patient: {patient_id}")
+    dx_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
+    timing_dx = extract_edf_timing_info(dx_path, min_duration_seconds, manifest, max_concurrent_reads)
+
+    fu_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
+    timing_fu = extract_edf_timing_info(fu_path, min_duration_seconds, manifest, max_concurrent_reads)
+
+    return pd.concat([timing_dx, timing_fu], axis=0)
+
+
 def process_single_center_timing(center_dir, diagnosis_folder_name="diagnosis",
                                  follow_up_folder_name="follow up",
-                                 min_duration_seconds=120):
+                                 min_duration_seconds=120, manifest=None, workers=1,
+                                 max_concurrent_reads=1, incremental=False):
     """
     Process all EDF files in a single center and extract timing information.
 
@@ -152,6 +204,14 @@ def process_single_center_timing(center_dir, diagnosis_folder_name="diagnosis",
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
         min_duration_seconds (int): Minimum duration threshold in seconds (default: 120)
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        workers (int): Number of processes patients are spread across (default: 1).
+            Results are merged in patient order, so the output does not depend on it.
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder
+            (default: 1). Raise it on high-latency network shares.
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run, reusing the results stored in the manifest
+            (default: False; needs a manifest)
 
     Returns:
         pd.DataFrame: Combined timing information for all patients in the center
@@ -163,21 +223,24 @@ def process_single_center_timing(center_dir, diagnosis_folder_name="diagnosis",
     print(f"\nProcessing Center: {center_name}")
 
     # Get all patient IDs (subdirectories only)
-    patient_ids = [d for d in os.listdir(center_dir)
-                   if os.path.isdir(os.path.join(center_dir, d))]
+    with instrumented_stage('listing'):
+        patient_ids = [d for d in os.listdir(center_dir)
+                       if os.path.isdir(os.path.join(center_dir, d))]
 
     print(f"Found {len(patient_ids)} patients")
-    all_timing = []
-    for patient_id in patient_ids:
-        print(f"Processing Patient: {patient_id}")
-        dx_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
-        timing_dx = extract_edf_timing_info(dx_path, min_duration_seconds)
-
-        fu_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
-        timing_fu = extract_edf_timing_info(fu_path, min_duration_seconds)
-
-        timing_one = pd.concat([timing_dx, timing_fu], axis=0)
-        all_timing.append(timing_one)
+    process_patient = partial(process_single_patient_timing,
+                              center_dir=center_dir,
+                              diagnosis_folder_name=diagnosis_folder_name,
+                              follow_up_folder_name=follow_up_folder_name,
+                              min_duration_seconds=min_duration_seconds,
+                              manifest=manifest,
+                              max_concurrent_reads=max_concurrent_reads)
+    if incremental and manifest is not None:
+        all_timing = map_patients_incrementally(process_patient, patient_ids, center_dir,
+                                                [diagnosis_folder_name, follow_up_folder_name],
+                                                manifest, f"timing:{min_duration_seconds}", workers)
+    else:
+        all_timing = map_in_order(process_patient, patient_ids, workers)
     if all_timing:
         combined_timing = pd.concat(all_timing, ignore_index=True)
         return combined_timing
@@ -189,7 +252,9 @@ def process_single_center_timing(center_dir, diagnosis_folder_name="diagnosis",
 def process_all_centers_timing(root_folder, diagnosis_folder_name="diagnosis",
                                follow_up_folder_name="follow up",
                                excel_filename="FU_DX_timings.xlsx",
-                               min_duration_seconds=120):
+                               min_duration_seconds=120,
+                               use_manifest=True, workers=1, max_concurrent_reads=1,
+                               output_format="excel", incremental=False, instrument=False):
     """
     Process all centers and extract timing information from all EDF files.
 
@@ -198,6 +263,19 @@ def process_all_centers_timing(root_folder, diagnosis_folder_name="diagnosis",
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
         min_duration_seconds (int): Minimum duration threshold in seconds (default: 120)
+        use_manifest (bool): Reuse headers cached in the root folder's header manifest, a
+            local file in MANIFEST_CACHE_FOLDER (see edf_header_manifest), only re-reading files
+            whose size or mtime changed (default: True)
+        workers (int): Number of processes centers are spread across (default: 1)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+        output_format (str): 'excel' (default), 'parquet', 'feather' or 'csv'. Columnar
+            formats write one file per sheet next to the workbook path (see workbook_sink)
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run and merge them with the stored results of the
+            other patients; removed patients are dropped (default: False; needs use_manifest)
+        instrument (bool): Record per-stage wall time, EDF opens, bytes read and per-file
+            read latencies, and write them to {excel stem}_run_report.json in root_folder
+            (default: False; see run_instrumentation)
 
     Output Files (saved in root_folder):
         FU_DX_timings.xlsx: One sheet per center with timing information
@@ -206,35 +284,43 @@ def process_all_centers_timing(root_folder, diagnosis_folder_name="diagnosis",
     if not os.path.exists(root_folder):
         raise FileNotFoundError(f"Root folder not found: {root_folder}")
 
-    # Get all center directories
-    center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
-    center_names = [os.path.basename(center_dir) for center_dir in center_directories]
-
-    print(f"\n{'=' * 60}")
-    print(f"Found {len(center_names)} centers to process")
-    print(f"{'=' * 60}\n")
-
-    # Process each center
-    for center_idx, center_directory in enumerate(center_directories):
-        center_name = center_names[center_idx]
-        print(f"Processing Center {center_idx + 1}/{len(center_directories)}: {center_name}")
-
-        center_timing = process_single_center_timing(
-            center_directory,
-            diagnosis_folder_name=diagnosis_folder_name,
-            follow_up_folder_name=follow_up_folder_name,
-            min_duration_seconds=min_duration_seconds
-        )
-
-        # Save to Excel (one sheet per center)
-        write_dataframe_to_excel(
-            center_timing,
-            root_folder,
-            excel_filename,
-            center_name,
-            mode='a'
-        )
-
+    with instrumented_run(root_folder, excel_filename, instrument):
+        # Get all center directories
+        center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
+        center_names = [os.path.basename(center_dir) for center_dir in center_directories]
+
+        print(f"\n{'=' * 60}")
+        print(f"Found {len(center_names)} centers to process")
+        print(f"{'=' * 60}\n")
+
+        with (EdfHeaderManifest(root_folder) if use_manifest else contextlib.nullcontext()) as manifest:
+            sink = WorkbookSink(output_format=output_format)
+
+            # Process each center (in parallel when workers > 1)
+            all_center_timing = map_in_order(partial(process_single_center_timing,
+                                                     diagnosis_folder_name=diagnosis_folder_name,
+                                                     follow_up_folder_name=follow_up_folder_name,
+                                                     min_duration_seconds=min_duration_seconds,
+                                                     manifest=manifest,
+                                                     max_concurrent_reads=max_concurrent_reads,
+                                                     incremental=incremental),
+                                             center_directories, workers)
+
+            for center_idx, center_timing in enumerate(all_center_timing):
+                center_name = center_names[center_idx]
+                print(f"Saving Center {center_idx + 1}/{len(center_directories)}: {center_name}")
+
+                # Save to Excel (one sheet per center)
+                write_dataframe_to_excel(
+                    center_timing,
+                    root_folder,
+                    excel_filename,
+                    center_name,
+                    mode='a',
+                    sink=sink
+                )
+
+            sink.write()
 
 
 if __name__ == '__main__':
@@ -10,9 +10,13 @@ Description:
 This script detects temporal overlaps between EDF (European Data Format) recordings
 within the same folder. Useful for identifying duplicate or concurrent recordings.
 
+Each header is read once. The recordings are sorted by start time and a sweep line
+keeps the recordings that have not ended yet, so a folder is checked in
+O(n log n + number of overlaps) instead of comparing every pair of files.
+
 Prerequisites:
-- An empty Excel file named "overlaps.xlsx" must exist in the root directory
-- The script will create sheets for each site containing pairs of overlapping files
+- The script will create "overlaps.xlsx" in the root directory (if needed) with
+  one sheet for each site containing pairs of overlapping files
 
 Folder Structure:
     testing_root/
@@ -25,16 +29,26 @@ Folder Structure:
 
 Output:
     overlaps.xlsx: Excel file with one sheet per site, listing pairs of overlapping EDFs
+                   and how long they overlap ('Overlap in seconds')
 
 Note:
-    If you want to run process_all_centers_overlaps, make sure you make an empty
-    Excel spreadsheet with the exact same name as you input to the function, in the
-    directory you want to save the Excel spreadsheet (in this scrip the root_folder)
+    process_all_centers_overlaps collects every sheet and writes each Excel file once at
+    the end of the run, creating it in the root_folder if it does not exist yet.
 """
-import pyedflib
+import contextlib
+import heapq
 import pandas as pd
 import os
 from datetime import timedelta
+from functools import partial
+
+from edf_header_manifest import EdfHeaderManifest, read_edf_header_cached, read_edf_headers
+from incremental_results import map_patients_incrementally
+from parallel_map import map_in_order
+from run_instrumentation import instrumented_run, instrumented_stage
+from workbook_sink import WorkbookSink, write_sheet
+
+OVERLAP_COLUMNS = ["EDF1", "EDF2", "Overlap in seconds"]
 
 """
 0. 1. 2, 3
@@ -62,88 +76,84 @@ D   C   2   2
 D   D   2   3   x
 
 """
-def find_overlapping_edfs(folder_path):
+def find_overlapping_edfs(folder_path, manifest=None, max_concurrent_reads=1):
     """
     Find all pairs of overlapping EDF files in a folder.
 
-    Compares all pairs of EDF files to detect temporal overlaps in recording times.
+    Reads each header once and finds overlapping recording times with a sweep
+    line (see find_overlapping_intervals).
 
     Args:
         folder_path (str): Path to folder containing EDF files
+        manifest (EdfHeaderManifest): Optional header manifest to reuse previously read headers
+        max_concurrent_reads (int): Maximum number of header reads in flight (default: 1)
 
     Returns:
         pd.DataFrame: DataFrame with columns 'EDF1' and 'EDF2' containing
-                      pairs of overlapping file names. Returns empty DataFrame
+                      pairs of overlapping file names, and 'Overlap in seconds'.
+                      Returns empty DataFrame
                       if folder doesn't exist or contains no overlaps.
     """
     # Check if folder exists
     if not os.path.exists(folder_path):
         print(f"Warning: Folder not found - {folder_path}")
-        return pd.DataFrame(columns=["EDF1", "EDF2"])
+        return pd.DataFrame(columns=OVERLAP_COLUMNS)
 
     # Get all EDF files
     try:
-        edf_files = [file for file in os.listdir(folder_path) if file.lower().endswith('.edf')]
+        with instrumented_stage('listing'):
+            edf_files = [file for file in os.listdir(folder_path) if file.lower().endswith('.edf')]
     except Exception as e:
         print(f"Error listing directory {folder_path}: {str(e)}")
-        return pd.DataFrame(columns=["EDF1", "EDF2"])
+        return pd.DataFrame(columns=OVERLAP_COLUMNS)
 
     if not edf_files:
         print(f"Warning: No EDF files found in {folder_path}")
-        return pd.DataFrame(columns=["EDF1", "EDF2"])
-
-    overlapping_edfs = pd.DataFrame(columns=["EDF1", "EDF2"])
+        return pd.DataFrame(columns=OVERLAP_COLUMNS)
+
+    # Read timing info of every EDF once
+    full_paths = [os.path.join(folder_path, edf_filename) for edf_filename in edf_files]
+    folder_headers = read_edf_headers(full_paths, manifest, max_concurrent_reads)
+
+    edf_names = []
+    start_datetimes = []
+    end_datetimes = []
+    for edf_filename, (edf_header, error) in zip(edf_files, folder_headers):
+        if error is not None:
+            print(f"    Error reading {edf_filename}: {str(error)}")
+            continue
+        edf_names.append(edf_filename)
+        start_datetimes.append(edf_header.start_datetime)
+        end_datetimes.append(edf_header.start_datetime + timedelta(seconds=edf_header.duration_seconds))
 
     # Collect overlapping pairs
-    edf1_names = []
-    edf2_names = []
-
-    for i, edf_name1 in enumerate(edf_files):
-
-        full_path1 = os.path.join(folder_path, edf_name1)
-        for j, edf_name2 in enumerate(edf_files):
-            if i >= j:
-                continue
-            full_path2 = os.path.join(folder_path, edf_name2)
-            try:
-                overlap = do_edfs_overlap(full_path1, full_path2)
-            except Exception as e:
-                print(f"    Error comparing {edf_name1} and {edf_name2}: {str(e)}")
-                continue
-
-            if overlap == 1:
-                edf1_names.append(edf_name1)
-                edf2_names.append(edf_name2)
-    if edf1_names:
-        overlapping_edfs = pd.DataFrame({"EDF1": edf1_names,
-                                         "EDF2": edf2_names
-                                         })
-    return overlapping_edfs
-
-
-def do_edfs_overlap(full_path_edf1, full_path_edf2):
+    return find_overlapping_intervals(edf_names, start_datetimes, end_datetimes)
+
+
+def do_edfs_overlap(full_path_edf1, full_path_edf2, manifest=None):
     """
     Check if two EDF files have overlapping recording times.
 
     Args:
         full_path_edf1 (str): Full path to first EDF file
         full_path_edf2 (str): Full path to second EDF file
+        manifest (EdfHeaderManifest): Optional header manifest to reuse previously read headers
 
     Returns:
         bool: True if recordings overlap, False otherwise
     """
     # Read timing info from first EDF
-    with pyedflib.EdfReader(full_path_edf1) as edf_reader1:
-        start_edf1 = edf_reader1.getStartdatetime()
-        duration_edf1_seconds = edf_reader1.getFileDuration()
+    edf_header1 = read_edf_header_cached(full_path_edf1, manifest)
+    start_edf1 = edf_header1.start_datetime
+    duration_edf1_seconds = edf_header1.duration_seconds
 
     duration_edf1 = timedelta(seconds=duration_edf1_seconds)
     end_edf1 = start_edf1 + duration_edf1
 
     # Read timing info from second EDF
-    with pyedflib.EdfReader(full_path_edf2) as edf_reader2:
-        start_edf2 = edf_reader2.getStartdatetime()
-        duration_edf2_seconds = edf_reader2.getFileDuration()
+    edf_header2 = read_edf_header_cached(full_path_edf2, manifest)
+    start_edf2 = edf_header2.start_datetime
+    duration_edf2_seconds = edf_header2.duration_seconds
 
     duration_edf2 = timedelta(seconds=duration_edf2_seconds)
     end_edf2 = start_edf2 + duration_edf2
@@ -159,7 +169,48 @@ def do_edfs_overlap(full_path_edf1, full_path_edf2):
 
 
 
-def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a'):
+def find_overlapping_intervals(edf_names, start_datetimes, end_datetimes):
+    """
+    Find all pairs of overlapping recordings from already known timings.
+
+    Recordings are visited in order of start time. A heap keyed by end time holds
+    the recordings that are still running; the ones that ended before the current
+    start are dropped, and every remaining one overlaps the current recording.
+    Recordings that only touch (one ends exactly when the other starts) count as
+    overlapping, as before.
+
+    Args:
+        edf_names (list): EDF file names
+        start_datetimes (list): Start datetime of each file
+        end_datetimes (list): End datetime of each file
+
+    Returns:
+        pd.DataFrame: DataFrame with columns 'EDF1', 'EDF2' and 'Overlap in seconds'.
+                      EDF1 is listed before EDF2 in edf_names, and pairs are in
+                      the same order as comparing every pair would give.
+    """
+    sweep_order = sorted(range(len(edf_names)), key=lambda k: (start_datetimes[k], end_datetimes[k]))
+
+    overlapping_pairs = []
+    running = []  # heap of (end_datetime, index)
+    for k in sweep_order:
+        while running and running[0][0] < start_datetimes[k]:
+            heapq.heappop(running)
+        for _, i in running:
+            overlapping_pairs.append((min(i, k), max(i, k)))
+        heapq.heappush(running, (end_datetimes[k], k))
+    overlapping_pairs.sort()
+
+    overlap_data = []
+    for i, j in overlapping_pairs:
+        overlap = min(end_datetimes[i], end_datetimes[j]) - max(start_datetimes[i], start_datetimes[j])
+        overlap_data.append({"EDF1": edf_names[i],
+                             "EDF2": edf_names[j],
+                             "Overlap in seconds": overlap.total_seconds()})
+    return pd.DataFrame(overlap_data, columns=OVERLAP_COLUMNS)
+
+
+def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a', sink=None):
     """
     Write a DataFrame to an Excel file as a new sheet.
 
@@ -169,22 +220,57 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         excel_filename (str): Name of the Excel file
         sheet_name (str): Name of the sheet to create
         mode (str): Write mode - 'a' for append (default), 'w' for overwrite
+        sink (WorkbookSink): Optional sink that writes the workbook once at the end of the run
+            (default: None, write now; a missing workbook is created)
     """
 
     if data_frame.empty:
         print(f"  ✓ No overlaps found for {sheet_name}")
         # Still write empty sheet to indicate folder was checked
-        data_frame = pd.DataFrame(columns=["EDF1", "EDF2"])
+        data_frame = pd.DataFrame(columns=OVERLAP_COLUMNS)
     try:
         excel_path = os.path.join(folder_dir, excel_filename)
-        with pd.ExcelWriter(excel_path, mode=mode, engine='openpyxl') as writer:
-            data_frame.to_excel(writer, sheet_name=sheet_name, index=False, na_rep='')
+        write_sheet(data_frame, excel_path, sheet_name, mode, sink)
     except Exception as e:
         print(f"Error writing to Excel file {excel_filename}, sheet {sheet_name}: {str(e)}")
 
 
+def find_patient_overlaps(patient_id, center_dir, diagnosis_folder_name="diagnosis",
+                          follow_up_folder_name="follow up", manifest=None, max_concurrent_reads=1):
+    """
+    Find overlapping EDF files in the DX and FU folders of one patient.
+
+    Args:
+        patient_id (str): Patient folder name
+        center_dir (str): Path to the center directory
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of header reads in flight (default: 1)
+
+    Returns:
+        list: Non-empty overlap DataFrames (DX first, then FU) with a 'Patient_ID' column
+    """
+    dx_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
+    fu_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
+
+    overlaps_dx = find_overlapping_edfs(dx_path, manifest, max_concurrent_reads)
+    overlaps_fu = find_overlapping_edfs(fu_path, manifest, max_concurrent_reads)
+
+    patient_overlaps = []
+    if not overlaps_dx.empty:
+        overlaps_dx.insert(0, 'Patient_ID', patient_id)
+        patient_overlaps.append(overlaps_dx)
+
+    if not overlaps_fu.empty:
+        overlaps_fu.insert(0, 'Patient_ID', patient_id)
+        patient_overlaps.append(overlaps_fu)
+    return patient_overlaps
+
+
 def process_single_center_overlaps(center_dir, diagnosis_folder_name="diagnosis",
-                                   follow_up_folder_name="follow up"):
+                                   follow_up_folder_name="follow up", manifest=None,
+                                   workers=1, max_concurrent_reads=1, incremental=False):
     """
     Find all overlapping EDF files in a single center.
 
@@ -192,6 +278,14 @@ def process_single_center_overlaps(center_dir, diagnosis_folder_name="diagnosis"
         center_dir (str): Path to the center directory
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        workers (int): Number of processes patients are spread across (default: 1).
+            Results are merged in patient order, so the output does not depend on it.
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder
+            (default: 1). Raise it on high-latency network shares.
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run, reusing the results stored in the manifest
+            (default: False; needs a manifest)
 
     Returns:
         pd.DataFrame: Combined overlap information for all patients
@@ -204,25 +298,24 @@ def process_single_center_overlaps(center_dir, diagnosis_folder_name="diagnosis"
     print(f"\nProcessing Center: {center_name}")
 
     # Get all patient IDs (subdirectories only)
-    patient_ids = [id for id in os.scandir(center_dir) if id.is_dir()]
+    with instrumented_stage('listing'):
+        patient_ids = [id.name for id in os.scandir(center_dir) if id.is_dir()]
 
     print(f"  Found {len(patient_ids)} patients")
 
-    all_overlaps = []
-    for patient_id in patient_ids:
-        dx_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
-        fu_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
-
-        overlaps_dx = find_overlapping_edfs(dx_path)
-        overlaps_fu = find_overlapping_edfs(fu_path)
-
-        if not overlaps_dx.empty:
-            overlaps_dx.insert(0, 'Patient_ID', patient_id)
-            all_overlaps.append(overlaps_dx)
-
-        if not overlaps_fu.empty:
-            overlaps_fu.insert(0, 'Patient_ID', patient_id)
-            all_overlaps.append(overlaps_fu)
+    find_overlaps = partial(find_patient_overlaps,
+                            center_dir=center_dir,
+                            diagnosis_folder_name=diagnosis_folder_name,
+                            follow_up_folder_name=follow_up_folder_name,
+                            manifest=manifest,
+                            max_concurrent_reads=max_concurrent_reads)
+    if incremental and manifest is not None:
+        all_patient_overlaps = map_patients_incrementally(find_overlaps, patient_ids, center_dir,
+                                                          [diagnosis_folder_name, follow_up_folder_name],
+                                                          manifest, "overlaps", workers)
+    else:
+        all_patient_overlaps = map_in_order(find_overlaps, patient_ids, workers)
+    all_overlaps = [overlaps for patient_overlaps in all_patient_overlaps for overlaps in patient_overlaps]
 
     if all_overlaps:
         combined_overlaps = pd.concat(all_overlaps, ignore_index=True)
@@ -230,12 +323,14 @@ def process_single_center_overlaps(center_dir, diagnosis_folder_name="diagnosis"
         return combined_overlaps
     else:
         print(f"\n  No overlaps found in {center_name}\n")
-        return pd.DataFrame(columns=["Patient_ID", "EDF1", "EDF2"])
+        return pd.DataFrame(columns=["Patient_ID"] + OVERLAP_COLUMNS)
 
 
 def process_all_centers_overlaps(root_folder, diagnosis_folder_name="diagnosis",
                                  follow_up_folder_name="follow up",
-                                 excel_filename="overlaps.xlsx"):
+                                 excel_filename="overlaps.xlsx",
+                                 use_manifest=True, workers=1, max_concurrent_reads=1,
+                                 output_format="excel", incremental=False, instrument=False):
     """
     Find overlapping EDFs in all centers.
 
@@ -244,6 +339,19 @@ def process_all_centers_overlaps(root_folder, diagnosis_folder_name="diagnosis",
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
         excel_filename (str): Name of output Excel file (default: "overlaps.xlsx")
+        use_manifest (bool): Reuse headers cached in the root folder's header manifest, a
+            local file in MANIFEST_CACHE_FOLDER (see edf_header_manifest), only re-reading files
+            whose size or mtime changed (default: True)
+        workers (int): Number of processes centers are spread across (default: 1)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+        output_format (str): 'excel' (default), 'parquet', 'feather' or 'csv'. Columnar
+            formats write one file per sheet next to the workbook path (see workbook_sink)
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run and merge them with the stored results of the
+            other patients; removed patients are dropped (default: False; needs use_manifest)
+        instrument (bool): Record per-stage wall time, EDF opens, bytes read and per-file
+            read latencies, and write them to {excel stem}_run_report.json in root_folder
+            (default: False; see run_instrumentation)
 
     Output Files (saved in root_folder):
         overlaps.xlsx: One sheet per center with overlapping EDF pairs
@@ -252,31 +360,40 @@ def process_all_centers_overlaps(root_folder, diagnosis_folder_name="diagnosis",
     if not os.path.exists(root_folder):
         raise FileNotFoundError(f"Root folder not found: {root_folder}")
 
-    # Get all center directories
-    center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
-    center_names = [os.path.basename(center_dir) for center_dir in center_directories]
-
-    print(f"Found {len(center_names)} centers to process")
-
-    # Process each center
-    for center_idx, center_directory in enumerate(center_directories):
-        center_name = center_names[center_idx]
-        print(f"Processing Center {center_idx + 1}/{len(center_directories)}: {center_name}")
-
-        center_overlaps = process_single_center_overlaps(
-            center_directory,
-            diagnosis_folder_name=diagnosis_folder_name,
-            follow_up_folder_name=follow_up_folder_name
-        )
-
-        # Save to Excel (one sheet per center)
-        write_dataframe_to_excel(
-            center_overlaps,
-            root_folder,
-            excel_filename,
-            center_name,
-            mode='a'
-        )
+    with instrumented_run(root_folder, excel_filename, instrument):
+        # Get all center directories
+        center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
+        center_names = [os.path.basename(center_dir) for center_dir in center_directories]
+
+        print(f"Found {len(center_names)} centers to process")
+
+        with (EdfHeaderManifest(root_folder) if use_manifest else contextlib.nullcontext()) as manifest:
+            sink = WorkbookSink(output_format=output_format)
+
+            # Process each center (in parallel when workers > 1)
+            all_center_overlaps = map_in_order(partial(process_single_center_overlaps,
+                                                       diagnosis_folder_name=diagnosis_folder_name,
+                                                       follow_up_folder_name=follow_up_folder_name,
+                                                       manifest=manifest,
+                                                       max_concurrent_reads=max_concurrent_reads,
+                                                       incremental=incremental),
+                                               center_directories, workers)
+
+            for center_idx, center_overlaps in enumerate(all_center_overlaps):
+                center_name = center_names[center_idx]
+                print(f"Saving Center {center_idx + 1}/{len(center_directories)}: {center_name}")
+
+                # Save to Excel (one sheet per center)
+                write_dataframe_to_excel(
+                    center_overlaps,
+                    root_folder,
+                    excel_filename,
+                    center_name,
+                    mode='a',
+                    sink=sink
+                )
+
+            sink.write()
 
 
 if __name__ == '__main__':
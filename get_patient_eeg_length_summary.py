@@ -28,23 +28,67 @@ Output:
     - duration_max_above_120: Boolean flag for quality check
 
 Note:
-    to Run this code first make an Excel file and put it in the root folder directory
-     and put the name you chose for that file in output_excel_filename
+    The output Excel file is created in the root folder directory if it does not
+    exist yet; all sheets are written in one pass at the end of the run
 """
 import os
 import pandas as pd
 from typing import List
 
+from workbook_sink import WorkbookSink, read_report, report_exists, write_sheet
+
+
+PATIENT_ID_PREFIX_LENGTH = 13  # Number of characters for patient identifier
+
+
+def summarize_patient_durations(site_data, min_duration_seconds=120,
+                                patient_id_prefix_length=PATIENT_ID_PREFIX_LENGTH) -> pd.DataFrame:
+    """
+    Build the duration validation report of one site from its timing rows.
+
+    Args:
+        site_data: DataFrame with 'PatientID' (EDF name) and 'Duration in seconds' columns,
+            e.g. one sheet of FU_DX_timings.xlsx or process_single_center_timing output
+        min_duration_seconds: Minimum required duration for single EDF (default: 120 seconds)
+        patient_id_prefix_length: Number of characters identifying the patient (default: 13)
+
+    Returns:
+        DataFrame with 'PatientID', 'Sum_Duration', 'Max_Duration' and
+        'duration_max_above_120', one row per patient
+    """
+    # Extract patient ID prefix for grouping
+    # astype converts the patientIDs to strings and then .str allows to perform
+    # vectorwise operation on the patientID
+    patient_id_prefix = site_data['PatientID'].astype(str).str[:patient_id_prefix_length]
+
+    # Group by the patient prefix and find the maximum duration within each group
+    # Calculate duration statistics per patient
+    duration_stats = (
+        site_data['Duration in seconds']
+        .groupby(patient_id_prefix.rename('PatientID_prefix'))
+        .agg(['max', 'sum'])
+        .reset_index()
+    )
+
+    # Create validation report
+    return pd.DataFrame({
+        'PatientID': duration_stats['PatientID_prefix'],
+        'Sum_Duration': duration_stats['sum'],
+        'Max_Duration': duration_stats['max'],
+        'duration_max_above_120': duration_stats['max'] > min_duration_seconds
+    })
+
 
 def validate_patient_durations(root_folder='Z:/uci_vmostaghimi/testing-root/additional EDFs',
                      input_excel_filename='FU_DX_timings.xlsx',
                      output_excel_filename='PatientsEDF_duration_check.xlsx',
-                     min_duration_seconds=120) -> None:
+                     min_duration_seconds=120,
+                     output_format='excel') -> None:
     """
     Validate EDF duration requirements for all patients across multiple sites.
 
     Reads an Excel file with duration data from multiple sites (one sheet per site),
-    groups by patient, calculates duration statistics, and flags patients with
+    or the per-site Parquet/Feather/CSV files written in its place, groups by patient, calculates duration statistics, and flags patients with
     insufficient recording lengths.
 
     Args:
@@ -52,6 +96,7 @@ def validate_patient_durations(root_folder='Z:/uci_vmostaghimi/testing-root/addi
         input_excel_filename: Name of input Excel file with duration data
         output_excel_filename: Name of output Excel file for validation results
         min_duration_seconds: Minimum required duration for single EDF (default: 120 seconds)
+        output_format: 'excel' (default), 'parquet', 'feather' or 'csv' for the validation results
 
     Raises:
         FileNotFoundError: If input Excel file doesn't exist
@@ -60,15 +105,14 @@ def validate_patient_durations(root_folder='Z:/uci_vmostaghimi/testing-root/addi
 
     # Sheet names to skip (template/placeholder sheets)
     skip_sheet_names = ['sheet1', 'sheet', 'template', 'readme', 'instructions']
-    patient_id_prefix_length = 13  # Number of characters for patient identifier
 
     excel_file_path = os.path.join(root_folder, input_excel_filename)
-    if not os.path.exists(excel_file_path):
+    if not report_exists(excel_file_path):
         raise FileNotFoundError(f"Input Excel file not found: {excel_file_path}")
 
-    # Read all sheets from Excel file
+    # Read all sheets (the columnar files are read directly when the timing report was written that way)
     try:
-        excel_data = pd.read_excel(excel_file_path, sheet_name=None)
+        excel_data = read_report(excel_file_path)
     except Exception as e:
         raise ValueError(f"Error reading Excel file: {str(e)}")
 
@@ -76,6 +120,7 @@ def validate_patient_durations(root_folder='Z:/uci_vmostaghimi/testing-root/addi
 
     skipped_sites = 0
     processed_sites = 0
+    sink = WorkbookSink(output_format=output_format)
 
     for site_name, site_data in excel_data.items():#sitenames is the dictionary key
         if site_name.lower() in skip_sheet_names:
@@ -90,37 +135,18 @@ def validate_patient_durations(root_folder='Z:/uci_vmostaghimi/testing-root/addi
                 skipped_sites += 1
                 continue
 
-            # Extract patient ID prefix for grouping
-            # astype converts the patientIDs to strings and then .str allows to perform
-            # vectorwise operation on the patientID
-            site_data['PatientID_prefix'] = site_data['PatientID'].astype(str).str[:patient_id_prefix_length]
-
-            # Group by the new column and find the maximum duration within each group
-            # Calculate duration statistics per patient
-            duration_stats = (
-                site_data
-                .groupby('PatientID_prefix')['Duration in seconds']
-                .agg(['max', 'sum'])
-                .reset_index()
-            )
-
-            # Create validation report
-            validation_report = pd.DataFrame({
-                'PatientID': duration_stats['PatientID_prefix'],
-                'Sum_Duration': duration_stats['sum'],
-                'Max_Duration': duration_stats['max'],
-                'duration_max_above_120': duration_stats['max'] > min_duration_seconds
-            })
-            write_dataframe_to_excel(validation_report, root_folder, output_excel_filename, site_name, mode='a')
+            validation_report = summarize_patient_durations(site_data, min_duration_seconds)
+            write_dataframe_to_excel(validation_report, root_folder, output_excel_filename, site_name, mode='a', sink=sink)
             processed_sites +=1
         except Exception as e:
             print(f"couldn't read info from {site_name}: {str(e)}")
             continue
+    sink.write()
     # Summary
     print(f"   Sites skipped: {skipped_sites}")
     print(f"   Sites processed: {processed_sites}")
 #
-def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a'):
+def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a', sink=None):
     """
     Write a DataFrame to an Excel file as a new sheet.
 
@@ -130,6 +156,8 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         excel_filename (str): Name of the Excel file
         sheet_name (str): Name of the sheet to create
         mode (str): Write mode - 'a' for append (default), 'w' for overwrite
+        sink (WorkbookSink): Optional sink that writes the workbook once at the end of the run
+            (default: None, write now; a missing workbook is created)
     """
 
     if data_frame.empty:
@@ -137,8 +165,7 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         return
     excel_path = os.path.join(folder_dir, excel_filename)
     try:
-        with pd.ExcelWriter(excel_path, mode=mode, engine='openpyxl') as writer:
-            data_frame.to_excel(writer, sheet_name=sheet_name, na_rep='', index=False )
+        write_sheet(data_frame, excel_path, sheet_name, mode, sink)
     except Exception as e:
         print(f"Error writing to Excel file {excel_filename}, sheet {sheet_name}: {str(e)}")
 
@@ -15,6 +15,17 @@ True Sampling Frequency = Signal Length (data points) / Recording Duration (seco
 
 The script flags mismatches which could indicate corrupted files or header errors.
 
+Header-only mode (header_only=True) does not read any signal data. The number of
+data points of every signal is the number of complete data records on disk times
+the samples per data record, so all signals are checked (not just the first one)
+with constant memory per file. Signals that do not match are listed in the
+'Mismatched_Signals' column.
+
+With signal_quality=True the data records of every file are also scanned for
+flat, clipped, dropped-out and disconnected channels (see signal_quality), and
+the labels of the flagged channels are added as 'Flatline_Signals',
+'Clipped_Signals', 'Dropout_Signals' and 'Disconnected_Signals' columns.
+
 Directory Structure:
     root_folder/
     ├── site1/
@@ -31,21 +42,181 @@ Output:
     FS_matching_FU.xlsx: Follow-up sampling frequency validation (one sheet per site)
 
 Note:
-    If you want to run process_all_centers_fs_validation, make sure you make two empty
-    Excel spreadsheets with the exact same name as you input to the function, in the
-    directory you want to save the Excel spreadsheet (in this scrip the root_folder)
+    process_all_centers_fs_validation collects every sheet and writes each Excel file once at
+    the end of the run, creating it in the root_folder if it does not exist yet.
 """
 
+import contextlib
+import math
 import pyedflib
 import pandas as pd
 import os
+import time
+from functools import partial
+
+from concurrent_reads import read_concurrently
+from edf_header_manifest import EdfHeaderManifest, read_edf_header_cached
+from edf_header_reader import FIXED_HEADER_BYTES, SIGNAL_HEADER_BYTES
+from incremental_results import map_patients_incrementally
+from parallel_map import map_in_order
+from run_instrumentation import instrumented_run, instrumented_stage, record_file_read
+from signal_quality import read_signal_quality_cached, signal_quality_columns, signal_quality_settings
+from workbook_sink import WorkbookSink, write_sheet
+
+# Manifest key under which the values read from the signal are cached
+FS_VALIDATION_MANIFEST_KEY = 'fs_validation'
+
+# Relative difference up to which the calculated and the header frequency match (float rounding only)
+FS_RELATIVE_TOLERANCE = 1e-9
+
+
+def read_fs_validation_values(full_path):
+    """
+    Read the values needed for the sampling frequency validation of one EDF file.
+
+    Args:
+        full_path (str): Full path to the EDF file
+
+    Returns:
+        dict: 'header_fs' (first channel, Hz), 'duration_seconds' and
+              'signal_length' (number of data points in the first channel)
+    """
+    start_time = time.perf_counter()
+    with pyedflib.EdfReader(full_path) as edf_reader:
+
+        # Get header sampling frequency (from first channel),
+        # since they cannot be different in each channel
+        header_fs = edf_reader.getSampleFrequencies()[0]
+
+        # Get recording duration
+        duration_seconds = edf_reader.getFileDuration()
+
+        # Read signal data to count samples
+        signal = edf_reader.readSignal(0, start=0, n=None, digital=True) #read first channel
+        signal_length = len(signal)
+
+        # Header plus the samples of the first channel (approximate bytes read)
+        bytes_read = (FIXED_HEADER_BYTES + SIGNAL_HEADER_BYTES * edf_reader.signals_in_file
+                      + signal_length * 2)
+    record_file_read('edf_signal', time.perf_counter() - start_time, bytes_read, 'edf_reader_opens')
+
+    return {"header_fs": float(header_fs),
+            "duration_seconds": float(duration_seconds),
+            "signal_length": int(signal_length)}
+
+
+def read_fs_validation_values_cached(full_path, manifest=None):
+    """
+    Read the sampling frequency validation values through the manifest if one is given.
+
+    Args:
+        full_path (str): Full path to the EDF file
+        manifest (EdfHeaderManifest or None): Manifest to use, or None to always read the file
+
+    Returns:
+        dict: Same keys as read_fs_validation_values
+    """
+    if manifest is None:
+        return read_fs_validation_values(full_path)
+    return manifest.get_cached_value(full_path, FS_VALIDATION_MANIFEST_KEY,
+                                     read_fs_validation_values)
+
+
+def header_fs_validation_values(edf_header):
+    """
+    Derive the sampling frequency validation values from a parsed header.
+
+    The number of data points in each channel is the number of complete
+    data records present on disk times the samples per data record, so no
+    signal data has to be read.
+
+    Args:
+        edf_header (EdfHeader): Parsed header of the EDF file
+
+    Returns:
+        dict: Same keys as read_fs_validation_values (for the first channel), plus
+              'signal_labels', 'header_fs_all' and 'signal_lengths' for every channel
+    """
+    signal_lengths = [edf_header.n_data_records_on_disk * edf_header.samples_per_record[signal_index]
+                      for signal_index in edf_header.signal_indices]
+    return {"header_fs": float(edf_header.sample_frequencies[0]),
+            "duration_seconds": float(edf_header.duration_seconds),
+            "signal_length": signal_lengths[0],
+            "signal_labels": list(edf_header.signal_labels),
+            "header_fs_all": [float(fs) for fs in edf_header.sample_frequencies],
+            "signal_lengths": signal_lengths}
+
+
+def read_header_fs_validation_values(full_path, manifest=None):
+    """
+    Read the sampling frequency validation values of every channel from the header only.
+
+    Args:
+        full_path (str): Full path to the EDF file
+        manifest (EdfHeaderManifest or None): Manifest to use, or None to always read the file
+
+    Returns:
+        dict: See header_fs_validation_values
+    """
+    return header_fs_validation_values(read_edf_header_cached(full_path, manifest))
+
+
+def fs_matches(calculated_fs, header_fs):
+    """True if the calculated frequency equals the header frequency up to float rounding."""
+    return math.isclose(calculated_fs, header_fs, rel_tol=FS_RELATIVE_TOLERANCE)
+
+
+def build_fs_validation_record(edf_filename, fs_values):
+    """
+    Build the validation row of one EDF file.
+
+    When fs_values holds every channel (see header_fs_validation_values), 'Matching'
+    is 1 only if all channels match and the row gets a 'Mismatched_Signals' column.
+
+    Args:
+        edf_filename (str): Name of the EDF file
+        fs_values (dict): 'header_fs', 'duration_seconds' and 'signal_length'
+
+    Returns:
+        dict: One row of the validation DataFrame
+    """
+    header_fs = fs_values["header_fs"]
+    duration_seconds = fs_values["duration_seconds"]
+    signal_length = fs_values["signal_length"]
+    all_signals = "signal_lengths" in fs_values
+
+    if duration_seconds != 0:
+
+        calculated_fs = signal_length / duration_seconds
+        matching = 1 if fs_matches(calculated_fs, header_fs) else 0
+        record = {"PatientID": edf_filename,
+                  "Header_Fs": header_fs,
+                  "Calculated_Fs": calculated_fs,
+                  "Matching": matching}
+        if all_signals:
+            mismatched_signals = [label for label, signal_fs, length in zip(fs_values["signal_labels"],
+                                                                            fs_values["header_fs_all"],
+                                                                            fs_values["signal_lengths"])
+                                  if not fs_matches(length / duration_seconds, signal_fs)]
+            record["Matching"] = 0 if mismatched_signals else 1
+            record["Mismatched_Signals"] = ", ".join(mismatched_signals)
+        return record
+
+    record = {"PatientID": edf_filename,
+              "Header_Fs": None,
+              "Calculated_Fs": None,
+              "Matching": None}
+    if all_signals:
+        record["Mismatched_Signals"] = None
+    return record
 
 
 # deviding the datapoint numbers in a signal
 # by the length of the signal in seconds to find the true sampling fre
 
 
-def validate_sampling_frequencies(folder_path):
+def validate_sampling_frequencies(folder_path, manifest=None, max_concurrent_reads=1, header_only=False,
+                                  signal_quality=False):
     """
         Validate sampling frequencies for all EDF files in a folder.
 
@@ -54,6 +225,13 @@ def validate_sampling_frequencies(folder_path):
 
         Args:
             folder_path (str): Path to folder containing EDF files
+            manifest (EdfHeaderManifest): Optional manifest; files whose size and mtime
+                did not change since the last run are not read again
+            max_concurrent_reads (int): Maximum number of files read at the same time (default: 1)
+            header_only (bool): Check every channel from the header alone, without
+                reading any signal data (default: False, read the first channel)
+            signal_quality (bool): Add the signal quality columns, scanning the data
+                records of every file (default: False)
 
         Returns:
             pd.DataFrame: DataFrame with columns:
@@ -61,6 +239,9 @@ def validate_sampling_frequencies(folder_path):
                 - 'Header_Fs': Sampling frequency from file header (Hz)
                 - 'Calculated_Fs': True frequency calculated from signal data (Hz)
                 - 'Matching': 1 if frequencies match , 0 otherwise
+                - 'Mismatched_Signals': Channels that do not match (header_only only)
+                - 'Flatline_Signals', 'Clipped_Signals', 'Dropout_Signals',
+                  'Disconnected_Signals': Flagged channels (signal_quality only)
             Returns empty DataFrame if folder doesn't exist or contains no EDF files.
         """
 
@@ -69,7 +250,8 @@ def validate_sampling_frequencies(folder_path):
         return pd.DataFrame(columns=["PatientID", "Header_Fs", "Calculated_Fs", "Matching"])
 
     try:
-        edf_files = [file for file in os.listdir(folder_path) if file.lower().endswith('.edf')]
+        with instrumented_stage('listing'):
+            edf_files = [file for file in os.listdir(folder_path) if file.lower().endswith('.edf')]
     except Exception as e:
         print(f"Error listing directory {folder_path}: {str(e)}")
         return pd.DataFrame(columns=["PatientID", "Header_Fs", "Calculated_Fs", "Matching"])
@@ -80,44 +262,29 @@ def validate_sampling_frequencies(folder_path):
     # Collect validation data
     validation_data = []
 
-    for edf_filename in edf_files:
-        try:
-            full_path = os.path.join(folder_path, edf_filename)
-
-            # Read EDF file with context manager
-            with pyedflib.EdfReader(full_path) as edf_reader:
-
-                # Get header sampling frequency (from first channel),
-                # since they cannot be different in each channel
-                header_fs = edf_reader.getSampleFrequencies()[0]
-
-                # Get recording duration
-                duration_seconds = edf_reader.getFileDuration()
-
-                # Read signal data to count samples
-                signal = edf_reader.readSignal(0, start=0, n=None, digital=True) #read first channel
-                signal_length = len(signal)
-
-                if duration_seconds != 0:
-
-                    calculated_fs = signal_length / duration_seconds
-                    matching = 1 if calculated_fs == header_fs else 0
-                    validation_data.append({"PatientID": edf_filename,
-                                            "Header_Fs": header_fs,
-                                            "Calculated_Fs": calculated_fs,
-                                            "Matching": matching})
-                else:
-                    validation_data.append({"PatientID": edf_filename,
-                                            "Header_Fs": None,
-                                            "Calculated_Fs": None,
-                                            "Matching": None})
-
-
-
+    full_paths = [os.path.join(folder_path, edf_filename) for edf_filename in edf_files]
+    if header_only:
+        read_function = partial(read_header_fs_validation_values, manifest=manifest)
+    else:
+        read_function = partial(read_fs_validation_values_cached, manifest=manifest)
+    folder_fs_values = read_concurrently(read_function, full_paths, max_concurrent_reads)
+    if signal_quality:
+        folder_quality = read_concurrently(partial(read_signal_quality_cached, manifest=manifest),
+                                           full_paths, max_concurrent_reads)
+    else:
+        folder_quality = [(None, None)] * len(full_paths)
 
-        except Exception as e:
-            print(f"    Error processing {edf_filename}: {str(e)}")
+    for edf_filename, (fs_values, error), (quality, quality_error) in zip(edf_files, folder_fs_values,
+                                                                          folder_quality):
+        if error is not None:
+            print(f"    Error processing {edf_filename}: {str(error)}")
             continue
+        record = build_fs_validation_record(edf_filename, fs_values)
+        if signal_quality:
+            if quality_error is not None:
+                print(f"    Error computing signal quality of {edf_filename}: {str(quality_error)}")
+            record.update(signal_quality_columns(quality))
+        validation_data.append(record)
 
     if not validation_data:
         print(f"Warning: No valid sampling frequency data collected from {folder_path}")
@@ -127,7 +294,7 @@ def validate_sampling_frequencies(folder_path):
     return validation_df
 
 
-def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a'):
+def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name, mode='a', sink=None):
     """
     Write a DataFrame to an Excel file as a new sheet.
 
@@ -137,6 +304,8 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
         excel_filename (str): Name of the Excel file
         sheet_name (str): Name of the sheet to create
         mode (str): Write mode - 'a' for append (default), 'w' for overwrite
+        sink (WorkbookSink): Optional sink that writes the workbook once at the end of the run
+            (default: None, write now; a missing workbook is created)
     """
 
     if data_frame.empty:
@@ -145,14 +314,45 @@ def write_dataframe_to_excel(data_frame, folder_dir, excel_filename, sheet_name,
 
     excel_path = os.path.join(folder_dir, excel_filename)
     try:
-        with pd.ExcelWriter(excel_path, mode=mode, engine='openpyxl') as writer:
-            data_frame.to_excel(writer, sheet_name=sheet_name, index=False, na_rep='')
+        write_sheet(data_frame, excel_path, sheet_name, mode, sink)
     except Exception as e:
         print(f"Error writing to Excel file {excel_filename}, sheet {sheet_name}: {str(e)}")
 
 
+def validate_patient_sampling_frequencies(patient_id, center_dir, diagnosis_folder_name="diagnosis",
+                                          follow_up_folder_name="follow up", manifest=None,
+                                          max_concurrent_reads=1, header_only=False, signal_quality=False):
+    """
+    Validate sampling frequencies for the DX and FU folders of one patient.
+
+    Args:
+        patient_id (str): Patient folder name
+        center_dir (str): Path to the center directory
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of files read at the same time (default: 1)
+        header_only (bool): Validate every channel from the header alone (default: False)
+        signal_quality (bool): Add the signal quality columns (default: False)
+
+    Returns:
+        tuple: (dx_validation_df, fu_validation_df)
+    """
+    dx_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
+    dx_validation = validate_sampling_frequencies(dx_path, manifest, max_concurrent_reads, header_only,
+                                                  signal_quality)
+
+    fu_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
+    fu_validation = validate_sampling_frequencies(fu_path, manifest, max_concurrent_reads, header_only,
+                                                  signal_quality)
+
+    return dx_validation, fu_validation
+
+
 def process_single_center_fs_validation(center_dir, diagnosis_folder_name="diagnosis",
-                                        follow_up_folder_name="follow up"):
+                                        follow_up_folder_name="follow up", manifest=None,
+                                        workers=1, max_concurrent_reads=1, header_only=False,
+                                        incremental=False, signal_quality=False):
     """
     Validate sampling frequencies for all EDF files in a single center.
 
@@ -160,6 +360,18 @@ def process_single_center_fs_validation(center_dir, diagnosis_folder_name="diagn
         center_dir (str): Path to the center directory
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        manifest (EdfHeaderManifest): Optional manifest (default: None, read every file)
+        workers (int): Number of processes patients are spread across (default: 1).
+            Results are merged in patient order, so the output does not depend on it.
+        max_concurrent_reads (int): Maximum number of files read at the same time per folder
+            (default: 1). Raise it on high-latency network shares.
+        header_only (bool): Validate every channel from the header alone, without
+            reading any signal data (default: False)
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run, reusing the results stored in the manifest
+            (default: False; needs a manifest)
+        signal_quality (bool): Add the flatline/clipping/dropout/disconnected channel
+            columns, scanning the data records of every file (default: False)
 
     Returns:
         tuple: (dx_validation_df, fu_validation_df) - Validation results for DX and FU
@@ -172,21 +384,33 @@ def process_single_center_fs_validation(center_dir, diagnosis_folder_name="diagn
     print(f"\nProcessing Center: {center_name}")
 
     # Get all patient IDs (subdirectories only)
-    patient_ids = [id.name for id in os.scandir(center_dir) if id.is_dir()]
+    with instrumented_stage('listing'):
+        patient_ids = [id.name for id in os.scandir(center_dir) if id.is_dir()]
     print(f"  Found {len(patient_ids)} patients")
 
     # Collect validation data for all patients
     all_dx_validation = []
     all_fu_validation = []
 
-    for patient_id in patient_ids:
-
-        dx_path = os.path.join(center_dir, patient_id, diagnosis_folder_name)
-        dx_validation = validate_sampling_frequencies(dx_path)
-
-        fu_path = os.path.join(center_dir, patient_id, follow_up_folder_name)
-        fu_validation = validate_sampling_frequencies(fu_path)
+    validate_patient = partial(validate_patient_sampling_frequencies,
+                               center_dir=center_dir,
+                               diagnosis_folder_name=diagnosis_folder_name,
+                               follow_up_folder_name=follow_up_folder_name,
+                               manifest=manifest,
+                               max_concurrent_reads=max_concurrent_reads,
+                               header_only=header_only,
+                               signal_quality=signal_quality)
+    # The stored rows hold the flagged channels, so they depend on the flagging thresholds
+    results_key = f"fs_validation:{header_only}" + (f":signal_quality:{signal_quality_settings()}"
+                                                    if signal_quality else "")
+    if incremental and manifest is not None:
+        all_patient_validation = map_patients_incrementally(validate_patient, patient_ids, center_dir,
+                                                            [diagnosis_folder_name, follow_up_folder_name],
+                                                            manifest, results_key, workers)
+    else:
+        all_patient_validation = map_in_order(validate_patient, patient_ids, workers)
 
+    for dx_validation, fu_validation in all_patient_validation:
         if not dx_validation.empty:
             all_dx_validation.append(dx_validation)
 
@@ -214,7 +438,10 @@ def process_single_center_fs_validation(center_dir, diagnosis_folder_name="diagn
 def process_all_centers_fs_validation(root_folder, diagnosis_folder_name="diagnosis",
                                       follow_up_folder_name="follow up",
                                       dx_excel_filename  = 'FS_matching_DX.xlsx',
-                                      fu_excel_filename  = 'FS_matching_FU.xlsx'):
+                                      fu_excel_filename  = 'FS_matching_FU.xlsx',
+                                      use_manifest=True, workers=1, max_concurrent_reads=1,
+                                      header_only=False, output_format="excel", incremental=False,
+                                      instrument=False, signal_quality=False):
     """
     Validate sampling frequencies for all centers.
 
@@ -222,6 +449,22 @@ def process_all_centers_fs_validation(root_folder, diagnosis_folder_name="diagno
         root_folder (str): Path to root directory containing center folders
         diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
         follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        use_manifest (bool): Reuse values cached in the root folder's header manifest, a
+            local file in MANIFEST_CACHE_FOLDER (see edf_header_manifest), only re-reading files
+            whose size or mtime changed (default: True)
+        workers (int): Number of processes centers are spread across (default: 1)
+        max_concurrent_reads (int): Maximum number of files read at the same time per folder (default: 1)
+        header_only (bool): Validate every channel from the header alone (default: False)
+        output_format (str): 'excel' (default), 'parquet', 'feather' or 'csv'. Columnar
+            formats write one file per sheet next to the workbook path (see workbook_sink)
+        incremental (bool): Only process patients whose DX/FU files were added, modified
+            or removed since the last run and merge them with the stored results of the
+            other patients; removed patients are dropped (default: False; needs use_manifest)
+        instrument (bool): Record per-stage wall time, EDF opens, bytes read and per-file
+            read latencies, and write them to FS_matching_run_report.json in root_folder
+            (default: False; see run_instrumentation)
+        signal_quality (bool): Add the flatline/clipping/dropout/disconnected channel
+            columns, scanning the data records of every file (default: False; see signal_quality)
 
     Output Files (saved in root_folder):
         FS_matching_DX.xlsx: One sheet per center with DX validation results
@@ -231,34 +474,48 @@ def process_all_centers_fs_validation(root_folder, diagnosis_folder_name="diagno
     if not os.path.exists(root_folder):
         raise FileNotFoundError(f"Root folder not found: {root_folder}")
 
-    # Get all center directories
-    center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
-    center_names = [os.path.basename(center_dir) for center_dir in center_directories]
-
-    # Process each center
-    for center_idx, center_directory in enumerate(center_directories):
-        center_name = center_names[center_idx]
-
-        dx_validation, fu_validation = process_single_center_fs_validation(
-            center_directory,
-            diagnosis_folder_name=diagnosis_folder_name,
-            follow_up_folder_name=follow_up_folder_name)
-        # Save to Excel (separate files for DX and FU)
-        write_dataframe_to_excel(
-            dx_validation,
-            root_folder,
-            dx_excel_filename,
-            center_name,
-            mode='a'
-        )
-
-        write_dataframe_to_excel(
-            fu_validation,
-            root_folder,
-            fu_excel_filename,
-            center_name,
-            mode='a'
-        )
+    with instrumented_run(root_folder, 'FS_matching', instrument):
+        # Get all center directories
+        center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
+        center_names = [os.path.basename(center_dir) for center_dir in center_directories]
+
+        with (EdfHeaderManifest(root_folder) if use_manifest else contextlib.nullcontext()) as manifest:
+            sink = WorkbookSink(output_format=output_format)
+
+            # Process each center (in parallel when workers > 1)
+            all_center_validation = map_in_order(partial(process_single_center_fs_validation,
+                                                         diagnosis_folder_name=diagnosis_folder_name,
+                                                         follow_up_folder_name=follow_up_folder_name,
+                                                         manifest=manifest,
+                                                         max_concurrent_reads=max_concurrent_reads,
+                                                         header_only=header_only,
+                                                         incremental=incremental,
+                                                         signal_quality=signal_quality),
+                                                 center_directories, workers)
+
+            for center_idx, (dx_validation, fu_validation) in enumerate(all_center_validation):
+                center_name = center_names[center_idx]
+
+                # Save to Excel (separate files for DX and FU)
+                write_dataframe_to_excel(
+                    dx_validation,
+                    root_folder,
+                    dx_excel_filename,
+                    center_name,
+                    mode='a',
+                    sink=sink
+                )
+
+                write_dataframe_to_excel(
+                    fu_validation,
+                    root_folder,
+                    fu_excel_filename,
+                    center_name,
+                    mode='a',
+                    sink=sink
+                )
+
+            sink.write()
 
 
 if __name__ == '__main__':
@@ -268,6 +525,8 @@ if __name__ == '__main__':
     FOLLOWUP_FOLDER = "follow up"
     DX_EXCEL_FILENAME = "FS_matching_DX.xlsx"
     FU_EXCEL_FILENAME ="FS_matching_FU.xlsx"
+    HEADER_ONLY = False  # True checks every channel from the header, without reading signal data
+    SIGNAL_QUALITY = False  # Also flag flat, clipped, dropped-out and disconnected channels (reads the data)
 
 
     # MODE SELECTION
@@ -280,7 +539,9 @@ if __name__ == '__main__':
     #     diagnosis_folder_name=DIAGNOSIS_FOLDER,
     #     follow_up_folder_name=FOLLOWUP_FOLDER,
     #     dx_excel_filename =DX_EXCEL_FILENAME,
-    #     fu_excel_filename=FU_EXCEL_FILENAME
+    #     fu_excel_filename=FU_EXCEL_FILENAME,
+    #     header_only=HEADER_ONLY,
+    #     signal_quality=SIGNAL_QUALITY
     # )
 
     # ------ Option 2: Process SINGLE Center ------
@@ -289,6 +550,8 @@ if __name__ == '__main__':
         center_dir='Z:/uci_vmostaghimi/23.uconn_jmadan_new',
         diagnosis_folder_name=DIAGNOSIS_FOLDER,
         follow_up_folder_name=FOLLOWUP_FOLDER,
+        header_only=HEADER_ONLY,
+        signal_quality=SIGNAL_QUALITY
     )
 
     # Save single center results
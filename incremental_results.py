@@ -0,0 +1,110 @@
+"""
+Incremental Patient Processing
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Sites upload new patients every week, but most patient folders do not change
+between runs. In incremental mode the center scripts keep the result of every
+patient in the header manifest together with a signature of the patient's DX and
+FU folders (file names, sizes and modification times). On the next run only
+patients that are new or whose signature changed are processed again; the stored
+results of the other patients are reused, and results of patient folders that were
+removed are dropped. Since a patient's result is recomputed as a whole when any of
+its files is added, modified or deleted, no stale rows of deleted files are left.
+
+Results are stored as JSON (see EdfHeaderManifest.store_folder_result), under a
+key that includes RESULTS_SCHEMA_VERSION, so results written by an older version
+of the code are not reused after the version is increased.
+
+The per-center sheets are still written in full (with the reused and the new rows
+merged in patient order), so the output files look the same as after a full run.
+
+Usage:
+    results = map_patients_incrementally(partial(process_single_patient_timing, center_dir=center_dir),
+                                         patient_ids, center_dir,
+                                         ["diagnosis", "follow up"],
+                                         manifest, result_key="timing:120")
+"""
+
+import hashlib
+import os
+
+from parallel_map import map_in_order
+
+
+# Increase when the columns or contents of a stored patient result change
+RESULTS_SCHEMA_VERSION = 1
+
+
+def folder_signature(patient_dir, subfolder_names):
+    """
+    Signature of the files in the given subfolders of a patient folder.
+
+    Args:
+        patient_dir (str): Full path of the patient folder
+        subfolder_names (list): Subfolders that hold the patient's EDFs
+
+    Returns:
+        str: Hex digest of the sorted (subfolder, file name, size, mtime) entries;
+             missing subfolders are part of the signature too
+    """
+    entries = []
+    for subfolder_name in subfolder_names:
+        subfolder_path = os.path.join(patient_dir, subfolder_name)
+        if not os.path.isdir(subfolder_path):
+            entries.append(f"{subfolder_name}|missing")
+            continue
+        with os.scandir(subfolder_path) as folder_entries:
+            for entry in folder_entries:
+                if entry.is_file():
+                    entry_stat = entry.stat()
+                    entries.append(f"{subfolder_name}|{entry.name}|{entry_stat.st_size}|{entry_stat.st_mtime_ns}")
+    return hashlib.sha1("\n".join(sorted(entries)).encode('utf-8')).hexdigest()
+
+
+def map_patients_incrementally(process_patient, patient_ids, center_dir, subfolder_names,
+                               manifest, result_key, workers=1):
+    """
+    Run process_patient on new or changed patients only, reusing stored results.
+
+    Args:
+        process_patient (callable): Function of patient_id returning the patient's result
+            (must be picklable when workers > 1, e.g. a functools.partial)
+        patient_ids (list): Patient folder names, in output order
+        center_dir (str): Path to the center directory
+        subfolder_names (list): Subfolders whose files make up the patient signature
+        manifest (EdfHeaderManifest): Manifest the results are stored in
+        result_key (str): Name of the stored result; include every setting that changes
+            the result (e.g. "timing:120") so results of other settings are not reused
+        workers (int): Number of processes the changed patients are spread across (default: 1)
+
+    Returns:
+        list: One result per patient, in patient_ids order
+    """
+    result_key = f"{result_key}:v{RESULTS_SCHEMA_VERSION}"
+    patient_dirs = [os.path.join(center_dir, patient_id) for patient_id in patient_ids]
+    signatures = [folder_signature(patient_dir, subfolder_names) for patient_dir in patient_dirs]
+
+    results = [None] * len(patient_ids)
+    changed_positions = []
+    for position, (patient_dir, signature) in enumerate(zip(patient_dirs, signatures)):
+        found, stored_result = manifest.get_folder_result(patient_dir, result_key, signature)
+        if found:
+            results[position] = stored_result
+        else:
+            changed_positions.append(position)
+
+    changed_results = map_in_order(process_patient,
+                                   [patient_ids[position] for position in changed_positions], workers)
+    for position, patient_result in zip(changed_positions, changed_results):
+        results[position] = patient_result
+        manifest.store_folder_result(patient_dirs[position], result_key, signatures[position], patient_result)
+
+    removed_count = manifest.drop_stale_folder_results(center_dir, result_key, patient_dirs)
+    manifest.commit()
+
+    print(f"Incremental: {len(patient_ids) - len(changed_positions)} unchanged, "
+          f"{len(changed_positions)} new or changed, {removed_count} removed patient(s)")
+    return results
@@ -0,0 +1,64 @@
+"""
+Ordered Process-Pool Map
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Small helper used by the scanner scripts to spread patients (or whole centers)
+across a process pool. Results always come back in the order of the inputs, so the
+combined DataFrames and the output workbooks are the same no matter how many
+workers are used.
+
+Note:
+    The function passed to map_in_order must be defined at module level (it is
+    pickled to the worker processes). On Windows, scripts using workers > 1 must
+    keep their entry point under "if __name__ == '__main__':".
+    Workers are always started with the "spawn" method (the Windows default) so
+    they do not inherit the parent's open header manifest connection, whose
+    SQLite locks would otherwise block them on Linux.
+    When the run is instrumented (see run_instrumentation), each worker records
+    into its own instrumentation, which is merged into the parent's run.
+
+Usage:
+    from functools import partial
+    results = map_in_order(partial(process_patient, center_dir), patient_ids, workers=4)
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from run_instrumentation import instrumentation_enabled, merge_worker_snapshot, run_instrumented
+
+
+def map_in_order(function, items, workers=1):
+    """
+    Apply a function to every item, optionally in a process pool.
+
+    Args:
+        function (callable): Module-level function taking one item
+        items (iterable): Inputs
+        workers (int): Number of worker processes; 1 (default) runs in this process
+
+    Returns:
+        list: function(item) for each item, in input order
+    """
+    items = list(items)
+    if workers is None or workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    instrumented = instrumentation_enabled()
+    if instrumented:
+        # Workers record into their own instrumentation, merged back here
+        function = partial(run_instrumented, function)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(items)),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        results = list(executor.map(function, items))
+
+    if instrumented:
+        for _, worker_snapshot in results:
+            merge_worker_snapshot(worker_snapshot)
+        results = [result for result, _ in results]
+    return results
@@ -0,0 +1,304 @@
+"""
+Run Instrumentation
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Opt-in counters and timers for the scanner scripts, to see where the time of a
+long run goes. When instrumentation is on, the scripts record:
+    - Per-stage wall time and call counts:
+        'listing'       os.listdir of center and patient folders
+        'file_reads'    per-folder header/signal reads (concurrent_reads)
+        'report_write'  writing workbooks or columnar report files
+    - Per-file read latency histograms, per kind of read:
+        'edf_header'    fixed-width header reads (edf_header_reader)
+        'edf_signal'    pyedflib.EdfReader opens that read signal data
+        'edf_quality'   data record scans of the signal quality metrics (signal_quality)
+        'edf_fingerprint' sampled data record reads of the content fingerprints (edf_fingerprint)
+    - Counters: 'header_opens', 'edf_reader_opens', 'data_record_maps', 'fingerprint_opens',
+      'bytes_read' and the header manifest's 'manifest_hits' / 'manifest_misses'
+
+When instrumentation is off (the default) every hook returns straight away.
+Patients or centers handled in worker processes (workers > 1) are recorded in the
+worker and merged back by parallel_map.map_in_order.
+
+Output:
+    {run name}_run_report.json, written next to the run's report, e.g.
+    root_folder/FU_DX_timings_run_report.json
+
+Usage:
+    process_all_centers_timing(root_folder="path/to/root/", instrument=True)
+
+    # or around any code (instrumentation is stopped even if the code raises)
+    with instrumented_run("path/to/output", "my_report.xlsx"):
+        ...
+
+Note:
+    Stage times of nested or concurrent stages overlap (e.g. 'file_reads' running
+    in several worker processes at once), so they are not meant to add up to the
+    total wall time. bytes_read of signal reads is derived from the number of
+    samples read.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Upper bounds (milliseconds) of the latency histogram buckets; slower reads go in '>5000'
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def _bucket_label(latency_ms):
+    """Histogram bucket of a latency in milliseconds."""
+    for upper_bound in LATENCY_BUCKETS_MS:
+        if latency_ms <= upper_bound:
+            return f'<={upper_bound}ms'
+    return f'>{LATENCY_BUCKETS_MS[-1]}ms'
+
+
+class RunInstrumentation:
+    """
+    Counters, stage timers and read latency histograms of one run.
+
+    Attributes:
+        started: Time the run started (time.time())
+        counters: Counter of named events (opens, bytes read, manifest hits, ...)
+        stages: stage name -> {'calls': int, 'seconds': float}
+        reads: read kind -> {'count', 'seconds', 'max_ms', 'histogram'}
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = Counter()
+        self.stages = {}
+        self.reads = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage_name, seconds):
+        """Add one call of a stage."""
+        with self._lock:
+            stage = self.stages.setdefault(stage_name, {'calls': 0, 'seconds': 0.0})
+            stage['calls'] += 1
+            stage['seconds'] += seconds
+
+    def count(self, counter_name, amount=1):
+        """Increase a counter."""
+        with self._lock:
+            self.counters[counter_name] += amount
+
+    def add_read(self, read_kind, seconds):
+        """Add the latency of one file read to the histogram of its kind."""
+        latency_ms = seconds * 1000
+        with self._lock:
+            reads = self.reads.setdefault(read_kind, {'count': 0, 'seconds': 0.0, 'max_ms': 0.0,
+                                                      'histogram': Counter()})
+            reads['count'] += 1
+            reads['seconds'] += seconds
+            reads['max_ms'] = max(reads['max_ms'], latency_ms)
+            reads['histogram'][_bucket_label(latency_ms)] += 1
+
+    def snapshot(self):
+        """Plain-dict copy of the recorded values (picklable, see merge)."""
+        with self._lock:
+            return {'counters': dict(self.counters),
+                    'stages': {name: dict(stage) for name, stage in self.stages.items()},
+                    'reads': {kind: dict(reads, histogram=dict(reads['histogram']))
+                              for kind, reads in self.reads.items()}}
+
+    def merge(self, snapshot):
+        """Add the values of a snapshot (e.g. recorded in a worker process)."""
+        with self._lock:
+            self.counters.update(snapshot['counters'])
+            for stage_name, stage in snapshot['stages'].items():
+                merged_stage = self.stages.setdefault(stage_name, {'calls': 0, 'seconds': 0.0})
+                merged_stage['calls'] += stage['calls']
+                merged_stage['seconds'] += stage['seconds']
+            for read_kind, reads in snapshot['reads'].items():
+                merged_reads = self.reads.setdefault(read_kind, {'count': 0, 'seconds': 0.0, 'max_ms': 0.0,
+                                                                 'histogram': Counter()})
+                merged_reads['count'] += reads['count']
+                merged_reads['seconds'] += reads['seconds']
+                merged_reads['max_ms'] = max(merged_reads['max_ms'], reads['max_ms'])
+                merged_reads['histogram'].update(reads['histogram'])
+
+    def report(self, run_name):
+        """
+        Build the JSON-serializable run report.
+
+        Args:
+            run_name (str): Name of the run (usually the report file name)
+
+        Returns:
+            dict: Run name, start/finish time, total seconds, counters, stages and reads
+        """
+        finished = time.time()
+        snapshot = self.snapshot()
+        for reads in snapshot['reads'].values():
+            reads['mean_ms'] = round(1000 * reads['seconds'] / reads['count'], 3) if reads['count'] else None
+            reads['max_ms'] = round(reads['max_ms'], 3)
+            reads['seconds'] = round(reads['seconds'], 4)
+            reads['histogram'] = {label: reads['histogram'][label]
+                                  for label in [f'<={bound}ms' for bound in LATENCY_BUCKETS_MS]
+                                  + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+                                  if label in reads['histogram']}
+        for stage in snapshot['stages'].values():
+            stage['seconds'] = round(stage['seconds'], 4)
+
+        return {'run': run_name,
+                'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'finished': datetime.fromtimestamp(finished).isoformat(timespec='seconds'),
+                'total_seconds': round(finished - self.started, 3),
+                'counters': snapshot['counters'],
+                'stages': snapshot['stages'],
+                'reads': snapshot['reads']}
+
+
+# Instrumentation of the current run, or None when instrumentation is off
+_active_run = None
+
+
+def start_instrumentation():
+    """
+    Turn instrumentation on, starting a new run.
+
+    Returns:
+        RunInstrumentation: The recorder of the run
+    """
+    global _active_run
+    _active_run = RunInstrumentation()
+    return _active_run
+
+
+def stop_instrumentation():
+    """
+    Turn instrumentation off.
+
+    Returns:
+        RunInstrumentation or None: The recorder of the run that was stopped
+    """
+    global _active_run
+    stopped_run, _active_run = _active_run, None
+    return stopped_run
+
+
+def instrumentation_enabled():
+    """True while a run is being instrumented."""
+    return _active_run is not None
+
+
+@contextmanager
+def instrumented_stage(stage_name):
+    """Time the enclosed block as one call of a stage (no-op when instrumentation is off)."""
+    if _active_run is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        _active_run.add_stage(stage_name, time.perf_counter() - start_time)
+
+
+def count_event(counter_name, amount=1):
+    """Increase a counter of the current run (no-op when instrumentation is off)."""
+    if _active_run is not None:
+        _active_run.count(counter_name, amount)
+
+
+def record_file_read(read_kind, seconds, bytes_read, opens_counter=None):
+    """
+    Record one file read of the current run (no-op when instrumentation is off).
+
+    Args:
+        read_kind (str): Histogram the latency goes to ('edf_header', 'edf_signal', 'edf_quality',
+            'edf_fingerprint')
+        seconds (float): Time the read took
+        bytes_read (int): Number of bytes read from the file
+        opens_counter (str): Counter of file opens to increase (default: None)
+    """
+    if _active_run is None:
+        return
+    _active_run.add_read(read_kind, seconds)
+    _active_run.count('bytes_read', bytes_read)
+    if opens_counter is not None:
+        _active_run.count(opens_counter)
+
+
+def run_instrumented(function, item):
+    """
+    Call function(item) in a worker process with its own instrumentation.
+
+    Used by parallel_map.map_in_order when the parent run is instrumented.
+
+    Returns:
+        tuple: (function(item), snapshot of the values recorded in the call)
+    """
+    worker_run = start_instrumentation()
+    try:
+        return function(item), worker_run.snapshot()
+    finally:
+        stop_instrumentation()
+
+
+def merge_worker_snapshot(snapshot):
+    """Add the values recorded by a worker process to the current run."""
+    if _active_run is not None:
+        _active_run.merge(snapshot)
+
+
+@contextmanager
+def instrumented_run(output_folder, run_name, enabled=True):
+    """
+    Instrument the enclosed run and write its report when the run finishes.
+
+    If the run raises, instrumentation is stopped without writing a report, so
+    later runs in the same process are not recorded into the failed one.
+
+    Args:
+        output_folder (str): Folder the run's report is written to
+        run_name (str): Name of the run (see write_run_report)
+        enabled (bool): Instrument the run; when False the block runs as is (default: True)
+    """
+    if not enabled:
+        yield
+        return
+    start_instrumentation()
+    try:
+        yield
+    except BaseException:
+        stop_instrumentation()
+        raise
+    write_run_report(output_folder, run_name)
+
+
+def write_run_report(output_folder, run_name):
+    """
+    Write the JSON report of the current run next to its output and stop instrumentation.
+
+    Args:
+        output_folder (str): Folder the run's report was written to
+        run_name (str): Name of the run, usually the file name of its report; the
+            JSON report is named {run_name without extension}_run_report.json
+
+    Returns:
+        str or None: Path of the JSON report (None when instrumentation is off)
+    """
+    finished_run = stop_instrumentation()
+    if finished_run is None:
+        return None
+
+    report_path = os.path.join(output_folder, f'{os.path.splitext(run_name)[0]}_run_report.json')
+    try:
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            json.dump(finished_run.report(run_name), report_file, indent=2)
+        print(f"Saved run report to {report_path}")
+    except Exception as e:
+        print(f"Error writing run report {report_path}: {str(e)}")
+        return None
+    return report_path
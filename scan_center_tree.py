@@ -0,0 +1,382 @@
+"""
+Single-Pass Center Scanner
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+A full QC of one center used to take five separate traversals, one per script
+(timing, channels/SF, fs validation, overlaps, DX-FU intervals), each listing the
+'diagnosis'/'follow up' folders and opening every EDF again. This script walks the
+center tree once, reads each EDF header once, and builds every report from that
+single read.
+
+The sampling frequency validation is derived from the header: the number of data
+points is the number of complete data records present on disk times the samples
+per data record (see header_fs_validation_values in get_sampling_freq_validation).
+
+Directory Structure:
+    root_folder/
+    ├── center1/
+    │   ├── patient1/
+    │   │   ├── diagnosis/
+    │   │   │   └── *.edf
+    │   │   └── follow up/
+    │   │       └── *.edf
+    └── center2/
+        └── ...
+
+Output (same files as the individual scripts):
+    root_folder/FU_DX_timings.xlsx: Timing information (one sheet per center)
+    root_folder/FS_matching_DX.xlsx, FS_matching_FU.xlsx: Sampling frequency validation
+    root_folder/overlaps.xlsx: Overlapping EDF pairs
+    root_folder/FU_DX_intervals_new.xlsx: DX-FU intervals
+    center_dir/{center_name}_channels_DX.xlsx, ..._channels_FU.xlsx,
+    center_dir/{center_name}_SF_DX.xlsx, ..._SF_FU.xlsx: One sheet per patient
+
+Usage:
+    # Scan single center (returns the DataFrames)
+    scan_results = scan_single_center(center_dir="path/to/center/")
+
+    # Scan all centers and write every report
+    scan_all_centers(root_folder="path/to/root/")
+"""
+
+import contextlib
+import os
+
+import pandas as pd
+
+import get_channel_labels_and_sampling_freq as channel_report
+import get_edf_timing_info as timing_report
+import get_edfs_overlaps as overlap_report
+import get_FU_DX_intervals as interval_report
+import get_sampling_freq_validation as fs_report
+from edf_header_manifest import EdfHeaderManifest, read_edf_headers
+from run_instrumentation import instrumented_run, instrumented_stage
+from workbook_sink import WorkbookSink
+
+
+FS_VALIDATION_COLUMNS = ["PatientID", "Header_Fs", "Calculated_Fs", "Matching", "Mismatched_Signals"]
+
+# Default output file names, matching the individual scripts
+REPORT_FILENAMES = {
+    'timing': "FU_DX_timings.xlsx",
+    'fs_matching_DX': "FS_matching_DX.xlsx",
+    'fs_matching_FU': "FS_matching_FU.xlsx",
+    'overlaps': "overlaps.xlsx",
+    'intervals': "FU_DX_intervals_new.xlsx",
+}
+
+
+def read_folder_headers(folder_path, manifest=None, max_concurrent_reads=1):
+    """
+    Read the header of every EDF file in a folder.
+
+    Args:
+        folder_path (str): Path to folder containing EDF files
+        manifest (EdfHeaderManifest): Optional header manifest to reuse previously read headers
+        max_concurrent_reads (int): Maximum number of header reads in flight (default: 1)
+
+    Returns:
+        list: (edf_filename, EdfHeader) tuples in directory listing order.
+              Files that cannot be read are reported and skipped.
+    """
+    if not os.path.exists(folder_path):
+        print(f"Warning: Folder not found - {folder_path}")
+        return []
+
+    try:
+        with instrumented_stage('listing'):
+            edf_files = [file for file in os.listdir(folder_path) if file.lower().endswith('.edf')]
+    except Exception as e:
+        print(f"Error listing directory {folder_path}: {str(e)}")
+        return []
+
+    if not edf_files:
+        print(f"Warning: No EDF files found in {folder_path}")
+        return []
+
+    full_paths = [os.path.join(folder_path, edf_filename) for edf_filename in edf_files]
+
+    folder_headers = []
+    for edf_filename, (edf_header, error) in zip(edf_files, read_edf_headers(full_paths, manifest,
+                                                                            max_concurrent_reads)):
+        if error is not None:
+            print(f"Error reading {edf_filename}: {str(error)}")
+            continue
+        folder_headers.append((edf_filename, edf_header))
+    return folder_headers
+
+
+def build_folder_reports(folder_headers, min_duration_seconds=120):
+    """
+    Build every per-folder report from the headers of one folder.
+
+    Args:
+        folder_headers (list): (edf_filename, EdfHeader) tuples of one folder
+        min_duration_seconds (int): Minimum duration threshold in seconds (default: 120)
+
+    Returns:
+        dict: 'timing', 'labels', 'sampling_frequencies', 'fs_matching' and
+              'overlaps' DataFrames, plus 'first_start' (datetime or None)
+    """
+    timing_data = [timing_report.build_timing_record(edf_filename, edf_header, min_duration_seconds)
+                   for edf_filename, edf_header in folder_headers]
+    timing_df = pd.DataFrame(timing_data)
+
+    signal_labels_dict = {edf_filename: edf_header.signal_labels
+                          for edf_filename, edf_header in folder_headers}
+    sampling_frequency_dict = {edf_filename: edf_header.sample_frequencies
+                               for edf_filename, edf_header in folder_headers}
+    labels_df, sampling_frequency_df = channel_report.build_metadata_dataframes(signal_labels_dict,
+                                                                               sampling_frequency_dict)
+
+    fs_data = []
+    for edf_filename, edf_header in folder_headers:
+        try:
+            fs_values = fs_report.header_fs_validation_values(edf_header)
+            fs_data.append(fs_report.build_fs_validation_record(edf_filename, fs_values))
+        except Exception as e:
+            print(f"    Error processing {edf_filename}: {str(e)}")
+            continue
+    fs_df = pd.DataFrame(fs_data, columns=FS_VALIDATION_COLUMNS)
+
+    overlaps_df = overlap_report.find_overlapping_intervals(
+        [edf_filename for edf_filename, _ in folder_headers],
+        [row["Start DateTime"] for row in timing_data],
+        [row["Finish DateTime"] for row in timing_data])
+
+    first_start = interval_report.select_first_start_datetime(
+        [(edf_filename, edf_header.start_datetime) for edf_filename, edf_header in folder_headers])
+
+    return {'timing': timing_df,
+            'labels': labels_df,
+            'sampling_frequencies': sampling_frequency_df,
+            'fs_matching': fs_df,
+            'overlaps': overlaps_df,
+            'first_start': first_start}
+
+
+def scan_single_center(center_dir, diagnosis_folder_name="diagnosis",
+                       follow_up_folder_name="follow up",
+                       min_duration_seconds=120, manifest=None, max_concurrent_reads=1):
+    """
+    Scan a center once and build every QC report from a single header read per file.
+
+    Args:
+        center_dir (str): Path to the center directory
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        min_duration_seconds (int): Minimum duration threshold in seconds (default: 120)
+        manifest (EdfHeaderManifest): Optional header manifest (default: None, read every file)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+
+    Returns:
+        dict: Results of the center
+            - 'timing': Same DataFrame as process_single_center_timing
+            - 'channels_DX', 'channels_FU', 'SF_DX', 'SF_FU': dicts of
+              patient_id -> DataFrame, as written by process_single_center
+            - 'fs_matching_DX', 'fs_matching_FU': Same DataFrames as
+              process_single_center_fs_validation with header_only=True
+            - 'overlaps': Same DataFrame as process_single_center_overlaps
+            - 'intervals': Same DataFrame as calculate_intervals_single_center
+            - 'recordings': One row per EDF with 'Patient_ID', 'Folder', 'EDF',
+              'Start DateTime', 'Finish DateTime' and 'Duration in seconds'
+    """
+    if not os.path.exists(center_dir):
+        raise FileNotFoundError(f"Center directory not found: {center_dir}")
+
+    center_name = os.path.basename(center_dir)
+    print(f"\nScanning Center: {center_name}")
+
+    # Get all patient IDs (subdirectories only)
+    with instrumented_stage('listing'):
+        patient_ids = [d for d in os.listdir(center_dir)
+                       if os.path.isdir(os.path.join(center_dir, d))]
+    print(f"  Found {len(patient_ids)} patients")
+
+    all_timing = []
+    all_recordings = []
+    all_fs = {'DX': [], 'FU': []}
+    all_overlaps = []
+    intervals_data = []
+    scan_results = {'channels_DX': {}, 'channels_FU': {}, 'SF_DX': {}, 'SF_FU': {}}
+
+    for patient_id in patient_ids:
+        print(f"Processing Patient: {patient_id}")
+        first_starts = {}
+
+        for phase, folder_name in [('DX', diagnosis_folder_name), ('FU', follow_up_folder_name)]:
+            folder_path = os.path.join(center_dir, patient_id, folder_name)
+            folder_headers = read_folder_headers(folder_path, manifest, max_concurrent_reads)
+            folder_reports = build_folder_reports(folder_headers, min_duration_seconds)
+
+            all_timing.append(folder_reports['timing'])
+            if not folder_reports['timing'].empty:
+                recordings = folder_reports['timing'].rename(columns={"PatientID": "EDF"})
+                recordings = recordings.drop(columns=["Duration < 120 s"])
+                recordings.insert(0, 'Folder', folder_name)
+                recordings.insert(0, 'Patient_ID', patient_id)
+                all_recordings.append(recordings)
+
+            scan_results[f'channels_{phase}'][patient_id] = folder_reports['labels']
+            scan_results[f'SF_{phase}'][patient_id] = folder_reports['sampling_frequencies']
+
+            if not folder_reports['fs_matching'].empty:
+                all_fs[phase].append(folder_reports['fs_matching'])
+
+            if not folder_reports['overlaps'].empty:
+                folder_reports['overlaps'].insert(0, 'Patient_ID', patient_id)
+                all_overlaps.append(folder_reports['overlaps'])
+
+            first_starts[phase] = folder_reports['first_start']
+
+        intervals_data.append(interval_report.build_interval_record(patient_id,
+                                                                    first_starts['DX'],
+                                                                    first_starts['FU']))
+
+    non_empty_timing = [timing for timing in all_timing if not timing.empty]
+    scan_results['timing'] = pd.concat(non_empty_timing, ignore_index=True) \
+        if non_empty_timing else pd.DataFrame()
+    scan_results['recordings'] = pd.concat(all_recordings, ignore_index=True) \
+        if all_recordings else pd.DataFrame()
+
+    for phase in ['DX', 'FU']:
+        scan_results[f'fs_matching_{phase}'] = pd.concat(all_fs[phase], ignore_index=True) \
+            if all_fs[phase] else pd.DataFrame(columns=FS_VALIDATION_COLUMNS)
+
+    if all_overlaps:
+        scan_results['overlaps'] = pd.concat(all_overlaps, ignore_index=True)
+        print(f"\n  Found {len(scan_results['overlaps'])} total overlap(s) in {center_name}\n")
+    else:
+        scan_results['overlaps'] = pd.DataFrame(columns=["Patient_ID"] + overlap_report.OVERLAP_COLUMNS)
+        print(f"\n  No overlaps found in {center_name}\n")
+
+    scan_results['intervals'] = pd.DataFrame(intervals_data)
+    return scan_results
+
+
+def write_center_scan_reports(scan_results, center_dir, output_folder, sheet_name=None,
+                              report_filenames=None, sink=None, output_format="excel"):
+    """
+    Write the results of scan_single_center to the same files as the individual scripts.
+
+    Args:
+        scan_results (dict): Output of scan_single_center
+        center_dir (str): Center directory (per-patient channel/SF workbooks go here)
+        output_folder (str): Folder of the per-center workbooks (usually the root folder)
+        sheet_name (str): Sheet name used in the per-center workbooks (default: center name)
+        report_filenames (dict): Overrides for REPORT_FILENAMES
+        sink (WorkbookSink): Optional sink collecting the sheets of the whole run
+            (default: None, every workbook of this center is written once here)
+        output_format (str): Output format used when no sink is given (default: "excel")
+    """
+    center_name = os.path.basename(os.path.normpath(center_dir))
+    sheet_name = sheet_name or center_name
+    filenames = dict(REPORT_FILENAMES, **(report_filenames or {}))
+    center_sink = sink if sink is not None else WorkbookSink(output_format=output_format)
+
+    timing_report.write_dataframe_to_excel(scan_results['timing'], output_folder,
+                                           filenames['timing'], sheet_name, mode='a', sink=center_sink)
+    fs_report.write_dataframe_to_excel(scan_results['fs_matching_DX'], output_folder,
+                                       filenames['fs_matching_DX'], sheet_name, mode='a', sink=center_sink)
+    fs_report.write_dataframe_to_excel(scan_results['fs_matching_FU'], output_folder,
+                                       filenames['fs_matching_FU'], sheet_name, mode='a', sink=center_sink)
+    overlap_report.write_dataframe_to_excel(scan_results['overlaps'], output_folder,
+                                            filenames['overlaps'], sheet_name, mode='a', sink=center_sink)
+    interval_report.write_dataframe_to_excel(scan_results['intervals'], output_folder,
+                                             filenames['intervals'], sheet_name, mode='a', sink=center_sink)
+
+    # Each patient gets own sheet in the per-center channel/SF workbooks
+    for report_key in ['channels_DX', 'channels_FU', 'SF_DX', 'SF_FU']:
+        for patient_id, patient_df in scan_results[report_key].items():
+            channel_report.write_dataframe_to_excel(patient_df, center_dir,
+                                                    f'{center_name}_{report_key}.xlsx',
+                                                    patient_id, mode='a', sink=center_sink)
+
+    if sink is None:
+        center_sink.write()
+
+
+def scan_all_centers(root_folder, diagnosis_folder_name="diagnosis",
+                     follow_up_folder_name="follow up",
+                     min_duration_seconds=120, use_manifest=True, max_concurrent_reads=1,
+                     output_format="excel", instrument=False):
+    """
+    Scan all centers once and write every QC report.
+
+    Args:
+        root_folder (str): Path to root directory containing center folders
+        diagnosis_folder_name (str): Name of diagnosis subfolder (default: "diagnosis")
+        follow_up_folder_name (str): Name of follow-up subfolder (default: "follow up")
+        min_duration_seconds (int): Minimum duration threshold in seconds (default: 120)
+        use_manifest (bool): Reuse headers cached in the root folder's header manifest, a
+            local file in MANIFEST_CACHE_FOLDER (see edf_header_manifest) (default: True)
+        max_concurrent_reads (int): Maximum number of header reads in flight per folder (default: 1)
+        output_format (str): 'excel' (default), 'parquet', 'feather' or 'csv'. Columnar
+            formats write one file per sheet next to the workbook path (see workbook_sink)
+        instrument (bool): Record per-stage wall time, EDF opens, bytes read and per-file
+            read latencies, and write them to center_scan_run_report.json in root_folder
+            (default: False; see run_instrumentation)
+
+    Returns:
+        dict: center_name -> scan_single_center results
+    """
+    if not os.path.exists(root_folder):
+        raise FileNotFoundError(f"Root folder not found: {root_folder}")
+
+    with instrumented_run(root_folder, 'center_scan', instrument):
+        # Get all center directories
+        center_directories = [f.path for f in os.scandir(root_folder) if f.is_dir()]
+        center_names = [os.path.basename(center_dir) for center_dir in center_directories]
+        print(f"Found {len(center_names)} centers to process")
+
+        with (EdfHeaderManifest(root_folder) if use_manifest else contextlib.nullcontext()) as manifest:
+            sink = WorkbookSink(output_format=output_format)
+
+            all_results = {}
+            for center_idx, center_directory in enumerate(center_directories):
+                center_name = center_names[center_idx]
+                print(f"Processing Center {center_idx + 1}/{len(center_directories)}: {center_name}")
+
+                scan_results = scan_single_center(center_directory,
+                                                  diagnosis_folder_name=diagnosis_folder_name,
+                                                  follow_up_folder_name=follow_up_folder_name,
+                                                  min_duration_seconds=min_duration_seconds,
+                                                  manifest=manifest,
+                                                  max_concurrent_reads=max_concurrent_reads)
+                write_center_scan_reports(scan_results, center_directory, root_folder, center_name, sink=sink)
+                all_results[center_name] = scan_results
+
+            sink.write()
+
+    return all_results
+
+
+if __name__ == '__main__':
+    # CONFIGURATION
+    DIAGNOSIS_FOLDER = "diagnosis"
+    FOLLOWUP_FOLDER = "follow up"
+    MIN_DURATION_SECONDS = 120
+
+    # ------ Option 1: Scan ALL Centers ------
+    # Uncomment to process multiple centers:
+    # scan_all_centers(
+    #     root_folder="Z:/uci_vmostaghimi/testing-root/",
+    #     diagnosis_folder_name=DIAGNOSIS_FOLDER,
+    #     follow_up_folder_name=FOLLOWUP_FOLDER,
+    #     min_duration_seconds=MIN_DURATION_SECONDS
+    # )
+
+    # ------ Option 2: Scan SINGLE Center ------
+    CENTER_DIR = 'Z:/uci_vmostaghimi/23.uconn_jmadan_new'
+    with EdfHeaderManifest(CENTER_DIR) as center_manifest:
+        center_results = scan_single_center(
+            center_dir=CENTER_DIR,
+            diagnosis_folder_name=DIAGNOSIS_FOLDER,
+            follow_up_folder_name=FOLLOWUP_FOLDER,
+            min_duration_seconds=MIN_DURATION_SECONDS,
+            manifest=center_manifest
+        )
+    write_center_scan_reports(center_results, CENTER_DIR, CENTER_DIR, sheet_name="23.uconn_jmadan")
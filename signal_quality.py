@@ -0,0 +1,244 @@
+"""
+EDF Signal Quality Metrics
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+The QC reports only looked at headers, so flat, clipped or disconnected channels
+were found late. This module computes per-channel quality metrics from the data
+records themselves, in one sequential pass over each file:
+    - flatline_fraction: Fraction of data records in which the channel is constant
+      (channels with one sample per record: in which the sample equals the one of
+      the previous record)
+    - clipping_fraction: Fraction of samples at the channel's digital min or max
+    - dropout_fraction: Fraction of data records stuck at the digital min or max
+      (how recorders fill gaps, EDF has no NaN)
+    - rms: Root mean square of the physical signal (physical dimension of the channel)
+
+The data records are read from a memory-mapped view (edf_data_records) a chunk of
+records at a time, and every metric is computed with vectorized NumPy on the
+digital samples. Consecutive channels with the same samples per record are
+processed as one (records, channels, samples) block, so the work per chunk does
+not grow with the number of channels, and the file is read front to back once.
+Memory stays at one chunk per file regardless of the recording length.
+
+signal_quality_columns turns the metrics into the per-file QC columns:
+    'Flatline_Signals', 'Clipped_Signals', 'Dropout_Signals', 'Disconnected_Signals'
+with the labels of the flagged channels (like 'Mismatched_Signals' of the
+sampling frequency validation, see get_sampling_freq_validation).
+
+Usage:
+    quality = compute_signal_quality("path/to/file.edf")
+    print(signal_quality_columns(quality))
+
+    # per-file QC table with signal quality
+    process_all_centers_fs_validation(root_folder="path/to/root/", signal_quality=True)
+
+Note:
+    Only 16-bit EDF/EDF+ files are supported (not BDF). The metrics are stored in
+    the header manifest, so unchanged files are not read again on later runs. The
+    flagging thresholds are applied when building the columns, so changing them
+    does not require re-reading any file; incremental results hold the flagged
+    columns and are stored under a key that includes the thresholds
+    (signal_quality_settings).
+"""
+
+import time
+
+import numpy as np
+
+from edf_data_records import DEFAULT_RECORDS_PER_CHUNK, EdfDataRecords
+from run_instrumentation import record_file_read
+
+
+# Manifest key under which the metrics of a file are cached
+SIGNAL_QUALITY_MANIFEST_KEY = 'signal_quality'
+
+# A channel is flagged when its metric is above the threshold
+FLATLINE_FRACTION_THRESHOLD = 0.05
+CLIPPING_FRACTION_THRESHOLD = 0.01
+DROPOUT_FRACTION_THRESHOLD = 0.0
+
+# A channel is flagged as disconnected when it is flat (or dropped out) in at least this fraction of records
+DISCONNECTED_FRACTION_THRESHOLD = 0.9
+
+
+def _signal_blocks(data_records):
+    """
+    Group the ordinary signals into runs of adjacent signals with equal samples per record.
+
+    Returns:
+        list: (first signal index, number of signals, samples per record, record columns slice)
+    """
+    blocks = []
+    n_signals = len(data_records.header.signal_indices)
+    signal_index = 0
+    while signal_index < n_signals:
+        samples_per_record = data_records.samples_per_record(signal_index)
+        columns = data_records.signal_columns(signal_index)
+        block_size = 1
+        while (signal_index + block_size < n_signals
+               and data_records.samples_per_record(signal_index + block_size) == samples_per_record
+               and data_records.signal_columns(signal_index + block_size).start
+               == columns.start + block_size * samples_per_record):
+            block_size += 1
+        blocks.append((signal_index, block_size, samples_per_record,
+                       slice(columns.start, columns.start + block_size * samples_per_record)))
+        signal_index += block_size
+    return blocks
+
+
+def compute_signal_quality(full_path, records_per_chunk=DEFAULT_RECORDS_PER_CHUNK):
+    """
+    Compute the quality metrics of every channel of an EDF file.
+
+    Args:
+        full_path (str): Full path to the EDF file
+        records_per_chunk (int): Data records processed per chunk (default: DEFAULT_RECORDS_PER_CHUNK)
+
+    Returns:
+        dict: 'signal_labels', 'flatline_fraction', 'clipping_fraction', 'dropout_fraction'
+              and 'rms', one entry per channel, plus 'n_records' (data records read)
+
+    Raises:
+        ValueError: If the file is a BDF file or its header is invalid
+    """
+    start_time = time.perf_counter()
+    with EdfDataRecords(full_path) as data_records:
+        header = data_records.header
+        n_signals = len(header.signal_indices)
+        positions = header.signal_indices
+        digital_min = np.array([header.digital_min[position] for position in positions], dtype=np.int64)
+        digital_max = np.array([header.digital_max[position] for position in positions], dtype=np.int64)
+
+        flat_records = np.zeros(n_signals, dtype=np.int64)
+        dropout_records = np.zeros(n_signals, dtype=np.int64)
+        clipped_samples = np.zeros(n_signals, dtype=np.int64)
+        digital_sum = np.zeros(n_signals, dtype=np.float64)
+        digital_square_sum = np.zeros(n_signals, dtype=np.float64)
+        # Sample of the previous data record of the single-sample blocks (None before the first record)
+        previous_samples = [None] * n_signals
+
+        blocks = _signal_blocks(data_records)
+        for record_chunk in data_records.iter_record_chunks(records_per_chunk):
+            for first_signal, block_size, samples_per_record, columns in blocks:
+                if samples_per_record == 0:
+                    continue
+                block_signals = slice(first_signal, first_signal + block_size)
+                # (records, channels, samples) view of the block, copied once into memory
+                block = np.ascontiguousarray(record_chunk[:, columns]).reshape(
+                    len(record_chunk), block_size, samples_per_record)
+                block_min = digital_min[block_signals, np.newaxis]
+                block_max = digital_max[block_signals, np.newaxis]
+
+                record_min = block.min(axis=2)
+                record_max = block.max(axis=2)
+                flat = record_min == record_max
+                if samples_per_record == 1:
+                    # A single sample is always "constant": compare it with the previous record's
+                    samples = block[:, :, 0]
+                    flat[1:] = samples[1:] == samples[:-1]
+                    if previous_samples[first_signal] is None:
+                        flat[0] = False
+                    else:
+                        flat[0] = samples[0] == previous_samples[first_signal]
+                    previous_samples[first_signal] = samples[-1].copy()
+                flat_records[block_signals] += flat.sum(axis=0)
+                dropout_records[block_signals] += (flat & ((record_min == block_min.T)
+                                                           | (record_min == block_max.T))).sum(axis=0)
+                # Only records reaching the digital min or max can hold clipped samples
+                limit_records = ((record_min == block_min.T) | (record_max == block_max.T)).any(axis=1)
+                if limit_records.any():
+                    limit_block = block[limit_records]
+                    clipped_samples[block_signals] += ((limit_block == block_min)
+                                                       | (limit_block == block_max)).sum(axis=(0, 2))
+
+                block_values = block.astype(np.float64)
+                digital_sum[block_signals] += block_values.sum(axis=(0, 2))
+                digital_square_sum[block_signals] += np.einsum('rcs,rcs->c', block_values, block_values)
+
+        n_records = data_records.n_records
+        signal_lengths = np.array([data_records.signal_length(signal_index) for signal_index in range(n_signals)],
+                                  dtype=np.float64)
+        scales = [data_records.physical_scale(signal_index) for signal_index in range(n_signals)]
+        bytes_read = header.header_bytes + n_records * header.record_bytes
+    record_file_read('edf_quality', time.perf_counter() - start_time, bytes_read, 'data_record_maps')
+
+    # RMS of physical = gain * digital + offset, from the digital sums
+    rms = []
+    for signal_index, (gain, offset) in enumerate(scales):
+        n_samples = signal_lengths[signal_index]
+        if n_samples == 0:
+            rms.append(None)
+            continue
+        mean_square = (gain * gain * digital_square_sum[signal_index]
+                       + 2 * gain * offset * digital_sum[signal_index]) / n_samples + offset * offset
+        rms.append(float(np.sqrt(max(mean_square, 0.0))))
+
+    record_count = max(n_records, 1)
+    return {"signal_labels": list(header.signal_labels),
+            "n_records": int(n_records),
+            "flatline_fraction": [float(count) / record_count for count in flat_records],
+            "clipping_fraction": [float(count / length) if length else 0.0
+                                  for count, length in zip(clipped_samples, signal_lengths)],
+            "dropout_fraction": [float(count) / record_count for count in dropout_records],
+            "rms": rms}
+
+
+def read_signal_quality_cached(full_path, manifest=None):
+    """
+    Compute the signal quality metrics through the manifest if one is given.
+
+    Args:
+        full_path (str): Full path to the EDF file
+        manifest (EdfHeaderManifest or None): Manifest to use, or None to always read the file
+
+    Returns:
+        dict: See compute_signal_quality
+    """
+    if manifest is None:
+        return compute_signal_quality(full_path)
+    return manifest.get_cached_value(full_path, SIGNAL_QUALITY_MANIFEST_KEY, compute_signal_quality)
+
+
+def signal_quality_settings():
+    """
+    The flagging thresholds as a string, for result keys of the flagged columns.
+
+    Returns:
+        str: e.g. "flatline=0.05,clipping=0.01,dropout=0.0,disconnected=0.9"
+    """
+    return (f"flatline={FLATLINE_FRACTION_THRESHOLD},clipping={CLIPPING_FRACTION_THRESHOLD},"
+            f"dropout={DROPOUT_FRACTION_THRESHOLD},disconnected={DISCONNECTED_FRACTION_THRESHOLD}")
+
+
+def signal_quality_columns(quality):
+    """
+    Build the per-file QC columns from the metrics of a file.
+
+    Args:
+        quality (dict): Output of compute_signal_quality, or None if it could not be computed
+
+    Returns:
+        dict: 'Flatline_Signals', 'Clipped_Signals', 'Dropout_Signals' and
+              'Disconnected_Signals', each the comma-separated labels of the flagged
+              channels (None for every column when quality is None)
+    """
+    if quality is None:
+        return {"Flatline_Signals": None, "Clipped_Signals": None,
+                "Dropout_Signals": None, "Disconnected_Signals": None}
+
+    channels = list(zip(quality["signal_labels"], quality["flatline_fraction"],
+                        quality["clipping_fraction"], quality["dropout_fraction"]))
+    return {
+        "Flatline_Signals": ", ".join(label for label, flatline, _, _ in channels
+                                      if flatline > FLATLINE_FRACTION_THRESHOLD),
+        "Clipped_Signals": ", ".join(label for label, _, clipping, _ in channels
+                                     if clipping > CLIPPING_FRACTION_THRESHOLD),
+        "Dropout_Signals": ", ".join(label for label, _, _, dropout in channels
+                                     if dropout > DROPOUT_FRACTION_THRESHOLD),
+        "Disconnected_Signals": ", ".join(label for label, flatline, _, dropout in channels
+                                          if max(flatline, dropout) >= DISCONNECTED_FRACTION_THRESHOLD
+                                          and quality["n_records"] > 0),
+    }
@@ -0,0 +1,22 @@
+from get_channel_harmonization_report import iter_channel_mapping_triplets
+
+
+def test_empty_renamed_row_is_kept(tmp_path):
+    # File b.edf has no renamed channels, so its renamed row holds only commas
+    mapping_path = tmp_path / "channel_mapping.csv"
+    mapping_path.write_text("filename,channels\n"
+                            "a.edf,EEG Fp1-Ref,T7,Cz\n"
+                            ",Fp1,T3,\n"
+                            ",Fp1,T3,Cz\n"
+                            "\n"
+                            "b.edf,Fp1,Fp2,Cz\n"
+                            ",,,\n"
+                            ",Cz,Fp1,\n")
+
+    triplets = list(iter_channel_mapping_triplets(str(mapping_path)))
+
+    assert [edf_filename for edf_filename, _ in triplets] == ["a.edf", "b.edf"]
+    b_categories = triplets[1][1]
+    assert b_categories["original"] == ["Fp1", "Fp2", "Cz"]
+    assert b_categories["renamed"] == ["", "", ""]
+    assert b_categories["reordered"] == ["Cz", "Fp1"]
@@ -0,0 +1,16 @@
+import pytest
+
+from channel_name_normalizer import normalize_channel_name
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("EEG Fp1-Ref", "Fp1"),
+    ("EEGFp1", "Fp1"),
+    ("eegFP1-Ref", "Fp1"),
+    ("EEG_T7", "T3"),
+    ("EEG", "EEG"),
+    ("EEG1", "EEG1"),
+    ("Cz", "Cz"),
+])
+def test_normalize_channel_name(label, expected):
+    assert normalize_channel_name(label) == expected
@@ -0,0 +1,17 @@
+import pandas as pd
+
+from extract_Comprehensive_report import ESSENTIAL_CHANNEL_NAMES, process_channel_labels_sheet
+
+
+def test_absent_channel_column_counts_as_missing():
+    # No A1/A2 columns in the sheet: the essential channel check must fail
+    channel_labels = {channel_name: [channel_name, channel_name] for channel_name in ESSENTIAL_CHANNEL_NAMES
+                      if channel_name not in ('A1', 'A2')}
+    channel_df = pd.DataFrame({'identifier': ['18-0001_DX_01_0001.edf', '18-0001_DX_01_0002.edf'], **channel_labels})
+
+    channel_validation = process_channel_labels_sheet(channel_df)
+
+    assert len(channel_validation) == 1
+    assert channel_validation.loc[0, 'missingChans'] == ['A1', 'A2']
+    assert not channel_validation.loc[0, 'essential_channels_ok']
+    assert channel_validation.loc[0, 'montage_check']
@@ -0,0 +1,12 @@
+import pytest
+
+from get_cross_folder_overlaps import process_all_centers_cross_folder_overlaps
+
+
+@pytest.mark.parametrize("network_wide", [False, True])
+def test_empty_root_folder(tmp_path, network_wide):
+    cross_overlaps = process_all_centers_cross_folder_overlaps(str(tmp_path), use_manifest=False,
+                                                               network_wide=network_wide)
+
+    assert cross_overlaps.empty
+    assert "Overlap in seconds" in cross_overlaps.columns
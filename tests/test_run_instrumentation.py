@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+import run_instrumentation
+from run_instrumentation import count_event, instrumentation_enabled, instrumented_run
+
+
+def test_failed_run_stops_instrumentation(tmp_path):
+    with pytest.raises(RuntimeError):
+        with instrumented_run(str(tmp_path), 'report.xlsx'):
+            count_event('header_opens')
+            raise RuntimeError('center folder went away')
+
+    assert not instrumentation_enabled()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_finished_run_writes_report(tmp_path):
+    with instrumented_run(str(tmp_path), 'report.xlsx'):
+        count_event('header_opens', 3)
+
+    assert run_instrumentation._active_run is None
+    report = json.loads((tmp_path / 'report_run_report.json').read_text())
+    assert report['counters']['header_opens'] == 3
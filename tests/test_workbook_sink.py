@@ -0,0 +1,33 @@
+import pandas as pd
+
+from workbook_sink import read_report, write_sheet
+
+
+def test_csv_round_trip_keeps_dtypes(tmp_path):
+    report = pd.DataFrame({
+        'EDF': ['007_DX_01.edf', '008_FU_01.edf', None],
+        'Start DateTime': pd.to_datetime(['2017-03-01 10:00:00', '2017-03-02 11:30:15', None]),
+        'Duration': pd.to_timedelta(['1h', '30min', None]),
+        'Is Valid': [True, False, True],
+        'Channels': pd.array([19, None, 23], dtype='Int64'),
+        'Files': [1, 2, 3],
+        'Duration (hours)': [1.0, 0.5, float('nan')],
+    })
+    excel_path = str(tmp_path / 'report.xlsx')
+
+    write_sheet(report, excel_path, '10.CHOC', output_format='csv')
+    sheet = read_report(excel_path, '10.CHOC')
+
+    pd.testing.assert_frame_equal(sheet, report)
+    assert str(sheet['Start DateTime'].dtype) == str(report['Start DateTime'].dtype)
+    assert sheet['Is Valid'].dtype == bool
+
+
+def test_csv_dtypes_file_is_removed_with_the_sheet(tmp_path):
+    excel_path = str(tmp_path / 'report.xlsx')
+    write_sheet(pd.DataFrame({'a': [True]}), excel_path, 'center1', output_format='csv')
+    write_sheet(pd.DataFrame({'a': [1.5]}), excel_path, 'center2', mode='w', output_format='csv')
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['report__center2.csv',
+                                                                 'report__center2.csv.dtypes.json']
+    assert read_report(excel_path, 'center2')['a'].dtype == float
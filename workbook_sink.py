@@ -0,0 +1,362 @@
+"""
+Buffered Report Writer
+Author: Venus
+Date: 2026-10-17
+Last Updated: 2026-10-17
+
+Description:
+Appending one sheet at a time with pd.ExcelWriter(mode='a') makes openpyxl load
+and re-save the whole workbook for every sheet, so writing one sheet per patient
+gets slower with every patient. WorkbookSink collects the sheets of a run and
+writes each workbook in a single pass at the end. Workbooks that do not exist yet
+are created, so the output files no longer have to be made by hand.
+
+Sheets are kept in memory. With max_buffered_rows set, DataFrames are spilled to
+temporary pickle files once the buffered row count goes over the limit, and read
+back when the workbook is written.
+
+Output formats:
+Besides Excel, reports can be written as Parquet, Feather or CSV files, one file
+per sheet (so one file per center for the root-level reports) named after the
+workbook and the sheet:
+    root_folder/
+    ├── FU_DX_timings__10.CHOC.parquet
+    ├── FU_DX_timings__11.bch.parquet
+    └── ...
+The files sit next to where the workbook would be rather than in a subfolder, as
+every folder in the root is taken to be a center.
+read_report reads either layout, so the downstream scripts do not have to know
+which format was used, and export_report_to_excel turns a columnar report into a
+workbook when an Excel file is still needed at the end. Parquet and Feather need
+pyarrow to be installed. CSV files have no column types, so the dtypes of a CSV
+sheet are stored next to it in {file}.dtypes.json and restored by read_report
+(datetime, bool and integer columns come back as such).
+
+Usage:
+    sink = WorkbookSink()
+    write_sheet(df, "path/to/report.xlsx", "sheet1", sink=sink)
+    write_sheet(df, "path/to/report.xlsx", "sheet2", sink=sink)
+    sink.write()
+
+    # without a sink the sheet is written straight away (creating the file if needed)
+    write_sheet(df, "path/to/report.xlsx", "sheet1")
+
+    # columnar output, read back sheet by sheet
+    sink = WorkbookSink(output_format='parquet')
+    ...
+    sheets = read_report("path/to/report.xlsx")
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from run_instrumentation import instrumented_stage
+
+# File extension of each supported output format
+OUTPUT_FORMATS = {'excel': '.xlsx', 'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+
+# Appended to the path of a CSV sheet for the file holding its column dtypes
+CSV_DTYPES_SUFFIX = '.dtypes.json'
+
+
+def _table_prefix(excel_path):
+    """Path prefix shared by the columnar files of the report named by excel_path."""
+    return os.path.splitext(excel_path)[0] + '__'
+
+
+def _write_table(data_frame, table_path, output_format):
+    """Write one sheet as a Parquet, Feather or CSV file."""
+    if output_format == 'parquet':
+        data_frame.to_parquet(table_path, index=False)
+    elif output_format == 'feather':
+        data_frame.reset_index(drop=True).to_feather(table_path)
+    else:
+        data_frame.to_csv(table_path, index=False)
+        with open(table_path + CSV_DTYPES_SUFFIX, 'w', encoding='utf-8') as dtypes_file:
+            json.dump({str(column): str(dtype) for column, dtype in data_frame.dtypes.items()}, dtypes_file)
+
+
+def _read_csv_table(table_path):
+    """Read a CSV sheet, restoring the dtypes stored next to it."""
+    dtypes_path = table_path + CSV_DTYPES_SUFFIX
+    if not os.path.exists(dtypes_path):
+        return pd.read_csv(table_path)
+    with open(dtypes_path, 'r', encoding='utf-8') as dtypes_file:
+        dtypes = json.load(dtypes_file)
+
+    # Text columns are read as text, so e.g. "007" does not become 7
+    text_columns = {column: str for column, dtype in dtypes.items() if dtype in ('str', 'string')}
+    data_frame = pd.read_csv(table_path, dtype=text_columns)
+    for column, dtype in dtypes.items():
+        if column not in data_frame.columns or column in text_columns or dtype == 'object':
+            continue
+        try:
+            if dtype.startswith('datetime64'):
+                data_frame[column] = pd.to_datetime(data_frame[column], format='ISO8601').astype(dtype)
+            elif dtype.startswith('timedelta64'):
+                data_frame[column] = pd.to_timedelta(data_frame[column]).astype(dtype)
+            elif str(data_frame[column].dtype) != dtype:
+                data_frame[column] = data_frame[column].astype(dtype)
+        except (TypeError, ValueError) as e:
+            print(f"Warning: Column '{column}' of {table_path} kept as read, not {dtype}: {str(e)}")
+    return data_frame
+
+
+def _read_table(table_path, output_format):
+    """Read one sheet written by _write_table."""
+    if output_format == 'parquet':
+        return pd.read_parquet(table_path)
+    if output_format == 'feather':
+        return pd.read_feather(table_path)
+    return _read_csv_table(table_path)
+
+
+def _remove_table(table_path):
+    """Remove a columnar sheet file and, for CSV, its dtypes file."""
+    os.remove(table_path)
+    if os.path.exists(table_path + CSV_DTYPES_SUFFIX):
+        os.remove(table_path + CSV_DTYPES_SUFFIX)
+
+
+def _write_columnar(sheets, excel_path, output_format, overwrite):
+    """
+    Write sheets as one file each next to excel_path.
+
+    Args:
+        sheets (dict): sheet_name -> DataFrame
+        excel_path (str): Workbook path naming the report
+        output_format (str): 'parquet', 'feather' or 'csv'
+        overwrite (bool): Remove the files of other sheets first
+    """
+    with instrumented_stage('report_write'):
+        if overwrite:
+            for _, table_path, _ in _columnar_tables(excel_path):
+                _remove_table(table_path)
+        for sheet_name, data_frame in sheets.items():
+            table_path = _table_prefix(excel_path) + sheet_name + OUTPUT_FORMATS[output_format]
+            # Replace the sheet if it was written in another format before
+            for _, old_table_path, _ in _columnar_tables(excel_path, sheet_name):
+                _remove_table(old_table_path)
+            _write_table(data_frame, table_path, output_format)
+
+
+class WorkbookSink:
+    """
+    Collects sheets per workbook and writes every workbook once.
+
+    Attributes:
+        max_buffered_rows: Rows kept in memory before sheets are spilled to disk
+            (None keeps everything in memory)
+        output_format: 'excel' (default), 'parquet', 'feather' or 'csv'
+        buffered_rows: Number of rows currently held in memory
+    """
+
+    def __init__(self, max_buffered_rows=None, output_format='excel'):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}', expected one of {list(OUTPUT_FORMATS)}")
+        self.max_buffered_rows = max_buffered_rows
+        self.output_format = output_format
+        self.buffered_rows = 0
+        self._workbooks = {}
+        self._spill_folder = None
+        self._spill_count = 0
+
+    def add_sheet(self, data_frame, excel_path, sheet_name, mode='a'):
+        """
+        Queue a sheet for writing.
+
+        Args:
+            data_frame (pd.DataFrame): Data to write
+            excel_path (str): Full path of the workbook
+            sheet_name (str): Name of the sheet
+            mode (str): 'a' (default) keeps the other sheets of an existing workbook,
+                'w' overwrites the workbook (dropping sheets queued before)
+        """
+        workbook = self._workbooks.setdefault(excel_path, {'overwrite': False, 'sheets': {}})
+        if mode == 'w':
+            workbook['overwrite'] = True
+            for sheet in workbook['sheets'].values():
+                self._release(sheet)
+            workbook['sheets'].clear()
+        if sheet_name in workbook['sheets']:
+            self._release(workbook['sheets'][sheet_name])
+
+        workbook['sheets'][sheet_name] = data_frame
+        self.buffered_rows += len(data_frame)
+        if self.max_buffered_rows is not None and self.buffered_rows > self.max_buffered_rows:
+            self._spill()
+
+    def _spill(self):
+        """Move every buffered DataFrame to a temporary pickle file."""
+        if self._spill_folder is None:
+            self._spill_folder = tempfile.mkdtemp(prefix='workbook_sink_')
+        for workbook in self._workbooks.values():
+            for sheet_name, sheet in workbook['sheets'].items():
+                if isinstance(sheet, pd.DataFrame):
+                    spill_path = os.path.join(self._spill_folder, f'{self._spill_count}.pkl')
+                    self._spill_count += 1
+                    sheet.to_pickle(spill_path)
+                    workbook['sheets'][sheet_name] = spill_path
+        self.buffered_rows = 0
+
+    def _release(self, sheet):
+        """Forget a queued sheet (in memory or spilled)."""
+        if isinstance(sheet, pd.DataFrame):
+            self.buffered_rows -= len(sheet)
+        else:
+            os.remove(sheet)
+
+    def write(self):
+        """Write every queued workbook in one pass each, then empty the sink."""
+        for excel_path, workbook in self._workbooks.items():
+            if not workbook['sheets']:
+                continue
+            sheets = {sheet_name: sheet if isinstance(sheet, pd.DataFrame) else pd.read_pickle(sheet)
+                      for sheet_name, sheet in workbook['sheets'].items()}
+            try:
+                if self.output_format == 'excel':
+                    _write_workbook(sheets, excel_path, workbook['overwrite'])
+                    print(f"Saved {len(sheets)} sheet(s) to {excel_path}")
+                else:
+                    _write_columnar(sheets, excel_path, self.output_format, workbook['overwrite'])
+                    print(f"Saved {len(sheets)} {self.output_format} file(s) to {_table_prefix(excel_path)}*")
+            except Exception as e:
+                print(f"Error writing report {excel_path}: {str(e)}")
+
+        self._workbooks = {}
+        self.buffered_rows = 0
+        if self._spill_folder is not None:
+            shutil.rmtree(self._spill_folder, ignore_errors=True)
+            self._spill_folder = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.write()
+
+
+def _write_workbook(sheets, excel_path, overwrite=False):
+    """Write sheets to an Excel workbook in one pass (appending unless overwrite)."""
+    if not overwrite and os.path.exists(excel_path):
+        writer_options = {'mode': 'a', 'if_sheet_exists': 'replace'}
+    else:
+        writer_options = {'mode': 'w'}
+    with instrumented_stage('report_write'):
+        with pd.ExcelWriter(excel_path, engine='openpyxl', **writer_options) as writer:
+            for sheet_name, data_frame in sheets.items():
+                data_frame.to_excel(writer, sheet_name=sheet_name, index=False, na_rep='')
+
+
+def write_sheet(data_frame, excel_path, sheet_name, mode='a', sink=None, output_format='excel'):
+    """
+    Write one sheet, through a WorkbookSink when one is given.
+
+    Without a sink the sheet is written straight away; a missing workbook (or
+    report folder) is created even in append mode.
+
+    Args:
+        data_frame (pd.DataFrame): Data to write
+        excel_path (str): Full path of the workbook
+        sheet_name (str): Name of the sheet
+        mode (str): 'a' for append (default), 'w' for overwrite
+        sink (WorkbookSink): Optional sink collecting the sheets of the run (default: None)
+        output_format (str): Format used without a sink (default: 'excel'); a sink
+            uses its own output_format
+    """
+    if sink is not None:
+        sink.add_sheet(data_frame, excel_path, sheet_name, mode)
+        return
+
+    if output_format == 'excel':
+        _write_workbook({sheet_name: data_frame}, excel_path, overwrite=(mode == 'w'))
+    else:
+        _write_columnar({sheet_name: data_frame}, excel_path, output_format, overwrite=(mode == 'w'))
+
+
+def _columnar_tables(excel_path, sheet_name=None):
+    """
+    Find the columnar files of a report.
+
+    Args:
+        excel_path (str): Workbook path naming the report
+        sheet_name (str): Only return the files of this sheet (default: None)
+
+    Returns:
+        list: (sheet_name, table_path, output_format) tuples sorted by file name
+    """
+    folder = os.path.dirname(excel_path) or '.'
+    prefix = os.path.basename(_table_prefix(excel_path))
+    if not os.path.isdir(folder):
+        return []
+    tables = []
+    for file_name in sorted(os.listdir(folder)):
+        if not file_name.startswith(prefix):
+            continue
+        for output_format, extension in OUTPUT_FORMATS.items():
+            if output_format != 'excel' and file_name.lower().endswith(extension):
+                # sheet names like "10.CHOC" contain dots, so only the known extension is cut off
+                table_sheet_name = file_name[len(prefix):-len(extension)]
+                if sheet_name is None or table_sheet_name == sheet_name:
+                    tables.append((table_sheet_name, os.path.join(folder, file_name), output_format))
+                break
+    return tables
+
+
+def report_exists(excel_path):
+    """True if the report was written as a workbook or as columnar files."""
+    return os.path.exists(excel_path) or bool(_columnar_tables(excel_path))
+
+
+def read_report(excel_path, sheet_name=None):
+    """
+    Read a report written by write_sheet/WorkbookSink in any output format.
+
+    The columnar files of the report are used when present (no Excel parsing),
+    unless the workbook was written after them; otherwise the workbook is read.
+
+    Args:
+        excel_path (str): Full path of the workbook naming the report
+        sheet_name (str): Sheet to read, or None (default) for every sheet
+
+    Returns:
+        dict or pd.DataFrame: sheet_name -> DataFrame, or one DataFrame when
+                              sheet_name is given
+
+    Raises:
+        FileNotFoundError: If neither the columnar files nor the workbook exist
+    """
+    tables = _columnar_tables(excel_path)
+    if tables and os.path.exists(excel_path):
+        if os.path.getmtime(excel_path) > max(os.path.getmtime(table[1]) for table in tables):
+            tables = []
+    if tables:
+        sheets = {table_sheet_name: _read_table(table_path, output_format)
+                  for table_sheet_name, table_path, output_format in tables
+                  if sheet_name is None or table_sheet_name == sheet_name}
+        if sheet_name is None:
+            return sheets
+        if sheet_name in sheets:
+            return sheets[sheet_name]
+        raise FileNotFoundError(f"Sheet '{sheet_name}' not found in the files of {excel_path}")
+
+    if not os.path.exists(excel_path):
+        raise FileNotFoundError(f"Report not found: {excel_path}")
+    return pd.read_excel(excel_path, sheet_name=sheet_name)
+
+
+def export_report_to_excel(excel_path, output_excel_path=None):
+    """
+    Export a columnar report to a single Excel workbook (one sheet per file).
+
+    Args:
+        excel_path (str): Workbook path naming the report
+        output_excel_path (str): Workbook to write (default: excel_path)
+    """
+    sheets = read_report(excel_path)
+    _write_workbook(sheets, output_excel_path or excel_path, overwrite=True)
+    print(f"Exported {len(sheets)} sheet(s) to {output_excel_path or excel_path}")